@@ -1,19 +1,40 @@
 from __future__ import annotations
 
-from typing import List, NamedTuple, Callable, Sequence, TypeVar
+from abc import ABC, abstractmethod
+from typing import Any, List, NamedTuple, Callable, Sequence, TypedDict, TypeVar, overload
+import json
+import sys
 import time
 
 
 class BenchmarkContext:
+    """Measure the runtime of a benchmark iteration.
+
+    A benchmark defined using benchmark_with_context can call start() to exclude
+    setup and stop() to exclude teardown from the measured time, and it can
+    record additional metrics about the iteration.
+    """
+
     def __init__(self) -> None:
+        # Additional metrics recorded by the benchmark (metric name as key)
+        self.metrics: dict[str, float] = {}
         self.start()
 
     def start(self) -> None:
         self.start_time = time.time()
+        self.stop_time: float | None = None
+
+    def stop(self) -> None:
+        self.stop_time = time.time()
 
     def elapsed_time(self) -> float:
+        if self.stop_time is not None:
+            return self.stop_time - self.start_time
         return time.time() - self.start_time
 
+    def record_metric(self, name: str, value: float) -> None:
+        self.metrics[name] = value
+
 
 class BenchmarkInfo(NamedTuple):
     name: str
@@ -26,11 +47,31 @@ class BenchmarkInfo(NamedTuple):
     strip_outlier_runs: bool
     stable_hash_seed: bool
     compiled_variant: bool
+    # Name of estimator for summarizing runtimes (None = use default)
+    estimator: str | None = None
+    # Runs multiple processes on purpose (not treated as interference)
+    multi_process: bool = False
 
 
 benchmarks: List[BenchmarkInfo] = []
 
 
+class BenchmarkOptions(TypedDict, total=False):
+    """Keyword arguments of benchmark and benchmark_with_context (other than prepare).
+
+    Benchmarks in a module can share options using a module-level dict literal, such
+    as 'OPTIONS: BenchmarkOptions = {...}' and '@benchmark(prepare=..., **OPTIONS)'.
+    runbench.py finds options like this without importing the module.
+    """
+    compiled_only: bool
+    min_iterations: int | None
+    strip_outlier_runs: bool
+    stable_hash_seed: bool
+    compiled_variant: bool
+    estimator: str | None
+    multi_process: bool
+
+
 T = TypeVar("T")
 
 
@@ -48,7 +89,9 @@ def benchmark(
         min_iterations: int | None = None,
         strip_outlier_runs: bool = True,
         stable_hash_seed: bool = False,
-        compiled_variant: bool = False) -> Callable[[Callable[[], T]], Callable[[], T]]:
+        compiled_variant: bool = False,
+        estimator: str | None = None,
+        multi_process: bool = False) -> Callable[[Callable[[], T]], Callable[[], T]]:
     """Define a benchmark.
 
     Args:
@@ -63,13 +106,14 @@ def benchmark(
             between runs, but it's not random)
         compiled_variant: If True, this is the compiled variant of another, interpreted
             variant of the same benchmark (same def name)
+        estimator: Name of estimator used to calculate the typical runtime from
+            measurements (see reporting.stats.ESTIMATORS). By default, use 'smoothen' if
+            strip_outlier_runs is True, and 'mean' otherwise.
+        multi_process: If True, the benchmark runs multiple processes on purpose (such as
+            parallel workers), so system load and CPU time used by other processes are
+            not treated as interference (see reporting.noise)
     """
-    if prepare is None:
-        prepare_list: list[Callable[[str | None], None]] = []
-    elif callable(prepare):
-        prepare_list = [prepare]
-    else:
-        prepare_list = list(prepare)
+    prepare_list = get_prepare_list(prepare)
 
     def outer_wrapper(func: Callable[[], T]) -> Callable[[], T]:
         name = func_name(func)
@@ -87,6 +131,8 @@ def benchmark(
             strip_outlier_runs,
             stable_hash_seed,
             compiled_variant,
+            estimator,
+            multi_process,
         )
         benchmarks.append(benchmark)
         return func
@@ -94,16 +140,74 @@ def benchmark(
     return outer_wrapper
 
 
-# TODO: Merge with "benchmark"
+@overload
 def benchmark_with_context(
-        func: Callable[[BenchmarkContext], T]) -> Callable[[BenchmarkContext], T]:
-    name = func.__name__
-    if name.startswith('__mypyc_'):
-        name = name.replace('__mypyc_', '')
-        name = name.replace('_decorator_helper__', '')
-    benchmark = BenchmarkInfo(name, func.__module__, func, [], False, None, True, False, False)
-    benchmarks.append(benchmark)
-    return func
+        func: Callable[[BenchmarkContext], T]) -> Callable[[BenchmarkContext], T]: ...
+
+
+@overload
+def benchmark_with_context(
+        func: None = None,
+        *,
+        prepare: PrepareArg = None,
+        compiled_only: bool = False,
+        min_iterations: int | None = None,
+        strip_outlier_runs: bool = True,
+        stable_hash_seed: bool = False,
+        compiled_variant: bool = False,
+        estimator: str | None = None,
+        multi_process: bool = False,
+) -> Callable[[Callable[[BenchmarkContext], T]], Callable[[BenchmarkContext], T]]: ...
+
+
+def benchmark_with_context(
+        func: Callable[[BenchmarkContext], T] | None = None,
+        *,
+        prepare: PrepareArg = None,
+        compiled_only: bool = False,
+        min_iterations: int | None = None,
+        strip_outlier_runs: bool = True,
+        stable_hash_seed: bool = False,
+        compiled_variant: bool = False,
+        estimator: str | None = None,
+        multi_process: bool = False) -> Any:
+    """Define a benchmark that takes a BenchmarkContext argument.
+
+    This can be used as a decorator with or without arguments. The arguments
+    are the same as for 'benchmark'.
+    """
+    prepare_list = get_prepare_list(prepare)
+
+    def outer_wrapper(
+            func: Callable[[BenchmarkContext], T]) -> Callable[[BenchmarkContext], T]:
+        benchmark = BenchmarkInfo(
+            func_name(func),
+            func.__module__,
+            func,
+            prepare_list,
+            compiled_only,
+            min_iterations,
+            strip_outlier_runs,
+            stable_hash_seed,
+            compiled_variant,
+            estimator,
+            multi_process,
+        )
+        benchmarks.append(benchmark)
+        return func
+
+    if func is not None:
+        return outer_wrapper(func)
+    return outer_wrapper
+
+
+def get_prepare_list(prepare: PrepareArg) -> list[Callable[[str | None], None]]:
+    if prepare is None:
+        return []
+    elif callable(prepare):
+        return [prepare]
+    else:
+        return list(prepare)
 
 
 def run_once(benchmark_name: str) -> float:
@@ -115,6 +219,177 @@ def run_once(benchmark_name: str) -> float:
     assert False, "unknown benchmark: %r" % benchmark_name
 
 
+class MetricsCollector(ABC):
+    """Collect metrics other than runtime about a benchmark iteration."""
+
+    def start(self) -> None:
+        pass
+
+    @abstractmethod
+    def stop(self) -> dict[str, float]:
+        """Return metric values (metric name as key)."""
+
+
+class CountersCollector(MetricsCollector):
+    """Hardware performance counters (Linux only)."""
+
+    def __init__(self) -> None:
+        # Import here since this is only needed if counters are requested
+        from perfcounters import PerfCounters
+
+        self.counters = PerfCounters()
+
+    def start(self) -> None:
+        self.counters.start()
+
+    def stop(self) -> dict[str, float]:
+        result = self.counters.stop()
+        self.counters.close()
+        return result
+
+
+class RssCollector(MetricsCollector):
+    """Peak resident set size of the process and its subprocesses (not on Windows).
+
+    This includes memory used by interpreter startup and imports.
+    """
+
+    def stop(self) -> dict[str, float]:
+        import resource
+
+        peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        if sys.platform != 'darwin':
+            # Linux reports kilobytes, macOS bytes
+            peak *= 1024
+        return {'peak_rss': float(peak)}
+
+
+class TracemallocCollector(MetricsCollector):
+    """Peak traced memory and allocated memory blocks using tracemalloc.
+
+    Tracing slows down the benchmark considerably, so runtimes measured
+    together with this aren't comparable to normal runtimes.
+    """
+
+    def start(self) -> None:
+        import tracemalloc
+
+        self.blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+
+    def stop(self) -> dict[str, float]:
+        import tracemalloc
+
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'tracemalloc_peak': float(peak),
+            # Net change in the number of allocated memory blocks
+            'allocated_blocks': float(sys.getallocatedblocks() - self.blocks),
+        }
+
+
+class GcCollector(MetricsCollector):
+    """Cyclic garbage collector activity (collections, pause time, collected objects)."""
+
+    def start(self) -> None:
+        import gc
+
+        self.collections = [0, 0, 0]
+        self.pause = 0.0
+        self.collected = 0
+        self.gc_start = 0.0
+        gc.callbacks.append(self.callback)
+
+    def callback(self, phase: str, info: dict[str, int]) -> None:
+        if phase == 'start':
+            self.gc_start = time.perf_counter()
+        else:
+            self.pause += time.perf_counter() - self.gc_start
+            self.collections[info['generation']] += 1
+            self.collected += info['collected']
+
+    def stop(self) -> dict[str, float]:
+        import gc
+
+        gc.callbacks.remove(self.callback)
+        result = {'gc_gen%d_collections' % gen: float(n)
+                  for gen, n in enumerate(self.collections)}
+        result['gc_pause'] = self.pause
+        result['gc_collected'] = float(self.collected)
+        return result
+
+
+# Available metrics collectors (name -> constructor)
+collectors: dict[str, Callable[[], MetricsCollector]] = {
+    'counters': CountersCollector,
+    'gc': GcCollector,
+    'rss': RssCollector,
+    'tracemalloc': TracemallocCollector,
+}
+
+
+def run_once_with_metrics(benchmark_name: str, collector_names: Sequence[str]) -> None:
+    """Run a benchmark once and print the elapsed time and other metrics."""
+    for benchmark in benchmarks:
+        if benchmark.name == benchmark_name:
+            break
+    else:
+        assert False, "unknown benchmark: %r" % benchmark_name
+    active = [collectors[name]() for name in collector_names]
+    context = BenchmarkContext()
+    for collector in active:
+        collector.start()
+    context.start()
+    benchmark.perform(context)
+    elapsed = context.elapsed_time()
+    metrics: dict[str, float] = {}
+    for collector in reversed(active):
+        metrics.update(collector.stop())
+    metrics.update(context.metrics)
+    print("\nelapsed:", elapsed)
+    print("\nmetrics:", json.dumps(metrics))
+
+
+def run_once_profiled(benchmark_name: str, fnam: str) -> None:
+    """Run a benchmark once using cProfile and write profile data to a file."""
+    import cProfile
+
+    for benchmark in benchmarks:
+        if benchmark.name == benchmark_name:
+            break
+    else:
+        assert False, "unknown benchmark: %r" % benchmark_name
+    context = BenchmarkContext()
+    profile = cProfile.Profile()
+    profile.enable()
+    benchmark.perform(context)
+    profile.disable()
+    print("\nelapsed:", context.elapsed_time())
+    profile.dump_stats(fnam)
+
+
+def run_once_instrumented(benchmark_name: str, fnam: str) -> None:
+    """Run an instrumented benchmark once and write per-function statistics to a file.
+
+    See reporting.instrument for how benchmarks are instrumented.
+    """
+    from reporting import instrument
+
+    for benchmark in benchmarks:
+        if benchmark.name == benchmark_name:
+            break
+    else:
+        assert False, "unknown benchmark: %r" % benchmark_name
+    # Don't include calls during import
+    instrument.reset()
+    context = BenchmarkContext()
+    benchmark.perform(context)
+    print("\nelapsed:", context.elapsed_time())
+    instrument.write_stats(fnam, instrument.get_stats())
+
+
 def func_name(func: Callable[..., object]) -> str:
     name = func.__name__
     if name.startswith('__mypyc_'):
@@ -0,0 +1,263 @@
+"""Mypy cache I/O benchmarks.
+
+Read all metadata and data cache entries of a synthetic 1000-file codebase
+and write them to an empty cache, using the cache store implementation
+(mypy.metastore) of the mypy being benchmarked. No type checking is done,
+so this isolates the cost of cache I/O from the rest of an incremental run.
+
+* mypy_cache_io_json: file system cache using JSON (one file per cache entry;
+  --no-sqlite-cache --no-fixed-format-cache)
+* mypy_cache_io_fixed: file system cache using the binary fixed format
+  (--no-sqlite-cache --fixed-format-cache; only supported by newer mypy
+  versions, and older versions fail this benchmark)
+* mypy_cache_io_sqlite: sqlite cache (--sqlite-cache), with entries in the
+  default format of the mypy commit
+
+The runtime doesn't include interpreter startup or importing mypy. These
+metrics are recorded for both phases (read and write):
+
+* cache_<phase>_time: time spent (seconds)
+* cache_<phase>_bytes: bytes read or written by system calls (Linux only)
+* cache_<phase>_syscalls: number of read and write system calls (Linux only)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from benchmarking import BenchmarkContext, benchmark_with_context
+from benchmarks.mypy_self_check import VENV_DIR, VENV_PYTHON, prepare
+from benchmarks.synthetic_codebase import CodebaseSpec, write_codebase
+
+TMPDIR = 'mypy-cache-io.tmpdir'
+MYPY_BIN = os.path.abspath(os.path.join(VENV_DIR, 'bin', 'mypy'))
+SRC_DIR = os.path.join(TMPDIR, 'src')
+DRIVER_FILE = os.path.join(TMPDIR, 'cache_io_driver.py')
+
+NUM_PACKAGES = 10
+NUM_FILES_PER_PACKAGE = 100
+
+CODEBASE = CodebaseSpec(
+    num_packages=NUM_PACKAGES,
+    modules_per_package=NUM_FILES_PER_PACKAGE,
+    shape='dag',
+)
+
+# Mypy flags that select the cache store and format (backend name -> flags)
+BACKENDS = {
+    'json': ['--no-sqlite-cache', '--no-fixed-format-cache'],
+    'fixed': ['--no-sqlite-cache', '--fixed-format-cache'],
+    'sqlite': ['--sqlite-cache'],
+}
+
+# Older mypy versions only support JSON cache files and don't accept this flag
+FIXED_FORMAT_FLAGS = ('--fixed-format-cache', '--no-fixed-format-cache')
+
+# Run using the venv Python, since this imports mypy. The driver prints 'ready'
+# after imports, and does the I/O after it reads a line from stdin.
+DRIVER = '''\
+import inspect
+import json
+import sys
+import time
+
+from mypy.build import create_metastore
+from mypy.main import process_options
+
+
+def read_io():
+    try:
+        with open('/proc/self/io') as f:
+            return {key: int(value) for key, value in (line.split(':') for line in f)}
+    except OSError:
+        return None
+
+
+def get_options(cache_dir, flags):
+    _, options = process_options(flags + ['--cache-dir', cache_dir], require_targets=False)
+    return options
+
+
+def open_store(options):
+    try:
+        num_args = len(inspect.signature(create_metastore).parameters)
+    except ValueError:
+        # Functions compiled using older mypyc versions have no signature, and these
+        # mypy versions only take options
+        num_args = 1
+    if num_args > 1:
+        # Newer mypy versions also take parallel_worker
+        return create_metastore(options, False)
+    return create_metastore(options)
+
+
+def record(metrics, phase, t0, io0, io1, bytes_key):
+    metrics['cache_%s_time' % phase] = time.perf_counter() - t0
+    if io0 is not None and io1 is not None:
+        metrics['cache_%s_bytes' % phase] = io1[bytes_key] - io0[bytes_key]
+        metrics['cache_%s_syscalls' % phase] = (
+            io1['syscr'] + io1['syscw'] - io0['syscr'] - io0['syscw'])
+
+
+src_dir, dst_dir = sys.argv[1:3]
+flags = sys.argv[3:]
+src_options = get_options(src_dir, flags)
+dst_options = get_options(dst_dir, flags)
+print('ready', flush=True)
+sys.stdin.readline()
+metrics = {}
+
+t0 = time.perf_counter()
+io0 = read_io()
+src = open_store(src_options)
+entries = [(name, src.getmtime(name), src.read(name)) for name in sorted(src.list_all())]
+record(metrics, 'read', t0, io0, read_io(), 'rchar')
+
+t0 = time.perf_counter()
+io0 = read_io()
+dst = open_store(dst_options)
+for name, mtime, data in entries:
+    assert dst.write(name, data, mtime), name
+dst.commit()
+record(metrics, 'write', t0, io0, read_io(), 'wchar')
+
+metrics['cache_entries'] = len(entries)
+metrics['cache_size'] = sum(len(data) for _, _, data in entries)
+print(json.dumps(metrics), flush=True)
+'''
+
+
+def log(s: str) -> None:
+    sys.stderr.write(f'{s}\n')
+    sys.stderr.flush()
+
+
+def get_clean_env() -> dict[str, str]:
+    env = os.environ.copy()
+    env.pop('PYTHONPATH', None)
+    env.pop('MYPYPATH', None)
+    return env
+
+
+def get_cache_dir(backend: str) -> str:
+    return os.path.abspath(os.path.join(TMPDIR, f'cache_{backend}'))
+
+
+def get_output_dir(backend: str) -> str:
+    return os.path.abspath(os.path.join(TMPDIR, f'output_{backend}'))
+
+
+def supports_fixed_format_cache() -> bool:
+    result = subprocess.run([MYPY_BIN, '--help'], env=get_clean_env(), capture_output=True,
+                            text=True, check=True)
+    return 'fixed-format-cache' in result.stdout
+
+
+def get_backend_flags(backend: str, fixed_format: bool) -> list[str]:
+    """Return mypy flags for a backend (fixed_format tells if mypy supports the format)."""
+    if fixed_format:
+        return BACKENDS[backend]
+    if backend == 'fixed':
+        raise RuntimeError('this mypy version has no fixed-format cache')
+    return [flag for flag in BACKENDS[backend] if flag not in FIXED_FORMAT_FLAGS]
+
+
+def create_cache(backend: str, fixed_format: bool) -> None:
+    args = [MYPY_BIN, '--no-error-summary', '--cache-dir', get_cache_dir(backend)]
+    args += get_backend_flags(backend, fixed_format)
+    args += [f'pkg_{i:03d}/' for i in range(NUM_PACKAGES)]
+    result = subprocess.run(
+        args,
+        cwd=SRC_DIR,
+        env=get_clean_env(),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f'mypy failed:\n{result.stdout}\n{result.stderr}'
+        )
+
+
+def prepare_codebase(mypy_repo: str | None) -> None:
+    if os.path.isdir(TMPDIR):
+        shutil.rmtree(TMPDIR)
+    os.makedirs(TMPDIR)
+    write_codebase(CODEBASE, SRC_DIR)
+    with open(DRIVER_FILE, 'w') as f:
+        f.write(DRIVER)
+    fixed_format = supports_fixed_format_cache()
+    for backend in BACKENDS:
+        if backend == 'fixed' and not fixed_format:
+            log('skipping fixed-format cache (not supported by this mypy version)')
+            continue
+        log(f'running mypy to create {backend} cache')
+        create_cache(backend, fixed_format)
+
+
+def run_cache_io(ctx: BenchmarkContext, backend: str) -> None:
+    flags = get_backend_flags(backend, supports_fixed_format_cache())
+    output_dir = get_output_dir(backend)
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    proc = subprocess.Popen(
+        [VENV_PYTHON, os.path.abspath(DRIVER_FILE), get_cache_dir(backend), output_dir]
+        + flags,
+        cwd=SRC_DIR,
+        env=get_clean_env(),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert proc.stdin is not None and proc.stdout is not None
+    try:
+        assert proc.stdout.readline().strip() == 'ready'
+        ctx.start()
+        proc.stdin.write('\n')
+        proc.stdin.flush()
+        line = proc.stdout.readline()
+        ctx.stop()
+    finally:
+        proc.stdin.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(f'cache I/O driver failed with exit status {returncode}')
+    for name, value in json.loads(line).items():
+        ctx.record_metric(name, float(value))
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_cache_io_json(ctx: BenchmarkContext) -> None:
+    run_cache_io(ctx, 'json')
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_cache_io_fixed(ctx: BenchmarkContext) -> None:
+    run_cache_io(ctx, 'fixed')
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_cache_io_sqlite(ctx: BenchmarkContext) -> None:
+    run_cache_io(ctx, 'sqlite')
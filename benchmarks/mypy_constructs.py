@@ -0,0 +1,405 @@
+"""Mypy type checking throughput benchmarks for specific language constructs.
+
+Each benchmark type checks about 20,000 lines of generated code that mostly
+uses one kind of construct, so that a regression in a specific part of the
+type checker can be located:
+
+* generics: deep generic type inference (nested generic calls and lambdas)
+* overloads: calls to functions with large overload sets
+* typeddicts: construction and access of big TypedDicts
+* narrowing: long if/elif isinstance chains over big unions
+* protocols: structural subtype checks against protocols with many members
+* literals: big unions of literal types
+
+The code is split into modules of about 2,000 lines. Mypy runs without a cache.
+The number of lines checked per second (including mypy startup) is recorded
+as the metric lines_per_second.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import Callable
+
+from benchmarking import BenchmarkContext, benchmark_with_context
+from benchmarks.mypy_self_check import VENV_DIR, prepare
+
+TMPDIR = 'mypy-constructs.tmpdir'
+MYPY_BIN = os.path.abspath(os.path.join(VENV_DIR, 'bin', 'mypy'))
+
+# Approximate number of lines per category and per module
+NUM_LINES = 20000
+MODULE_LINES = 2000
+
+# Number of classes used as distinct types in each module
+NUM_CLASSES = 20
+
+
+def log(s: str) -> None:
+    sys.stderr.write(f'{s}\n')
+    sys.stderr.flush()
+
+
+def get_clean_env() -> dict[str, str]:
+    env = os.environ.copy()
+    env.pop('PYTHONPATH', None)
+    env.pop('MYPYPATH', None)
+    return env
+
+
+def gen_header() -> list[str]:
+    lines = [
+        'from __future__ import annotations',
+        '',
+        'from typing import (',
+        '    Callable, Generic, Literal, Protocol, TypedDict, TypeVar, Union, overload',
+        ')',
+        '',
+        "T = TypeVar('T')",
+        "S = TypeVar('S')",
+        "A = TypeVar('A')",
+        "B = TypeVar('B')",
+        "C = TypeVar('C')",
+        '',
+    ]
+    for j in range(NUM_CLASSES):
+        lines.append('')
+        lines.append(f'class K{j}:')
+        lines.append(f'    v{j}: int')
+        lines.append('')
+    return lines
+
+
+def gen_generics(i: int) -> list[str]:
+    return [
+        f'class Box_{i}(Generic[T]):',
+        '    def __init__(self, item: T) -> None:',
+        '        self.item = item',
+        '',
+        f'    def map(self, f: Callable[[T], S]) -> Box_{i}[S]:',
+        f'        return Box_{i}(f(self.item))',
+        '',
+        f'    def zip(self, other: Box_{i}[S]) -> Box_{i}[tuple[T, S]]:',
+        f'        return Box_{i}((self.item, other.item))',
+        '',
+        '',
+        f'def compose_{i}(f: Callable[[A], B], g: Callable[[B], C]) -> Callable[[A], C]:',
+        '    return lambda x: g(f(x))',
+        '',
+        '',
+        f'def pipeline_{i}(x: int) -> Box_{i}[list[tuple[str, int]]]:',
+        f'    return (Box_{i}(x)',
+        '            .map(lambda n: [n, n + 1, n * 2])',
+        '            .map(lambda xs: {str(v): v for v in xs})',
+        '            .map(lambda d: sorted(d.items())))',
+        '',
+        '',
+        f'def pairs_{i}(x: int, s: str) -> Box_{i}[tuple[tuple[int, str], list[str]]]:',
+        f'    return Box_{i}(x).zip(Box_{i}(s)).zip(Box_{i}(s).map(lambda t: [t, t.upper()]))',
+        '',
+        '',
+        f'nested_{i} = [[{{k: (v, [v], {{v}})}} for k, v in zip("abc", range(3))]',
+        '            for _ in range(2)]',
+        f'composed_{i} = compose_{i}(compose_{i}(len, lambda n: [n] * n), lambda xs: set(xs))',
+        f'result_{i}: set[int] = composed_{i}("abc")',
+        f'pipeline_result_{i} = [s.upper() for s, _ in pipeline_{i}({i}).item]',
+        f'pairs_result_{i} = pairs_{i}({i}, "x").map(lambda p: p[0][1] + p[1][0]).item',
+        '',
+        '',
+    ]
+
+
+def gen_overloads(i: int) -> list[str]:
+    lines = []
+    for j in range(NUM_CLASSES):
+        result = (j + 1) % NUM_CLASSES
+        lines.append('@overload')
+        lines.append(f'def convert_{i}(x: K{j}) -> K{result}: ...')
+    for j in range(NUM_CLASSES):
+        lines.append('@overload')
+        lines.append(f'def convert_{i}(x: list[K{j}]) -> dict[str, K{j}]: ...')
+    lines.append(f'def convert_{i}(x: object) -> object:')
+    lines.append('    return x')
+    lines.append('')
+    lines.append('')
+    lines.append(f'def use_convert_{i}() -> int:')
+    lines.append('    total = 0')
+    for j in range(NUM_CLASSES):
+        result = (j + 1) % NUM_CLASSES
+        lines.append(f'    total += convert_{i}(K{j}()).v{result}')
+        lines.append(f'    total += convert_{i}([K{j}()])["x"].v{j}')
+    lines.append('    return total')
+    lines.append('')
+    lines.append('')
+    return lines
+
+
+def gen_typeddicts(i: int) -> list[str]:
+    num_fields = 50
+    types = ['int', 'str', 'list[int]', 'dict[str, float]', 'bool']
+    lines = [f'class Record_{i}(TypedDict):']
+    for j in range(num_fields):
+        lines.append(f'    field_{j}: {types[j % len(types)]}')
+    lines.append('')
+    lines.append('')
+    lines.append(f'class ExtendedRecord_{i}(Record_{i}, total=False):')
+    lines.append('    extra: str')
+    lines.append('')
+    lines.append('')
+    values = ['1', '"s"', '[1, 2]', '{"a": 1.5}', 'True']
+    lines.append(f'def make_{i}() -> ExtendedRecord_{i}:')
+    lines.append('    return {')
+    for j in range(num_fields):
+        lines.append(f'        "field_{j}": {values[j % len(values)]},')
+    lines.append('    }')
+    lines.append('')
+    lines.append('')
+    lines.append(f'def read_{i}(r: ExtendedRecord_{i}) -> int:')
+    lines.append('    total = len(r.get("extra", ""))')
+    for j in range(0, num_fields, len(types)):
+        lines.append(f'    total += r["field_{j}"] + len(r["field_{j + 1}"])')
+        lines.append(f'    total += sum(r["field_{j + 2}"]) + int(r["field_{j + 3}"]["a"])')
+    lines.append('    return total')
+    lines.append('')
+    lines.append('')
+    return lines
+
+
+def gen_narrowing(i: int) -> list[str]:
+    union = ', '.join(f'K{j}' for j in range(NUM_CLASSES))
+    lines = [f'def narrow_{i}(x: Union[{union}, int, str, None]) -> int:']
+    lines.append('    if x is None:')
+    lines.append('        return -1')
+    lines.append('    elif isinstance(x, int):')
+    lines.append('        return x')
+    lines.append('    elif isinstance(x, str):')
+    lines.append('        return len(x)')
+    for j in range(NUM_CLASSES - 1):
+        lines.append(f'    elif isinstance(x, K{j}):')
+        lines.append(f'        return x.v{j}')
+    lines.append('    else:')
+    lines.append(f'        return x.v{NUM_CLASSES - 1}')
+    lines.append('')
+    lines.append('')
+    lines.append(f'def narrow_optional_{i}(a: int | None, b: str | None,')
+    lines.append('                        c: list[int] | None) -> int:')
+    lines.append('    if a is not None and b is not None:')
+    lines.append('        if c:')
+    lines.append('            return a + len(b) + c[0]')
+    lines.append('        return a + len(b)')
+    lines.append('    elif a is not None:')
+    lines.append('        return a')
+    lines.append('    elif b is not None and c is not None:')
+    lines.append('        return len(b) + len(c)')
+    lines.append('    return 0')
+    lines.append('')
+    lines.append('')
+    return lines
+
+
+def gen_protocols(i: int) -> list[str]:
+    num_members = 10
+    num_impls = 3
+    lines = [f'class Proto_{i}(Protocol):']
+    for j in range(num_members):
+        lines.append(f'    def m{j}(self, x: int) -> list[int]: ...')
+    lines.append('')
+    lines.append('    @property')
+    lines.append('    def name(self) -> str: ...')
+    lines.append('')
+    lines.append('')
+    for k in range(num_impls):
+        lines.append(f'class Impl_{i}_{k}:')
+        lines.append('    name = "impl"')
+        lines.append('')
+        for j in range(num_members):
+            lines.append(f'    def m{j}(self, x: int) -> list[int]:')
+            lines.append(f'        return [x, {j}]')
+            lines.append('')
+        lines.append('')
+    lines.append(f'def use_{i}(p: Proto_{i}, ps: list[Proto_{i}]) -> int:')
+    lines.append(f'    return len(p.m0(1)) + len(p.m{num_members - 1}(2)) + len(ps)')
+    lines.append('')
+    lines.append('')
+    impls = ', '.join(f'Impl_{i}_{k}()' for k in range(num_impls))
+    lines.append(f'total_{i} = use_{i}(Impl_{i}_0(), [{impls}])')
+    for k in range(num_impls):
+        lines.append(f'p_{i}_{k}: Proto_{i} = Impl_{i}_{k}()')
+    lines.append('')
+    lines.append('')
+    return lines
+
+
+def gen_literals(i: int) -> list[str]:
+    num_values = 100
+    lines = [f'Color_{i} = Literal[']
+    for j in range(num_values):
+        lines.append(f'    "color_{j}",')
+    lines.append(']')
+    lines.append('')
+    lines.append('')
+    lines.append(f'def pick_{i}(n: int) -> Color_{i}:')
+    lines.append('    if n == 0:')
+    lines.append('        return "color_0"')
+    lines.append('    elif n == 1:')
+    lines.append(f'        return "color_{num_values // 2}"')
+    lines.append(f'    return "color_{num_values - 1}"')
+    lines.append('')
+    lines.append('')
+    lines.append(f'def classify_{i}(c: Color_{i}) -> int:')
+    for j in range(0, num_values, 50):
+        lines.append(f'    if c == "color_{j}":')
+        lines.append(f'        return {j}')
+    lines.append('    return len(c)')
+    lines.append('')
+    lines.append('')
+    values = ', '.join(f'"color_{j}"' for j in range(0, num_values, 10))
+    lines.append(f'colors_{i}: list[Color_{i}] = [{values}]')
+    lines.append(f'mapping_{i}: dict[Color_{i}, int] = {{c: classify_{i}(c) for c in colors_{i}}}')
+    lines.append(f'picked_{i} = [pick_{i}(n) for n in range(3)] + colors_{i}')
+    lines.append('')
+    lines.append('')
+    return lines
+
+
+# Generators of code units (category name -> generator)
+CATEGORIES: dict[str, Callable[[int], list[str]]] = {
+    'generics': gen_generics,
+    'overloads': gen_overloads,
+    'typeddicts': gen_typeddicts,
+    'narrowing': gen_narrowing,
+    'protocols': gen_protocols,
+    'literals': gen_literals,
+}
+
+
+def get_src_dir(category: str) -> str:
+    return os.path.join(TMPDIR, category)
+
+
+def generate_category(category: str) -> int:
+    """Generate modules for a category and return the total number of lines."""
+    gen = CATEGORIES[category]
+    src_dir = get_src_dir(category)
+    if os.path.isdir(src_dir):
+        shutil.rmtree(src_dir)
+    os.makedirs(src_dir)
+    total = 0
+    unit = 0
+    module = 0
+    while total < NUM_LINES:
+        lines = gen_header()
+        while len(lines) < MODULE_LINES:
+            lines.extend(gen(unit))
+            unit += 1
+        with open(os.path.join(src_dir, f'mod_{module:03d}.py'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        total += len(lines)
+        module += 1
+    return total
+
+
+def count_lines(category: str) -> int:
+    src_dir = get_src_dir(category)
+    total = 0
+    for fnam in os.listdir(src_dir):
+        with open(os.path.join(src_dir, fnam)) as f:
+            total += sum(1 for _ in f)
+    return total
+
+
+def prepare_codebase(mypy_repo: str | None) -> None:
+    os.makedirs(TMPDIR, exist_ok=True)
+    for category in CATEGORIES:
+        lines = generate_category(category)
+        log(f'generated {lines} lines of code for {category}')
+
+
+def run_category(ctx: BenchmarkContext, category: str) -> None:
+    lines = count_lines(category)
+    ctx.start()
+    t0 = time.time()
+    result = subprocess.run(
+        [MYPY_BIN, '--no-error-summary', '--no-incremental', '--cache-dir', os.devnull,
+         '--show-traceback', '.'],
+        cwd=get_src_dir(category),
+        env=get_clean_env(),
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.time() - t0
+    if result.returncode != 0:
+        raise RuntimeError(
+            f'mypy failed:\n{result.stdout}\n{result.stderr}'
+        )
+    ctx.record_metric('lines_per_second', lines / elapsed)
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_constructs_generics(ctx: BenchmarkContext) -> None:
+    run_category(ctx, 'generics')
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_constructs_overloads(ctx: BenchmarkContext) -> None:
+    run_category(ctx, 'overloads')
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_constructs_typeddicts(ctx: BenchmarkContext) -> None:
+    run_category(ctx, 'typeddicts')
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_constructs_narrowing(ctx: BenchmarkContext) -> None:
+    run_category(ctx, 'narrowing')
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_constructs_protocols(ctx: BenchmarkContext) -> None:
+    run_category(ctx, 'protocols')
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_constructs_literals(ctx: BenchmarkContext) -> None:
+    run_category(ctx, 'literals')
@@ -0,0 +1,67 @@
+"""Mypy benchmarks that type check frozen corpora.
+
+Each benchmark type checks one corpus recorded in vendor/corpora.json (see
+reporting/corpora.py) using compiled mypy, like mypy_self_check. A corpus is
+never modified after it's frozen, so each benchmark is a consistent series:
+
+* mypy_corpus_mypy_v1: a frozen copy of the vendored mypy checked by
+  mypy_self_check (vendor/corpora/mypy_v1)
+
+A run fails if corpus files don't match the recorded hashes, or if mypy
+crashes. The number of errors reported is recorded as the metric mypy_errors,
+and a warning is logged if it differs from the number recorded when the corpus
+was frozen. To add a corpus, freeze it using 'python -m reporting.corpora
+freeze', and add a benchmark below.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+from benchmarking import BenchmarkContext, benchmark_with_context
+from benchmarks.mypy_self_check import VENV_DIR, prepare
+from reporting.corpora import (
+    check_output, count_errors, is_crash, load_corpora, run_mypy, verify_corpus
+)
+
+MYPY_BIN = os.path.join(VENV_DIR, 'bin', 'mypy')
+
+
+def log(s: str) -> None:
+    sys.stderr.write(f'{s}\n')
+    sys.stderr.flush()
+
+
+def prepare_corpora(mypy_repo: str | None) -> None:
+    problems = []
+    for corpus in load_corpora().values():
+        problems += verify_corpus(corpus)
+    if problems:
+        raise RuntimeError('corpora have been modified:\n' + '\n'.join(problems))
+
+
+def run_corpus(ctx: BenchmarkContext, name: str) -> None:
+    corpus = load_corpora()[name]
+    ctx.start()
+    status, stdout, stderr = run_mypy(MYPY_BIN, corpus)
+    ctx.stop()
+    if is_crash(status, stdout, stderr):
+        raise RuntimeError(
+            f'mypy failed:\n{stdout}\n{stderr}'
+        )
+    ctx.record_metric('mypy_errors', float(count_errors(stdout)))
+    warning = check_output(corpus, stdout)
+    if warning:
+        log(f'warning: {warning}')
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_corpora],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_corpus_mypy_v1(ctx: BenchmarkContext) -> None:
+    run_corpus(ctx, 'mypy_v1')
@@ -0,0 +1,175 @@
+"""Mypy daemon (dmypy) benchmark.
+
+Start a mypy daemon on a synthetic 1000-file codebase, and then apply a
+scripted sequence of edits, running 'dmypy recheck' after each one. This
+measures fine-grained incremental checking (mypy.server.update), which
+the other mypy benchmarks don't use.
+
+The edits are applied in this order:
+
+* body: change the body of a function in a module imported by all modules
+* signature: change the signature of a method in the same module, which
+  affects the class used by all modules
+* import: add a new import to a module in the middle of the codebase
+
+Starting the daemon and the initial check aren't included in the runtime,
+which is the total time of the rechecks. The time of each recheck is
+recorded as the metric dmypy_recheck_<edit>.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+from typing import NamedTuple
+
+from benchmarking import BenchmarkContext, benchmark_with_context
+from benchmarks.mypy_self_check import VENV_DIR, prepare
+from benchmarks.synthetic_codebase import (
+    CodebaseSpec, Module, class_name, gen_import_graph, get_modules, write_codebase
+)
+
+TMPDIR = 'mypy-daemon.tmpdir'
+DMYPY_BIN = os.path.abspath(os.path.join(VENV_DIR, 'bin', 'dmypy'))
+SRC_DIR = os.path.join(TMPDIR, 'src')
+STATUS_FILE = os.path.abspath(os.path.join(TMPDIR, 'dmypy.json'))
+
+NUM_PACKAGES = 10
+NUM_FILES_PER_PACKAGE = 100
+
+CODEBASE = CodebaseSpec(
+    num_packages=NUM_PACKAGES,
+    modules_per_package=NUM_FILES_PER_PACKAGE,
+    shape='dag',
+    hubs=1,
+)
+
+
+class Edit(NamedTuple):
+    name: str
+    module: Module
+    # Replace first occurrence of 'old' with 'new' in the module
+    old: str
+    new: str
+
+
+def log(s: str) -> None:
+    sys.stderr.write(f'{s}\n')
+    sys.stderr.flush()
+
+
+def get_clean_env() -> dict[str, str]:
+    env = os.environ.copy()
+    env.pop('PYTHONPATH', None)
+    env.pop('MYPYPATH', None)
+    return env
+
+
+def get_path(module: Module) -> str:
+    return os.path.join(SRC_DIR, module.package, f'{module.name}.py')
+
+
+def get_edits() -> list[Edit]:
+    modules = get_modules(CODEBASE)
+    graph = gen_import_graph(CODEBASE)
+    hub = modules[0]
+    target = modules[len(modules) // 2]
+    # An earlier module that the target doesn't import yet
+    dep = next(m for m in modules[1:] if m not in graph[target])
+    dep_cls = class_name(dep, 0)
+    return [
+        Edit('body',
+             hub,
+             'results.append(item.summarize())',
+             'results.append(item.summarize().upper())'),
+        Edit('signature',
+             hub,
+             'def summarize(self) -> str:',
+             'def summarize(self, verbose: bool = False) -> str:'),
+        Edit('import',
+             target,
+             'VERSION = ',
+             f'from {dep.package} import {dep.name} as added_dep\n\n\n'
+             + f'def added_convert(old: added_dep.{dep_cls}) -> int:\n'
+             + '    return old.value\n\n\n'
+             + 'VERSION = '),
+    ]
+
+
+def dmypy(*args: str) -> None:
+    result = subprocess.run(
+        [DMYPY_BIN, '--status-file', STATUS_FILE] + list(args),
+        cwd=SRC_DIR,
+        env=get_clean_env(),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f'dmypy {args[0]} failed:\n{result.stdout}\n{result.stderr}'
+        )
+
+
+def start_daemon() -> None:
+    dmypy('start', '--', '--no-error-summary', '--show-traceback')
+    dmypy('check', *[f'pkg_{i:03d}/' for i in range(NUM_PACKAGES)])
+
+
+def stop_daemon() -> None:
+    try:
+        dmypy('stop')
+    except RuntimeError:
+        dmypy('kill')
+
+
+def prepare_codebase(mypy_repo: str | None) -> None:
+    os.makedirs(TMPDIR, exist_ok=True)
+    write_codebase(CODEBASE, SRC_DIR)
+    log(f'generated {NUM_PACKAGES * NUM_FILES_PER_PACKAGE} source files in {NUM_PACKAGES} '
+        + 'packages')
+    if os.path.isfile(STATUS_FILE):
+        # A daemon may be left over from an interrupted run
+        try:
+            stop_daemon()
+        except RuntimeError:
+            pass
+        if os.path.isfile(STATUS_FILE):
+            os.remove(STATUS_FILE)
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+    multi_process=True,
+)
+def mypy_daemon(ctx: BenchmarkContext) -> None:
+    edits = get_edits()
+    original: dict[str, str] = {}
+    for edit in edits:
+        path = get_path(edit.module)
+        with open(path) as f:
+            original[path] = f.read()
+    start_daemon()
+    try:
+        ctx.start()
+        for edit in edits:
+            path = get_path(edit.module)
+            with open(path) as f:
+                content = f.read()
+            assert edit.old in content, f'{edit.old!r} not found in {path}'
+            with open(path, 'w') as f:
+                f.write(content.replace(edit.old, edit.new, 1))
+            t0 = time.time()
+            dmypy('recheck')
+            ctx.record_metric(f'dmypy_recheck_{edit.name}', time.time() - t0)
+        ctx.stop()
+    finally:
+        stop_daemon()
+        for path, content in original.items():
+            with open(path, 'w') as f:
+                f.write(content)
@@ -7,6 +7,11 @@ independent, so there is a lot of room for parallelism.
 
 Each file is relatively small, so the impact of per-file overhead,
 including synchronization overhead, is emphasized.
+
+The mypy_parallel_<n> variants run the same workload using 1, 2, 8 or all
+available CPUs (max) as the number of workers. Together with mypy_parallel
+(4 workers) they are used to calculate how type checking scales with the number
+of workers (see reporting.parallel).
 """
 
 from __future__ import annotations
@@ -18,6 +23,7 @@ import sys
 
 from benchmarking import benchmark
 from benchmarks.mypy_self_check import VENV_DIR, prepare
+from benchmarks.synthetic_codebase import CodebaseSpec, write_codebase
 
 TMPDIR = 'mypy-parallel.tmpdir'
 MYPY_BIN = os.path.abspath(os.path.join(VENV_DIR, 'bin', 'mypy'))
@@ -27,18 +33,12 @@ NUM_PACKAGES = 100
 NUM_FILES_PER_PACKAGE = 50
 CHAIN_LENGTH = 10
 
-STDLIB_IMPORTS = [
-    'os',
-    'sys',
-    'collections',
-    'typing',
-    'io',
-    'pathlib',
-    'json',
-    're',
-    'functools',
-    'itertools',
-]
+CODEBASE = CodebaseSpec(
+    num_packages=NUM_PACKAGES,
+    modules_per_package=NUM_FILES_PER_PACKAGE,
+    shape='chain',
+    chain_length=CHAIN_LENGTH,
+)
 
 
 def log(s: str) -> None:
@@ -53,110 +53,26 @@ def get_clean_env() -> dict[str, str]:
     return env
 
 
-def generate_module_source(pkg_index: int, file_index: int) -> str:
-    """Generate realistic-looking source for one module."""
-    pkg = f'pkg_{pkg_index:03d}'
-    lines: list[str] = ['from __future__ import annotations\n']
-
-    # 3 stdlib imports, varied per file
-    for i in range(3):
-        mod = STDLIB_IMPORTS[(pkg_index + file_index + i) % len(STDLIB_IMPORTS)]
-        lines.append(f'import {mod}')
-
-    # Import predecessor in the chain (groups of CHAIN_LENGTH form a chain)
-    chain_pos = file_index % CHAIN_LENGTH
-    if chain_pos > 0:
-        prev = f'mod_{file_index - 1:03d}'
-        lines.append(f'from {pkg} import {prev}')
-
-    lines.append('')
-    lines.append('')
-
-    # A constant
-    lines.append(f'VERSION = {pkg_index * 1000 + file_index}')
-    lines.append('')
-    lines.append('')
-
-    # A data class-like class
-    cls_name = f'Record_{file_index:03d}'
-    lines.append(f'class {cls_name}:')
-    lines.append(f'    label: str')
-    lines.append(f'    value: int')
-    lines.append(f'    active: bool')
-    lines.append('')
-    lines.append(f'    def __init__(self, label: str, value: int, active: bool = True) -> None:')
-    lines.append(f'        self.label = label')
-    lines.append(f'        self.value = value')
-    lines.append(f'        self.active = active')
-    lines.append('')
-    lines.append(f'    def summarize(self) -> str:')
-    lines.append(f'        status = "on" if self.active else "off"')
-    lines.append(f'        return f"{{self.label}}: {{self.value}} ({{status}})"')
-    lines.append('')
-    lines.append(f'    def double_value(self) -> int:')
-    lines.append(f'        return self.value * 2')
-    lines.append('')
-    lines.append('')
-
-    # A standalone function
-    fn_name = f'process_{file_index:03d}'
-    lines.append(f'def {fn_name}(items: list[{cls_name}], threshold: int) -> list[str]:')
-    lines.append(f'    results: list[str] = []')
-    lines.append(f'    for item in items:')
-    lines.append(f'        if item.active and item.value > threshold:')
-    lines.append(f'            results.append(item.summarize())')
-    lines.append(f'    return results')
-    lines.append('')
-    lines.append('')
-
-    # A helper function
-    lines.append(f'def make_{fn_name}(n: int) -> list[{cls_name}]:')
-    lines.append(f'    return [{cls_name}(f"item_{{i}}", i) for i in range(n)]')
-    lines.append('')
-
-    # Reference predecessor if in a chain
-    if chain_pos > 0:
-        prev_cls = f'Record_{file_index - 1:03d}'
-        lines.append('')
-        lines.append(f'def convert(old: {prev}.{prev_cls}) -> {cls_name}:')
-        lines.append(f'    return {cls_name}(old.label, old.value, old.active)')
-        lines.append('')
-
-    return '\n'.join(lines)
-
-
 def package_globs() -> list[str]:
     """Return the 100 per-package glob arguments for mypy."""
     return [f'pkg_{i:03d}/' for i in range(NUM_PACKAGES)]
 
 
 def generate_codebase() -> None:
-    """Generate the synthetic 10,000-file codebase."""
-    if os.path.isdir(SRC_DIR):
-        shutil.rmtree(SRC_DIR)
-
-    total = 0
-    for pkg_index in range(NUM_PACKAGES):
-        pkg = f'pkg_{pkg_index:03d}'
-        pkg_dir = os.path.join(SRC_DIR, pkg)
-        os.makedirs(pkg_dir, exist_ok=True)
-
-        with open(os.path.join(pkg_dir, '__init__.py'), 'w') as f:
-            f.write('')
+    """Generate the synthetic 5000-file codebase."""
+    write_codebase(CODEBASE, SRC_DIR)
+    log(f'generated {NUM_PACKAGES * NUM_FILES_PER_PACKAGE} source files in {NUM_PACKAGES} '
+        + 'packages')
 
-        for file_index in range(NUM_FILES_PER_PACKAGE):
-            mod_name = f'mod_{file_index:03d}.py'
-            path = os.path.join(pkg_dir, mod_name)
-            with open(path, 'w') as f:
-                f.write(generate_module_source(pkg_index, file_index))
-            total += 1
 
-    log(f'generated {total} source files in {NUM_PACKAGES} packages')
+def get_max_workers() -> int:
+    return os.cpu_count() or 1
 
 
-def run_mypy() -> None:
+def run_mypy(num_workers: int = 4, mypy_bin: str = MYPY_BIN) -> None:
     env = get_clean_env()
-    args = [MYPY_BIN, '--no-error-summary', '--show-traceback', '--num-workers', '4'] + package_globs()
+    args = [mypy_bin, '--no-error-summary', '--show-traceback',
+            '--num-workers', str(num_workers)] + package_globs()
     result = subprocess.run(
         args,
         cwd=SRC_DIR,
@@ -181,9 +97,61 @@ def prepare_codebase(mypy_repo: str | None) -> None:
     min_iterations=30,
     strip_outlier_runs=True,
     stable_hash_seed=True,
+    multi_process=True,
 )
 def mypy_parallel() -> None:
+    run_cold(4)
+
+
+def run_cold(num_workers: int, mypy_bin: str = MYPY_BIN) -> None:
     cache_dir = os.path.join(SRC_DIR, '.mypy_cache')
     if os.path.isdir(cache_dir):
         shutil.rmtree(cache_dir)
-    run_mypy()
+    run_mypy(num_workers, mypy_bin)
+
+
+@benchmark(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_parallel_1() -> None:
+    run_cold(1)
+
+
+@benchmark(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+    multi_process=True,
+)
+def mypy_parallel_2() -> None:
+    run_cold(2)
+
+
+@benchmark(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+    multi_process=True,
+)
+def mypy_parallel_8() -> None:
+    run_cold(8)
+
+
+@benchmark(
+    prepare=[prepare, prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+    multi_process=True,
+)
+def mypy_parallel_max() -> None:
+    run_cold(get_max_workers())
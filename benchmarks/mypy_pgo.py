@@ -0,0 +1,162 @@
+"""Mypy benchmarks using a profile-guided (PGO) build of compiled mypy.
+
+These run the same workloads as mypy_self_check, mypy_parallel and
+mypy_startup, but using mypy built in two passes:
+
+1. Build mypy with clang profile instrumentation, and run the self check,
+   parallel and startup workloads once to collect a profile
+2. Build mypy again, optimizing using the profile
+
+Compare mypy_<workload>_pgo to mypy_<workload> to see how much PGO helps.
+The PGO build is kept in a separate venv, and it's only built when one of
+these benchmarks is run. This needs llvm-profdata (included in LLVM).
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import shutil
+import subprocess
+import sys
+
+from benchmarking import benchmark
+from benchmarks import mypy_parallel, mypy_startup
+from benchmarks.mypy_self_check import (
+    TMPDIR, create_venv, get_build_env, get_mypy_repo_commit, install_mypy, is_cached_build_valid,
+    prepare, run_self_check, update_clone,
+)
+
+PGO_VENV_DIR = os.path.join(TMPDIR, 'venv-pgo')
+PGO_MYPY_BIN = os.path.abspath(os.path.join(PGO_VENV_DIR, 'bin', 'mypy'))
+PGO_CLONE = os.path.join(TMPDIR, 'mypy-pgo')
+PROFILE_DIR = os.path.join(TMPDIR, 'pgo-profile')
+MERGED_PROFILE = os.path.join(TMPDIR, 'pgo.profdata')
+
+# Records the commit of a completed PGO build, since an instrumented build from an
+# interrupted run would otherwise look like a valid build
+PGO_STAMP = os.path.join(PGO_VENV_DIR, 'pgo.stamp')
+
+
+def log(s: str) -> None:
+    sys.stderr.write(f'{s}\n')
+    sys.stderr.flush()
+
+
+def is_cached_pgo_build_valid(mypy_repo: str) -> bool:
+    if not os.path.isfile(PGO_STAMP):
+        return False
+    with open(PGO_STAMP) as f:
+        if f.read() != get_mypy_repo_commit(mypy_repo):
+            return False
+    return is_cached_build_valid(mypy_repo, PGO_VENV_DIR)
+
+
+def build_pgo_pass(cflags: str) -> None:
+    # ccache doesn't know about the profile, so it's not used. Remove the build
+    # directory, since object files built using other flags would be reused.
+    env = get_build_env(PGO_CLONE, use_ccache=False)
+    env['CFLAGS'] = cflags
+    # Instrumented mypy is run to verify the installation. Without this, it would
+    # write default.profraw to the current directory. Training removes PROFILE_DIR.
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    env['LLVM_PROFILE_FILE'] = os.path.abspath(os.path.join(PROFILE_DIR, 'build-%p.profraw'))
+    shutil.rmtree(os.path.join(PGO_CLONE, 'build'), ignore_errors=True)
+    install_mypy(PGO_VENV_DIR, PGO_CLONE, env)
+
+
+def train(mypy_repo: str) -> None:
+    """Run workloads using instrumented mypy to collect a profile."""
+    shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+    os.makedirs(PROFILE_DIR)
+    old = os.environ.get('LLVM_PROFILE_FILE')
+    # Each process and shared library writes a separate file
+    os.environ['LLVM_PROFILE_FILE'] = os.path.abspath(os.path.join(PROFILE_DIR, '%p-%m.profraw'))
+    try:
+        log('training: self check')
+        run_self_check(PGO_MYPY_BIN)
+        log('training: parallel')
+        mypy_parallel.prepare_codebase(mypy_repo)
+        mypy_parallel.run_cold(4, PGO_MYPY_BIN)
+        log('training: startup')
+        mypy_startup.prepare_codebase(mypy_repo)
+        for _ in range(5):
+            mypy_startup.write_src_file()
+            mypy_startup.run_mypy(PGO_MYPY_BIN)
+    finally:
+        if old is None:
+            del os.environ['LLVM_PROFILE_FILE']
+        else:
+            os.environ['LLVM_PROFILE_FILE'] = old
+
+
+def merge_profiles() -> None:
+    profdata = shutil.which('llvm-profdata')
+    if profdata is None:
+        raise RuntimeError('llvm-profdata not found (needed for PGO builds)')
+    profiles = glob.glob(os.path.join(PROFILE_DIR, '*.profraw'))
+    if not profiles:
+        raise RuntimeError(f'no profiles were written to {PROFILE_DIR}')
+    subprocess.run([profdata, 'merge', '-output', MERGED_PROFILE] + profiles, check=True)
+
+
+def prepare_pgo(mypy_repo: str | None) -> None:
+    """Build and install compiled mypy using PGO, unless it's already installed."""
+    assert mypy_repo
+    if is_cached_pgo_build_valid(mypy_repo):
+        log('reusing cached PGO mypy build')
+        return
+
+    os.makedirs(TMPDIR, exist_ok=True)
+    create_venv(mypy_repo, PGO_VENV_DIR)
+    update_clone(mypy_repo, PGO_CLONE)
+    if os.path.isfile(PGO_STAMP):
+        os.remove(PGO_STAMP)
+
+    log('building instrumented mypy (PGO pass 1)')
+    build_pgo_pass('-fprofile-instr-generate')
+    train(mypy_repo)
+    merge_profiles()
+
+    log('building mypy using profile (PGO pass 2)')
+    build_pgo_pass(f'-fprofile-instr-use={os.path.abspath(MERGED_PROFILE)} '
+                   + '-Wno-profile-instr-unprofiled -Wno-profile-instr-out-of-date')
+    with open(PGO_STAMP, 'w') as f:
+        f.write(get_mypy_repo_commit(mypy_repo))
+
+    log('successfully installed compiled mypy using PGO')
+
+
+@benchmark(
+    prepare=[prepare, prepare_pgo],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_self_check_pgo() -> None:
+    run_self_check(PGO_MYPY_BIN)
+
+
+@benchmark(
+    prepare=[prepare, prepare_pgo, mypy_parallel.prepare_codebase],
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+    multi_process=True,
+)
+def mypy_parallel_pgo() -> None:
+    mypy_parallel.run_cold(4, PGO_MYPY_BIN)
+
+
+@benchmark(
+    prepare=[prepare, prepare_pgo, mypy_startup.prepare_codebase],
+    compiled_only=True,
+    min_iterations=50,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_startup_pgo() -> None:
+    mypy_startup.write_src_file()
+    mypy_startup.run_mypy(PGO_MYPY_BIN)
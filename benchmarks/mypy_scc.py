@@ -0,0 +1,191 @@
+"""Mypy benchmarks with large import cycles.
+
+Type check synthetic codebases of 1000 modules where groups of modules form
+import cycles (strongly connected components, or SCCs). Mypy processes all
+modules of an SCC together, so large SCCs can't be processed in parallel, and
+a change to any module in an SCC causes the whole SCC to be processed again.
+
+Each workload is run using cycles of 10, 100 and 1000 modules (the number is
+the suffix of the benchmark name):
+
+* mypy_scc_cold_<n>: type check with a cold cache
+* mypy_scc_incremental_<n>: type check with a warm cache after changing a
+  module in the last SCC (no other SCC depends on it)
+* mypy_scc_parallel_<n>: type check with a cold cache using 4 workers
+
+Comparing the variants shows how the cost of SCC processing scales with
+the size of the cycle.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+from functools import partial
+
+from benchmarking import BenchmarkOptions, benchmark
+from benchmarks.mypy_self_check import VENV_DIR, prepare
+from benchmarks.synthetic_codebase import CodebaseSpec, write_codebase
+
+TMPDIR = 'mypy-scc.tmpdir'
+MYPY_BIN = os.path.abspath(os.path.join(VENV_DIR, 'bin', 'mypy'))
+
+NUM_PACKAGES = 10
+NUM_FILES_PER_PACKAGE = 100
+
+# Number of modules in each import cycle (one codebase per size)
+SCC_SIZES = [10, 100, 1000]
+
+# Cache directories (relative to the source directory)
+COLD_CACHE_DIR = '.mypy_cache_cold'
+WARM_CACHE_DIR = '.mypy_cache_warm'
+
+NUM_WORKERS = 4
+
+OPTIONS: BenchmarkOptions = {
+    'compiled_only': True,
+    'min_iterations': 30,
+    'strip_outlier_runs': True,
+    'stable_hash_seed': True,
+}
+
+# Parallel workers aren't interference (see reporting.noise)
+PARALLEL_OPTIONS: BenchmarkOptions = {
+    'compiled_only': True,
+    'min_iterations': 30,
+    'strip_outlier_runs': True,
+    'stable_hash_seed': True,
+    'multi_process': True,
+}
+
+
+def log(s: str) -> None:
+    sys.stderr.write(f'{s}\n')
+    sys.stderr.flush()
+
+
+def get_clean_env() -> dict[str, str]:
+    env = os.environ.copy()
+    env.pop('PYTHONPATH', None)
+    env.pop('MYPYPATH', None)
+    return env
+
+
+def get_spec(scc_size: int) -> CodebaseSpec:
+    return CodebaseSpec(
+        num_packages=NUM_PACKAGES,
+        modules_per_package=NUM_FILES_PER_PACKAGE,
+        shape='scc',
+        scc_size=scc_size,
+    )
+
+
+def get_src_dir(scc_size: int) -> str:
+    return os.path.join(TMPDIR, f'scc_{scc_size}')
+
+
+def get_edited_module(scc_size: int) -> str:
+    """Return path of the module changed in incremental runs (in the last SCC)."""
+    pkg = f'pkg_{NUM_PACKAGES - 1:03d}'
+    mod = f'mod_{NUM_FILES_PER_PACKAGE - 1:03d}'
+    return os.path.join(get_src_dir(scc_size), pkg, f'{mod}.py')
+
+
+def run_mypy(scc_size: int, cache_dir: str, num_workers: int | None = None) -> None:
+    args = [MYPY_BIN, '--no-error-summary', '--show-traceback', '--cache-dir', cache_dir]
+    if num_workers is not None:
+        args += ['--num-workers', str(num_workers)]
+    args += [f'pkg_{i:03d}/' for i in range(NUM_PACKAGES)]
+    result = subprocess.run(
+        args,
+        cwd=get_src_dir(scc_size),
+        env=get_clean_env(),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f'mypy failed:\n{result.stdout}\n{result.stderr}'
+        )
+
+
+def run_cold(scc_size: int, num_workers: int | None = None) -> None:
+    cache_dir = os.path.join(get_src_dir(scc_size), COLD_CACHE_DIR)
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+    run_mypy(scc_size, COLD_CACHE_DIR, num_workers)
+
+
+def run_incremental(scc_size: int) -> None:
+    target_path = get_edited_module(scc_size)
+    with open(target_path) as f:
+        original_content = f.read()
+    try:
+        with open(target_path, 'w') as f:
+            f.write(original_content)
+            f.write(f'\n_timestamp = "{time.time()}"\n')
+        run_mypy(scc_size, WARM_CACHE_DIR)
+    finally:
+        with open(target_path, 'w') as f:
+            f.write(original_content)
+
+
+def prepare_codebase(scc_size: int, mypy_repo: str | None) -> None:
+    os.makedirs(TMPDIR, exist_ok=True)
+    write_codebase(get_spec(scc_size), get_src_dir(scc_size))
+    log(f'generated {NUM_PACKAGES * NUM_FILES_PER_PACKAGE} source files with import '
+        + f'cycles of {scc_size} modules')
+
+
+def prepare_warm_cache(scc_size: int, mypy_repo: str | None) -> None:
+    prepare_codebase(scc_size, mypy_repo)
+    log('running mypy to create warm cache')
+    run_mypy(scc_size, WARM_CACHE_DIR)
+
+
+@benchmark(prepare=[prepare, partial(prepare_codebase, 10)], **OPTIONS)
+def mypy_scc_cold_10() -> None:
+    run_cold(10)
+
+
+@benchmark(prepare=[prepare, partial(prepare_codebase, 100)], **OPTIONS)
+def mypy_scc_cold_100() -> None:
+    run_cold(100)
+
+
+@benchmark(prepare=[prepare, partial(prepare_codebase, 1000)], **OPTIONS)
+def mypy_scc_cold_1000() -> None:
+    run_cold(1000)
+
+
+@benchmark(prepare=[prepare, partial(prepare_warm_cache, 10)], **OPTIONS)
+def mypy_scc_incremental_10() -> None:
+    run_incremental(10)
+
+
+@benchmark(prepare=[prepare, partial(prepare_warm_cache, 100)], **OPTIONS)
+def mypy_scc_incremental_100() -> None:
+    run_incremental(100)
+
+
+@benchmark(prepare=[prepare, partial(prepare_warm_cache, 1000)], **OPTIONS)
+def mypy_scc_incremental_1000() -> None:
+    run_incremental(1000)
+
+
+@benchmark(prepare=[prepare, partial(prepare_codebase, 10)], **PARALLEL_OPTIONS)
+def mypy_scc_parallel_10() -> None:
+    run_cold(10, NUM_WORKERS)
+
+
+@benchmark(prepare=[prepare, partial(prepare_codebase, 100)], **PARALLEL_OPTIONS)
+def mypy_scc_parallel_100() -> None:
+    run_cold(100, NUM_WORKERS)
+
+
+@benchmark(prepare=[prepare, partial(prepare_codebase, 1000)], **PARALLEL_OPTIONS)
+def mypy_scc_parallel_1000() -> None:
+    run_cold(1000, NUM_WORKERS)
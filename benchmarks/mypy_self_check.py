@@ -6,7 +6,9 @@ being benchmarked, compiled using the version of mypyc being benchmarked.
 This can be used to track changes in both the performance of mypy and mypyc.
 
 Note that it may be necessary to occasionally make tweaks to the vendored
-copy, in case it starts generating many errors, etc.
+copy, in case it starts generating many errors, etc. Use mypy_corpus_mypy_v1
+(see mypy_corpus), which checks a frozen copy, for a series that always checks
+the same code.
 """
 
 from __future__ import annotations
@@ -28,6 +30,12 @@ VENV_PYTHON = os.path.abspath(os.path.join(VENV_DIR, 'bin', 'python'))
 
 MYPY_CLONE = os.path.join(TMPDIR, 'mypy')
 
+# Compiler cache used when building mypy (if ccache is installed)
+CCACHE_DIR = os.path.join(TMPDIR, 'ccache')
+
+# File in a venv with the installed requirements (used to detect changed requirements)
+REQUIREMENTS_STAMP = 'requirements.stamp'
+
 # PEP 561 requirements for type checking (pinned for consistent runtimes)
 CHECK_REQUIREMENTS = [
     "attrs==22.1.0",
@@ -58,9 +66,10 @@ def get_mypy_repo_commit(mypy_repo: str) -> str:
     return result.stdout.strip()
 
 
-def get_installed_mypy_version(env: dict[str, str] | None = None) -> str | None:
+def get_installed_mypy_version(env: dict[str, str] | None = None,
+                               venv_dir: str = VENV_DIR) -> str | None:
     """Run mypy --version and return the output, or None on failure."""
-    mypy_bin = os.path.join(VENV_DIR, 'bin', 'mypy')
+    mypy_bin = os.path.join(venv_dir, 'bin', 'mypy')
     if env is None:
         env = os.environ.copy()
         env.pop('PYTHONPATH', None)
@@ -78,9 +87,9 @@ def get_installed_mypy_version(env: dict[str, str] | None = None) -> str | None:
     return out.stdout.strip()
 
 
-def is_cached_build_valid(mypy_repo: str) -> bool:
+def is_cached_build_valid(mypy_repo: str, venv_dir: str = VENV_DIR) -> bool:
     """Check if there's an existing compiled mypy matching the current repo commit."""
-    version_str = get_installed_mypy_version()
+    version_str = get_installed_mypy_version(venv_dir=venv_dir)
     if version_str is None:
         return False
     if 'compiled: no' in version_str:
@@ -95,23 +104,33 @@ def is_cached_build_valid(mypy_repo: str) -> bool:
     return repo_commit.startswith(installed_commit) or installed_commit.startswith(repo_commit)
 
 
-def prepare(mypy_repo: str | None) -> None:
-    assert mypy_repo
-    assert os.path.isdir(mypy_repo)
-    assert os.path.isdir(os.path.join(mypy_repo, '.git'))
-
-    if is_cached_build_valid(mypy_repo):
-        log('reusing cached compiled mypy build')
-        return
-
-    if os.path.isdir(TMPDIR):
-        shutil.rmtree(TMPDIR)
-
-    log(f'creating venv in {os.path.abspath(VENV_DIR)}')
-    subprocess.run([sys.executable, '-m', 'venv', VENV_DIR], check=True)
+def get_requirements_stamp(mypy_repo: str) -> str:
+    """Return contents of mypy requirements files (to detect changed requirements)."""
+    parts = []
+    for fnam in sorted(os.listdir(mypy_repo)):
+        if fnam.endswith('requirements.txt'):
+            with open(os.path.join(mypy_repo, fnam)) as f:
+                parts.append(f'{fnam}\n{f.read()}')
+    return '\n'.join(parts)
+
+
+def create_venv(mypy_repo: str, venv_dir: str = VENV_DIR) -> None:
+    """Create a virtualenv, or update dependencies if mypy requirements changed."""
+    if not os.path.isfile(os.path.join(venv_dir, 'bin', 'python')):
+        log(f'creating venv in {os.path.abspath(venv_dir)}')
+        if os.path.isdir(venv_dir):
+            shutil.rmtree(venv_dir)
+        subprocess.run([sys.executable, '-m', 'venv', venv_dir], check=True)
+    stamp = get_requirements_stamp(mypy_repo)
+    stamp_file = os.path.join(venv_dir, REQUIREMENTS_STAMP)
+    if os.path.isfile(stamp_file):
+        with open(stamp_file) as f:
+            if f.read() == stamp:
+                log('reusing venv')
+                return
 
     log('installing dependencies')
-    pip = os.path.join(VENV_DIR, 'bin', 'pip')
+    pip = os.path.join(venv_dir, 'bin', 'pip')
     subprocess.run([pip, 'install', '-U', 'pip'], check=True)
 
     # TODO: Remove if/when setuptools is added to test-requirements.txt
@@ -119,13 +138,37 @@ def prepare(mypy_repo: str | None) -> None:
 
     reqs = os.path.join(mypy_repo, 'test-requirements.txt')
     subprocess.run([pip, 'install', '-r', reqs], check=True)
+    with open(stamp_file, 'w') as f:
+        f.write(stamp)
 
-    log('cloning mypy')
-    subprocess.run(['git', 'clone', mypy_repo, MYPY_CLONE], check=True)
 
-    log('building and installing mypy')
+def update_clone(mypy_repo: str, clone_dir: str = MYPY_CLONE) -> None:
+    """Check out the current commit of mypy_repo in clone_dir.
+
+    An existing clone is reused, including the build directory, so that generated
+    C files that didn't change keep their timestamps.
+    """
+    if not os.path.isdir(os.path.join(clone_dir, '.git')):
+        log('cloning mypy')
+        subprocess.run(['git', 'clone', mypy_repo, clone_dir], check=True)
+        return
+    log('updating mypy clone')
+    subprocess.run(['git', 'fetch', '--quiet', os.path.abspath(mypy_repo), 'HEAD'],
+                   cwd=clone_dir, check=True)
+    subprocess.run(['git', 'checkout', '--quiet', '--force', '--detach', 'FETCH_HEAD'],
+                   cwd=clone_dir, check=True)
+    subprocess.run(['git', 'clean', '-q', '-f', '-d', '-x', '-e', '/build/'],
+                   cwd=clone_dir, check=True)
+
+
+def get_build_env(clone_dir: str = MYPY_CLONE, use_ccache: bool = True) -> dict[str, str]:
     env = os.environ.copy()
     env["CC"] = "clang"
+    if use_ccache and shutil.which('ccache'):
+        # Only C files that changed since the previous build get compiled
+        env["CC"] = "ccache clang"
+        env["CCACHE_DIR"] = os.path.abspath(CCACHE_DIR)
+        env["CCACHE_BASEDIR"] = os.path.abspath(clone_dir)
     # Use -O2 since it's a bit faster to compile. The runtimes might be also be more
     # predictable than with -O3, but that's just a hypothesis.
     env["MYPYC_OPT_LEVEL"] = "2"
@@ -133,45 +176,92 @@ def prepare(mypy_repo: str | None) -> None:
         del env["PYTHONPATH"]
     if "MYPYPATH" in env:
         del env["MYPYPATH"]
+    return env
+
+
+def prepare(mypy_repo: str | None) -> None:
+    """Build and install compiled mypy from mypy_repo, unless it's already installed.
+
+    The venv, the mypy clone, the build directory and the ccache directory (if
+    ccache is installed) are kept in TMPDIR between builds of different commits,
+    so that only changed C files are recompiled. Set MYPYC_MULTI_FILE=1 to
+    generate a C file per module, which makes rebuilds faster, but the
+    compiled code may be slower than with the default single-file build.
+    """
+    assert mypy_repo
+    assert os.path.isdir(mypy_repo)
+    assert os.path.isdir(os.path.join(mypy_repo, '.git'))
+
+    if is_cached_build_valid(mypy_repo):
+        log('reusing cached compiled mypy build')
+        return
+
+    os.makedirs(TMPDIR, exist_ok=True)
+    create_venv(mypy_repo)
+    update_clone(mypy_repo)
+
+    env = get_build_env()
+    log('building and installing mypy%s' % (' (using ccache)' if 'ccache' in env['CC'] else ''))
+    install_mypy(VENV_DIR, MYPY_CLONE, env)
+
+    log('successfully installed compiled mypy')
+
+
+def install_mypy(venv_dir: str, clone_dir: str, env: dict[str, str]) -> None:
+    """Build compiled mypy in clone_dir and install it in the venv."""
+    python = os.path.abspath(os.path.join(venv_dir, 'bin', 'python'))
+    # Remove the previous build first, since 'setup.py install' doesn't replace it
+    subprocess.run([python, '-m', 'pip', 'uninstall', '--quiet', '-y', 'mypy'],
+                   env=env)
     subprocess.run(
-        [VENV_PYTHON, 'setup.py', '--use-mypyc', 'install'],
-        cwd=MYPY_CLONE,
+        [python, 'setup.py', '--use-mypyc', 'install'],
+        cwd=clone_dir,
         check=True,
         env=env,
     )
 
     log('verifying that we can run mypy')
-    out = subprocess.run([os.path.join(VENV_DIR, 'bin', 'mypy'), '--version'], capture_output=True,
+    out = subprocess.run([os.path.join(venv_dir, 'bin', 'mypy'), '--version'], capture_output=True,
                          text=True, check=True, env=env)
     assert 'compiled: no' not in out.stdout
 
     log('installing dependencies for type checking')
-    subprocess.run([VENV_PYTHON, '-m', 'pip', 'install'] + CHECK_REQUIREMENTS, check=True, env=env)
+    subprocess.run([python, '-m', 'pip', 'install'] + CHECK_REQUIREMENTS, check=True, env=env)
 
-    log('successfully installed compiled mypy')
 
-
-@benchmark(
-    prepare=prepare,
-    compiled_only=True,
-    min_iterations=30,
-    strip_outlier_runs=True,
-    stable_hash_seed=True,
-)
-def mypy_self_check() -> None:
+def run_self_check(mypy_bin: str) -> None:
     assert os.path.isdir('vendor')
     env = os.environ.copy()
     if 'PYTHONPATH' in env:
         del env['PYTHONPATH']
     if 'MYPYPATH' in env:
         del env['MYPYPATH']
-    subprocess.run(
+    result = subprocess.run(
         [
-            os.path.join(VENV_DIR, 'bin', 'mypy'),
+            mypy_bin,
             '--config-file',
             'vendor/mypy/mypy_self_check.ini',
             '--no-incremental',
             'vendor/mypy/mypy',
         ],
         env=env,
+        capture_output=True,
+        text=True,
     )
+    # Newer mypy versions may report errors in the vendored copy (exit status 1),
+    # but crashes and blocking errors (exit status 2) are failures
+    if result.returncode not in (0, 1):
+        raise RuntimeError(
+            f'mypy failed:\n{result.stdout}\n{result.stderr}'
+        )
+
+
+@benchmark(
+    prepare=prepare,
+    compiled_only=True,
+    min_iterations=30,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_self_check() -> None:
+    run_self_check(os.path.join(VENV_DIR, 'bin', 'mypy'))
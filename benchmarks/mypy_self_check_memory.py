@@ -0,0 +1,99 @@
+"""Mypy self check memory benchmark.
+
+Type check the vendored copy of mypy like mypy_self_check, and record the
+memory use of compiled mypy at the end of the check, while the results of
+the build are still alive:
+
+* mypy_peak_rss: peak resident set size (bytes; not on Windows)
+* mypy_objects: number of objects tracked by the garbage collector,
+  including instances of native classes
+* mypy_allocated_blocks: number of memory blocks allocated by the Python
+  allocator
+* mypy_error_lines: number of lines of error messages (newer mypy versions
+  may report errors in the vendored copy)
+
+The runtime includes counting objects and is less reliable than the
+runtime of mypy_self_check.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+
+from benchmarking import BenchmarkContext, benchmark_with_context
+from benchmarks.mypy_self_check import TMPDIR, VENV_PYTHON, prepare
+
+DRIVER_FILE = os.path.join(TMPDIR, 'memory_driver.py')
+
+# Run using the venv Python, since this imports mypy. This runs the build like
+# 'mypy' does, but it keeps the result alive when measuring.
+DRIVER = '''\
+import gc
+import json
+import sys
+
+from mypy import build
+from mypy.main import process_options
+
+sys.setrecursionlimit(2**14)
+sources, options = process_options(sys.argv[1:])
+result = build.build(sources, options)
+gc.collect()
+metrics = {
+    'mypy_objects': len(gc.get_objects()),
+    'mypy_allocated_blocks': sys.getallocatedblocks(),
+    'mypy_error_lines': len(result.errors),
+}
+if sys.platform != 'win32':
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        # Linux reports kilobytes, macOS bytes
+        peak *= 1024
+    metrics['mypy_peak_rss'] = peak
+print(json.dumps(metrics), flush=True)
+'''
+
+
+def prepare_driver(mypy_repo: str | None) -> None:
+    with open(DRIVER_FILE, 'w') as f:
+        f.write(DRIVER)
+
+
+@benchmark_with_context(
+    prepare=[prepare, prepare_driver],
+    compiled_only=True,
+    min_iterations=10,
+    strip_outlier_runs=True,
+    stable_hash_seed=True,
+)
+def mypy_self_check_memory(ctx: BenchmarkContext) -> None:
+    assert os.path.isdir('vendor')
+    env = os.environ.copy()
+    if 'PYTHONPATH' in env:
+        del env['PYTHONPATH']
+    if 'MYPYPATH' in env:
+        del env['MYPYPATH']
+    result = subprocess.run(
+        [
+            VENV_PYTHON,
+            DRIVER_FILE,
+            '--config-file',
+            'vendor/mypy/mypy_self_check.ini',
+            '--no-incremental',
+            'vendor/mypy/mypy',
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f'mypy failed:\n{result.stdout}\n{result.stderr}'
+        )
+    for name, value in json.loads(result.stdout).items():
+        ctx.record_metric(name, float(value))
@@ -42,10 +42,10 @@ def write_src_file() -> None:
         f.write(f'print("{time.time()}")\n')
 
 
-def run_mypy() -> None:
+def run_mypy(mypy_bin: str = MYPY_BIN) -> None:
     env = get_clean_env()
     result = subprocess.run(
-        [MYPY_BIN, '--no-error-summary', '--config-file', os.path.abspath(CONFIG_FILE),
+        [mypy_bin, '--no-error-summary', '--config-file', os.path.abspath(CONFIG_FILE),
          os.path.abspath(SRC_FILE)],
         cwd=TMPDIR,
         env=env,
@@ -0,0 +1,257 @@
+"""Generator of synthetic codebases for mypy benchmarks.
+
+A codebase consists of packages pkg_000, pkg_001, ... that each contain
+modules mod_000, mod_001, ... Each module has some classes and functions
+that refer to types defined in the modules it imports, so that mypy has to
+process the dependencies of a module before the module itself.
+
+The shape of the import graph is configurable:
+
+* 'chain': modules within each package form linear import chains
+* 'dag': each module imports randomly chosen earlier modules, and
+  optionally a few "hub" modules imported by all modules (high fan-in)
+* 'scc': groups of modules form import cycles (strongly connected
+  components), and each cycle imports a module from the previous cycle
+
+Generated code only depends on the spec (including the random seed), so
+results are reproducible.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import shutil
+from typing import NamedTuple
+
+SHAPES = ('chain', 'dag', 'scc')
+
+STDLIB_IMPORTS = [
+    'os',
+    'sys',
+    'collections',
+    'typing',
+    'io',
+    'pathlib',
+    'json',
+    're',
+    'functools',
+    'itertools',
+]
+
+
+class CodebaseSpec(NamedTuple):
+    num_packages: int
+    modules_per_package: int
+    # Import graph shape (see SHAPES)
+    shape: str = 'chain'
+    # Length of each import chain ('chain')
+    chain_length: int = 10
+    # Number of earlier modules imported by each module ('dag')
+    fan_out: int = 3
+    # Number of modules imported by all other modules ('dag')
+    hubs: int = 0
+    # Number of modules in each import cycle ('scc')
+    scc_size: int = 10
+    classes_per_module: int = 1
+    functions_per_module: int = 1
+    # Also define and use a generic class in each module
+    generics: bool = False
+    # Number of stdlib modules imported by each module
+    stdlib_imports: int = 3
+    seed: int = 0
+
+
+class Module(NamedTuple):
+    pkg_index: int
+    file_index: int
+
+    @property
+    def package(self) -> str:
+        return f'pkg_{self.pkg_index:03d}'
+
+    @property
+    def name(self) -> str:
+        return f'mod_{self.file_index:03d}'
+
+    @property
+    def fullname(self) -> str:
+        return f'{self.package}.{self.name}'
+
+
+def get_modules(spec: CodebaseSpec) -> list[Module]:
+    return [Module(p, f)
+            for p in range(spec.num_packages)
+            for f in range(spec.modules_per_package)]
+
+
+def gen_import_graph(spec: CodebaseSpec) -> dict[Module, list[Module]]:
+    """Return modules imported by each module."""
+    assert spec.shape in SHAPES, f'unknown shape {spec.shape!r}'
+    rng = random.Random(spec.seed)
+    modules = get_modules(spec)
+    graph: dict[Module, list[Module]] = {}
+    for i, module in enumerate(modules):
+        deps: list[Module] = []
+        if spec.shape == 'chain':
+            if module.file_index % spec.chain_length > 0:
+                deps.append(modules[i - 1])
+        elif spec.shape == 'dag':
+            deps.extend(hub for hub in modules[:min(spec.hubs, i)])
+            candidates = list(range(spec.hubs, i))
+            for j in sorted(rng.sample(candidates, min(spec.fan_out, len(candidates)))):
+                deps.append(modules[j])
+        else:
+            start = i - i % spec.scc_size
+            end = min(start + spec.scc_size, len(modules))
+            if end - start > 1:
+                # The last module of the cycle imports the first one
+                deps.append(modules[i + 1] if i + 1 < end else modules[start])
+            if i == start and start > 0:
+                deps.append(modules[rng.randrange(start - spec.scc_size, start)])
+        graph[module] = deps
+    return graph
+
+
+def import_alias(module: Module, dep: Module) -> str:
+    if dep.package == module.package:
+        return dep.name
+    return f'{dep.package}_{dep.name}'
+
+
+def class_name(module: Module, index: int) -> str:
+    if index == 0:
+        return f'Record_{module.file_index:03d}'
+    return f'Record_{module.file_index:03d}_{index}'
+
+
+def gen_class(lines: list[str], name: str) -> None:
+    lines.append(f'class {name}:')
+    lines.append(f'    label: str')
+    lines.append(f'    value: int')
+    lines.append(f'    active: bool')
+    lines.append('')
+    lines.append(f'    def __init__(self, label: str, value: int, active: bool = True) -> None:')
+    lines.append(f'        self.label = label')
+    lines.append(f'        self.value = value')
+    lines.append(f'        self.active = active')
+    lines.append('')
+    lines.append(f'    def summarize(self) -> str:')
+    lines.append(f'        status = "on" if self.active else "off"')
+    lines.append(f'        return f"{{self.label}}: {{self.value}} ({{status}})"')
+    lines.append('')
+    lines.append(f'    def double_value(self) -> int:')
+    lines.append(f'        return self.value * 2')
+    lines.append('')
+    lines.append('')
+
+
+def gen_generic_class(lines: list[str], module: Module) -> None:
+    cls = class_name(module, 0)
+    box = f'Box_{module.file_index:03d}'
+    lines.append(f'class {box}(Generic[T]):')
+    lines.append(f'    def __init__(self, item: T) -> None:')
+    lines.append(f'        self.item = item')
+    lines.append('')
+    lines.append(f'    def get(self) -> T:')
+    lines.append(f'        return self.item')
+    lines.append('')
+    lines.append(f'    def map(self, f: Callable[[T], S]) -> {box}[S]:')
+    lines.append(f'        return {box}(f(self.item))')
+    lines.append('')
+    lines.append('')
+    lines.append(f'def box_all(items: list[{cls}]) -> list[{box}[int]]:')
+    lines.append(f'    return [{box}(item).map(lambda r: r.double_value()) for item in items]')
+    lines.append('')
+    lines.append('')
+
+
+def generate_module_source(spec: CodebaseSpec, module: Module, deps: list[Module]) -> str:
+    """Generate realistic-looking source for one module."""
+    lines: list[str] = ['from __future__ import annotations\n']
+
+    for i in range(spec.stdlib_imports):
+        mod = STDLIB_IMPORTS[(module.pkg_index + module.file_index + i) % len(STDLIB_IMPORTS)]
+        lines.append(f'import {mod}')
+    if spec.generics:
+        lines.append('from typing import Callable, Generic, TypeVar')
+
+    for dep in deps:
+        alias = import_alias(module, dep)
+        if alias == dep.name:
+            lines.append(f'from {dep.package} import {dep.name}')
+        else:
+            lines.append(f'from {dep.package} import {dep.name} as {alias}')
+
+    lines.append('')
+    lines.append('')
+
+    if spec.generics:
+        lines.append("T = TypeVar('T')")
+        lines.append("S = TypeVar('S')")
+        lines.append('')
+        lines.append('')
+
+    # A constant
+    lines.append(f'VERSION = {module.pkg_index * 1000 + module.file_index}')
+    lines.append('')
+    lines.append('')
+
+    cls_name = class_name(module, 0)
+    for i in range(spec.classes_per_module):
+        gen_class(lines, class_name(module, i))
+
+    if spec.generics:
+        gen_generic_class(lines, module)
+
+    for i in range(spec.functions_per_module):
+        suffix = '' if i == 0 else f'_{i}'
+        if i > 0:
+            lines.append('')
+        fn_name = f'process_{module.file_index:03d}{suffix}'
+        lines.append(f'def {fn_name}(items: list[{cls_name}], threshold: int) -> list[str]:')
+        lines.append(f'    results: list[str] = []')
+        lines.append(f'    for item in items:')
+        lines.append(f'        if item.active and item.value > threshold:')
+        lines.append(f'            results.append(item.summarize())')
+        lines.append(f'    return results')
+        lines.append('')
+        lines.append('')
+
+        lines.append(f'def make_{fn_name}(n: int) -> list[{cls_name}]:')
+        lines.append(f'    return [{cls_name}(f"item_{{i}}", i) for i in range(n)]')
+        lines.append('')
+
+    # Refer to types in imported modules
+    for i, dep in enumerate(deps):
+        suffix = '' if i == 0 else f'_{i}'
+        alias = import_alias(module, dep)
+        dep_cls = class_name(dep, 0)
+        lines.append('')
+        lines.append(f'def convert{suffix}(old: {alias}.{dep_cls}) -> {cls_name}:')
+        lines.append(f'    return {cls_name}(old.label, old.value, old.active)')
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+def write_codebase(spec: CodebaseSpec, src_dir: str) -> list[str]:
+    """Generate a codebase under src_dir (replacing any existing files).
+
+    Return the names of the generated packages.
+    """
+    if os.path.isdir(src_dir):
+        shutil.rmtree(src_dir)
+    graph = gen_import_graph(spec)
+    packages = []
+    for pkg_index in range(spec.num_packages):
+        pkg = f'pkg_{pkg_index:03d}'
+        os.makedirs(os.path.join(src_dir, pkg), exist_ok=True)
+        with open(os.path.join(src_dir, pkg, '__init__.py'), 'w') as f:
+            f.write('')
+        packages.append(pkg)
+    for module, deps in graph.items():
+        path = os.path.join(src_dir, module.package, f'{module.name}.py')
+        with open(path, 'w') as f:
+            f.write(generate_module_source(spec, module, deps))
+    return packages
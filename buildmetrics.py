@@ -0,0 +1,96 @@
+"""Compile a module using mypyc and record build metrics.
+
+Usage: python buildmetrics.py OUTPUT_JSON FILE
+
+This is equivalent to "python -m mypyc FILE", but this also measures the time
+spent in each phase of compilation (type checking, IR building, C code
+generation and C compilation) and counts lines of generated C code. The metrics
+are written to OUTPUT_JSON.
+
+Phases are timed by wrapping mypyc internals. If the mypyc version used is
+structured differently, the affected phases are left out from the results.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+# Total time (seconds) spent in each wrapped function (name of phase as key)
+timings: dict[str, float] = {}
+
+
+def time_function(module: object, name: str, phase: str) -> None:
+    func: Callable[..., Any] | None = getattr(module, name, None)
+    if func is None:
+        return
+    wrapped = func
+
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return wrapped(*args, **kwargs)
+        finally:
+            timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - t0
+
+    setattr(module, name, wrapper)
+
+
+def count_lines(dir_name: str) -> int:
+    """Count lines in all C source and header files in a directory (recursively)."""
+    lines = 0
+    for root, _, files in os.walk(dir_name):
+        for fnam in files:
+            if fnam.endswith(('.c', '.h')):
+                with open(os.path.join(root, fnam), 'rb') as f:
+                    lines += f.read().count(b'\n')
+    return lines
+
+
+def main() -> None:
+    output, fnam = sys.argv[1:]
+
+    from setuptools import setup
+    from mypyc.build import mypycify
+    from mypyc.codegen import emitmodule
+
+    time_function(emitmodule, 'parse_and_typecheck', 'typecheck')
+    time_function(emitmodule, 'build_ir', 'irbuild')
+    # This includes both IR building and C code generation
+    time_function(emitmodule, 'compile_modules_to_c', 'compile_to_c')
+
+    with tempfile.TemporaryDirectory() as target_dir:
+        t0 = time.perf_counter()
+        # Use the same defaults as "python -m mypyc"
+        ext_modules = mypycify([fnam],
+                               opt_level=os.getenv('MYPYC_OPT_LEVEL', '3'),
+                               debug_level=os.getenv('MYPYC_DEBUG_LEVEL', '1'),
+                               target_dir=target_dir)
+        t1 = time.perf_counter()
+        c_lines = count_lines(target_dir)
+        setup(name='mypyc_output',
+              ext_modules=ext_modules,
+              script_args=['build_ext', '--inplace'])
+        t2 = time.perf_counter()
+
+    metrics = {
+        'build_mypyc_time': t1 - t0,
+        'build_c_compile_time': t2 - t1,
+        'c_lines': float(c_lines),
+    }
+    if 'typecheck' in timings:
+        metrics['build_typecheck_time'] = timings['typecheck']
+    if 'irbuild' in timings and 'compile_to_c' in timings:
+        metrics['build_irbuild_time'] = timings['irbuild']
+        metrics['build_codegen_time'] = timings['compile_to_c'] - timings['irbuild']
+    with open(output, 'w') as f:
+        json.dump(metrics, f)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+# Frozen corpora (see reporting/corpora.py) may contain copies of test modules that
+# are also collected elsewhere, such as the vendored copy of mypy
+collect_ignore = ['vendor/corpora']
@@ -0,0 +1,118 @@
+"""Read hardware performance counters using the Linux perf_event_open system call.
+
+This is used in the benchmark process to count events such as retired
+instructions around a single benchmark iteration (see the 'counters' metrics
+collector in benchmarking.py). Only user-space events are counted, which is
+allowed with the default kernel.perf_event_paranoid setting of 2.
+
+Events in subprocesses started by the benchmark are included once the
+subprocesses have exited.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import fcntl
+import os
+import platform
+import struct
+
+# perf_event_open syscall numbers for each architecture
+SYSCALL_NUMBERS = {
+    'x86_64': 298,
+    'i386': 336,
+    'i686': 336,
+    'aarch64': 241,
+    'armv7l': 364,
+    'ppc64le': 319,
+    's390x': 331,
+    'riscv64': 241,
+}
+
+PERF_TYPE_HARDWARE = 0
+
+# Counter name -> PERF_TYPE_HARDWARE config value
+HARDWARE_EVENTS = {
+    'cycles': 0,
+    'instructions': 1,
+    'cache_misses': 3,
+    'branch_misses': 5,
+}
+
+# Bits of the flags bit field in struct perf_event_attr
+FLAG_DISABLED = 1 << 0
+FLAG_INHERIT = 1 << 1
+FLAG_EXCLUDE_KERNEL = 1 << 5
+FLAG_EXCLUDE_HV = 1 << 6
+
+PERF_FLAG_FD_CLOEXEC = 1 << 3
+
+PERF_EVENT_IOC_ENABLE = 0x2400
+PERF_EVENT_IOC_DISABLE = 0x2401
+PERF_EVENT_IOC_RESET = 0x2403
+
+# Size of the first published version of struct perf_event_attr (PERF_ATTR_SIZE_VER0)
+PERF_ATTR_SIZE = 64
+
+
+class PerfCounterError(Exception):
+    pass
+
+
+def make_event_attr(config: int) -> bytes:
+    flags = FLAG_DISABLED | FLAG_INHERIT | FLAG_EXCLUDE_KERNEL | FLAG_EXCLUDE_HV
+    # type, size, config, sample_period, sample_type, read_format, flags,
+    # wakeup_events, bp_type, config1
+    return struct.pack('=IIQQQQQIIQ', PERF_TYPE_HARDWARE, PERF_ATTR_SIZE, config,
+                       0, 0, 0, flags, 0, 0, 0)
+
+
+def perf_event_open(config: int) -> int:
+    syscall_number = SYSCALL_NUMBERS.get(platform.machine())
+    if syscall_number is None:
+        raise PerfCounterError(f'unsupported architecture: {platform.machine()}')
+    libc = ctypes.CDLL(None, use_errno=True)
+    attr = ctypes.create_string_buffer(make_event_attr(config), PERF_ATTR_SIZE)
+    # Count events for this process (pid 0) on any CPU (-1), without an event group (-1)
+    fd = libc.syscall(syscall_number, attr, 0, -1, -1, PERF_FLAG_FD_CLOEXEC)
+    if fd < 0:
+        errno = ctypes.get_errno()
+        raise PerfCounterError(
+            f'perf_event_open failed: {os.strerror(errno)} (check '
+            + '/proc/sys/kernel/perf_event_paranoid, or run in a VM with PMU access)')
+    return fd
+
+
+class PerfCounters:
+    """Counters for multiple hardware events of the current process."""
+
+    def __init__(self, events: list[str] | None = None) -> None:
+        if events is None:
+            events = list(HARDWARE_EVENTS)
+        self.fds: dict[str, int] = {}
+        try:
+            for event in events:
+                self.fds[event] = perf_event_open(HARDWARE_EVENTS[event])
+        except PerfCounterError:
+            self.close()
+            raise
+
+    def start(self) -> None:
+        for fd in self.fds.values():
+            fcntl.ioctl(fd, PERF_EVENT_IOC_RESET, 0)
+        for fd in self.fds.values():
+            fcntl.ioctl(fd, PERF_EVENT_IOC_ENABLE, 0)
+
+    def stop(self) -> dict[str, float]:
+        for fd in self.fds.values():
+            fcntl.ioctl(fd, PERF_EVENT_IOC_DISABLE, 0)
+        result = {}
+        for event, fd in self.fds.items():
+            value, = struct.unpack('=Q', os.read(fd, 8))
+            result[event] = float(value)
+        return result
+
+    def close(self) -> None:
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
@@ -3,12 +3,15 @@
 Run "python3 -m reporting.collect --help" for more information.
 """
 
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict
 from datetime import datetime, UTC
 import argparse
+import json
 import os
+import statistics
 import subprocess
 import sys
+import tempfile
 
 from reporting.gitutil import (
     get_commit_range,
@@ -18,12 +21,17 @@ from reporting.gitutil import (
 )
 from reporting.data import write_csv_line
 from reporting.common import get_csv_path, CC
+from reporting.metrics import write_metrics
 
 
 # Minimum number of iterations for an interpreted benchmark (this needs to be high,
 # since interpreted measurements are noisier than compiled)
 MIN_INTERPRETED_ITER = 300
 
+# Metrics with these prefixes describe the state of the machine (see reporting.noise),
+# not the benchmark, so they aren't recorded
+EXCLUDED_METRIC_PREFIXES = ('noise_',)
+
 
 def min_interpreted_iterations(benchmark: str) -> int:
     if benchmark == 'binary_trees':
@@ -35,39 +43,92 @@ def min_interpreted_iterations(benchmark: str) -> int:
 
 def run_bench(benchmark: str,
               mypy_repo: Optional[str],
-              compiled: bool = True) -> Tuple[float, float]:
+              compiled: bool = True) -> Tuple[float, float, str]:
     """Run benchmark (in compiled or interpreted mode).
 
-    Return (time per iteration, % standard deviation).
+    Return (time per iteration, % standard deviation, name of estimator).
+    """
+    runtime, stdev, _, estimator = run_bench_with_metrics(benchmark, mypy_repo, compiled)
+    return runtime, stdev, estimator
+
+
+def run_bench_with_metrics(benchmark: str,
+                           mypy_repo: Optional[str],
+                           compiled: bool = True,
+                           counters: bool = False,
+                           build_metrics: bool = False
+                           ) -> Tuple[float, float, Dict[str, float], str]:
+    """Run benchmark (in compiled or interpreted mode).
+
+    Return (time per iteration, % standard deviation, other metrics, name of
+    estimator used to calculate the time per iteration). The value of each metric
+    is the median over all iterations. If build_metrics is True, also measure
+    compilation of a compiled benchmark (this builds it using buildmetrics.py
+    instead of 'python -m mypyc').
     """
     env = os.environ.copy()
     if compiled:
         env['CC'] = CC
-    cmd = ['python', 'runbench.py', '--raw']
-    if mypy_repo:
-        cmd.extend(["--mypy-repo", mypy_repo])
-    if compiled:
-        cmd.append('-c')
-    else:
-        min_iter = min_interpreted_iterations(benchmark)
-        cmd.extend(['-i', '--min-iter', str(min_iter)])
-    cmd.append(benchmark)
-    try:
-        output = subprocess.check_output(cmd, env=env, text=True, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError as e:
-        # The benchmark run failed. Record zero values to signal than something
-        # is wrong.
-        print(f'!!! Running benchmark {benchmark} failed:')
-        print(e.output)
-        return 0.0, 0.0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, 'results.json')
+        # Rerun iterations disturbed by other system activity, so that a noisy
+        # machine doesn't cause fake regressions
+        cmd = ['python', 'runbench.py', '--raw', '--json', json_path, '--noise', 'reject']
+        if mypy_repo:
+            cmd.extend(["--mypy-repo", mypy_repo])
+        if counters:
+            cmd.append('--counters')
+        if compiled:
+            cmd.append('-c')
+            if build_metrics:
+                cmd.append('--build-metrics')
+        else:
+            min_iter = min_interpreted_iterations(benchmark)
+            cmd.extend(['-i', '--min-iter', str(min_iter)])
+        cmd.append(benchmark)
+        try:
+            output = subprocess.check_output(cmd, env=env, text=True, stderr=subprocess.STDOUT)
+        except subprocess.CalledProcessError as e:
+            # The benchmark run failed. Record zero values to signal than something
+            # is wrong.
+            print(f'!!! Running benchmark {benchmark} failed:')
+            print(e.output)
+            return 0.0, 0.0, {}, ''
+        metrics = read_metrics_from_json(json_path, compiled)
+        estimator = read_estimator_from_json(json_path)
     print('Benchmark output:')
     print(output.rstrip())
     last_line = output.rstrip().splitlines()[-1]
     fields = last_line.split()
     if compiled:
-        return float(fields[3]), 100.0 * float(fields[4]) / float(fields[3])
+        return float(fields[3]), 100.0 * float(fields[4]) / float(fields[3]), metrics, estimator
     else:
-        return float(fields[1]), 100.0 * float(fields[2]) / float(fields[1])
+        return float(fields[1]), 100.0 * float(fields[2]) / float(fields[1]), metrics, estimator
+
+
+def read_metrics_from_json(fnam: str, compiled: bool) -> Dict[str, float]:
+    """Read median metric values from runbench.py JSON output (for a single benchmark).
+
+    Build metrics (such as mypyc compile time) are included for compiled benchmarks.
+    Metrics about system noise are excluded.
+    """
+    with open(fnam) as f:
+        data = json.load(f)
+    benchmark = data['benchmarks'][0]
+    mode = benchmark['compiled' if compiled else 'interpreted']
+    if not mode:
+        return {}
+    result = {name: statistics.median(values) for name, values in mode['metrics'].items()
+              if not name.startswith(EXCLUDED_METRIC_PREFIXES)}
+    if compiled and benchmark.get('build'):
+        result.update(benchmark['build'])
+    return result
+
+
+def read_estimator_from_json(fnam: str) -> str:
+    with open(fnam) as f:
+        data = json.load(f)
+    return data['benchmarks'][0].get('estimator', '')
 
 
 def sync_typeshed(mypy_repo: str) -> None:
@@ -82,7 +143,7 @@ def install_mypy_deps(mypy_repo: str) -> None:
          '-r', 'test-requirements.txt'], cwd=mypy_repo)
 
 
-def parse_args() -> Tuple[str, str, str, str, str, bool]:
+def parse_args() -> Tuple[str, str, str, str, str, bool, bool, bool]:
     parser = argparse.ArgumentParser(
         description="""Run a mypyc benchmark for a range of commits, and append results to a .csv
                        file at the path '<data_repo>/data/<benchmark>.csv'. Note that this
@@ -100,6 +161,12 @@ def parse_args() -> Tuple[str, str, str, str, str, bool]:
     parser.add_argument("end_commit", help="final commit to include")
     parser.add_argument('--only-mypyc-commits', action='store_true',
                         help='only select commits with changes in mypyc/')
+    parser.add_argument('--counters', action='store_true',
+                        help="""also record hardware performance counters (stored under
+                                '<data_repo>/data/metrics/')""")
+    parser.add_argument('--build-metrics', action='store_true',
+                        help="""also record mypyc compile time and generated code size
+                                (stored under '<data_repo>/data/metrics/')""")
     args = parser.parse_args()
     return (
         args.benchmark,
@@ -108,11 +175,14 @@ def parse_args() -> Tuple[str, str, str, str, str, bool]:
         args.start_commit,
         args.end_commit,
         args.only_mypyc_commits,
+        args.counters,
+        args.build_metrics,
     )
 
 
 def main() -> None:
-    benchmark, mypy_repo, data_repo, start_commit, end_commit, only_mypyc_commits = parse_args()
+    (benchmark, mypy_repo, data_repo, start_commit, end_commit, only_mypyc_commits,
+     counters, build_metrics) = parse_args()
     mypy_commits = get_commit_range(mypy_repo, start_commit, end_commit)
     if only_mypyc_commits:
         mypy_commits = filter_commits_by_path(mypy_repo, mypy_commits, 'mypyc/')
@@ -125,9 +195,15 @@ def main() -> None:
         checkout_commit(mypy_repo, mypy_commit)
         sync_typeshed(mypy_repo)
         install_mypy_deps(mypy_repo)
-        runtime, stddev = run_bench(benchmark, mypy_repo)
+        runtime, stddev, metrics, estimator = run_bench_with_metrics(benchmark, mypy_repo,
+                                                                     counters=counters,
+                                                                     build_metrics=build_metrics)
         fnam = get_csv_path(data_repo, benchmark)
-        write_csv_line(fnam, benchmark, now, runtime, stddev, mypy_commit, benchmark_commit)
+        env_id = write_csv_line(fnam, benchmark, now, runtime, stddev, mypy_commit,
+                                benchmark_commit, estimator=estimator)
+        if metrics:
+            write_metrics(data_repo, benchmark, now, mypy_commit, benchmark_commit, env_id,
+                          metrics)
 
 
 if __name__ == "__main__":
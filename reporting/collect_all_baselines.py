@@ -7,13 +7,10 @@ import argparse
 import subprocess
 import sys
 
-from benchmarking import benchmarks
-from runbench import import_all
+from runbench import build_benchmark_index
 
 
 def main() -> None:
-    import_all()
-
     parser = argparse.ArgumentParser(
         description="Collect baselines for all benchmarks; store results in <data_repo>/data"
     )
@@ -23,7 +20,10 @@ def main() -> None:
     args = parser.parse_args()
     data_repo: str = args.data_repo
 
-    for benchmark in benchmarks:
+    for benchmark in build_benchmark_index():
+        if benchmark.compiled_variant:
+            # The baseline is collected using the interpreted variant
+            continue
         print(f"== Collecting baseline for {benchmark.name} ==\n")
         cmd = [
             sys.executable,
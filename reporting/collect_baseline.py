@@ -31,9 +31,10 @@ def main() -> None:
     benchmark, data_repo = parse_args()
     now = datetime.now(UTC)
     benchmark_commit = get_current_commit(".")
-    runtime, stddev = run_bench(benchmark, None, compiled=False)
+    runtime, stddev, estimator = run_bench(benchmark, None, compiled=False)
     fnam = get_csv_path(data_repo, benchmark, cpython=True)
-    write_csv_line(fnam, benchmark, now, runtime, stddev, "", benchmark_commit)
+    write_csv_line(fnam, benchmark, now, runtime, stddev, "", benchmark_commit,
+                   estimator=estimator)
 
 
 if __name__ == "__main__":
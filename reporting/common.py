@@ -1,8 +1,10 @@
 from typing import Tuple
 from datetime import datetime
 import os
+import platform
 import re
 import subprocess
+import sys
 
 
 # Use clang as the C compiler since it tends to generate faster code than gcc.
@@ -33,31 +35,51 @@ def get_csv_path(data_repo: str, benchmark: str, cpython: bool = False) -> str:
     return os.path.join(data_dir, benchmark + '.csv')
 
 
+# Hardware ids of configurations that were used before hardware ids were derived
+# from CPU model names automatically (substring of CPU model -> hardware id)
+LEGACY_HARDWARE_IDS = {
+    'i5-1145G7': 'Intel Core i5-1145G7 (64-bit)',
+    'i7-2600K': 'Intel Core i7-2600K (64-bit)',
+    'Ryzen 9 3950X': 'AMD Ryzen 9 3950X (64-bit)',
+}
+
+
 def get_hardware_id() -> str:
-    arch = subprocess.check_output(['uname', '-m']).strip()
-    fnam = '/proc/cpuinfo'
-    if arch == b'x86_64' and os.path.exists(fnam):
-        with open(fnam) as f:
-            data = f.read()
-        if 'i5-1145G7' in data:
-            # Special case for the current server hardware configuration.
-            return 'Intel Core i5-1145G7 (64-bit)'
-        if 'i7-2600K' in data:
-            # Special case for the previous server hardware configuration.
-            return 'Intel Core i7-2600K (64-bit)'
-        if 'Ryzen 9 3950X' in data:
-            # Another special casing.
-            return 'AMD Ryzen 9 3950X (64-bit)'
-    # Give up if it's not a known configuration.
-    return 'UNKNOWN'
+    # Import here to avoid an import cycle
+    from reporting.environment import get_cpu_model
+
+    model = get_cpu_model()
+    if not model:
+        return 'UNKNOWN'
+    for key, hardware_id in LEGACY_HARDWARE_IDS.items():
+        if key in model:
+            return hardware_id
+    bits = '64-bit' if sys.maxsize > 2**32 else '32-bit'
+    return '%s (%s)' % (model, bits)
 
 
 def get_os_version() -> str:
-    output = subprocess.check_output(['lsb_release', '-d']).decode("ascii")
+    try:
+        output = subprocess.check_output(['lsb_release', '-d']).decode("ascii")
+    except (OSError, subprocess.CalledProcessError):
+        return get_os_release_name()
     output = output.strip()
     return ' '.join(output.split()[1:])
 
 
+def get_os_release_name() -> str:
+    """Fallback for get_os_version if lsb_release is not available."""
+    try:
+        with open('/etc/os-release') as f:
+            for line in f:
+                key, _, value = line.strip().partition('=')
+                if key == 'PRETTY_NAME':
+                    return value.strip('"')
+    except OSError:
+        pass
+    return platform.platform(terse=True)
+
+
 def get_c_compiler_version(cc: str) -> str:
     output = subprocess.check_output([cc, '--version']).decode("utf-8")
     # This seems to work for gcc and clang, at least.
@@ -0,0 +1,225 @@
+"""Manage frozen corpora type checked by the mypy_corpus_* benchmarks.
+
+A corpus is a fixed snapshot of a typed project. The manifest (vendor/corpora.json)
+records for each corpus the files to type check, the mypy config file, a SHA-256
+hash of each file and the number of errors reported by mypy when the corpus was
+frozen. A frozen corpus is never modified. If it needs changes, for example since
+newer mypy versions report many new errors, freeze it again under a new name (such
+as mypy_v2), so that each benchmark series always checks the same code.
+
+A different number of errors doesn't invalidate results, since mypy changes may add
+or fix diagnostics, but it's reported (see check_output).
+
+Usage:
+
+  python -m reporting.corpora list
+  python -m reporting.corpora verify [NAME ...]
+  python -m reporting.corpora freeze NAME ROOT --target PATH [--config-file FILE] --mypy BIN
+
+Paths are relative to the root of this repository.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+
+
+MANIFEST = os.path.join('vendor', 'corpora.json')
+
+# These aren't part of a corpus, even if they exist under the corpus root
+IGNORED_DIRS = ('__pycache__', '.mypy_cache')
+IGNORED_SUFFIXES = ('.pyc', '.pyo')
+
+# Matches 'path:line: error: ...' and 'path:line:column: error: ...'
+ERROR_RE = re.compile(r'^[^\n:]+:\d+:(?:\d+:)? error: ', re.MULTILINE)
+
+TRACEBACK = 'Traceback (most recent call last)'
+
+
+class Corpus(NamedTuple):
+    name: str
+    # Directory with all files of the corpus
+    root: str
+    # Files and directories to type check
+    targets: List[str]
+    config_file: Optional[str]
+    # Path relative to root -> SHA-256 hash of contents
+    files: Dict[str, str]
+    expected_errors: int
+    # Output of 'mypy --version' when the corpus was frozen
+    frozen_with: str
+
+
+def hash_file(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def hash_tree(root: str) -> Dict[str, str]:
+    """Return hashes of all files under root (keys use '/' as the separator)."""
+    hashes = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in IGNORED_DIRS)
+        for fnam in filenames:
+            if fnam.endswith(IGNORED_SUFFIXES):
+                continue
+            path = os.path.join(dirpath, fnam)
+            rel = os.path.relpath(path, root).replace(os.sep, '/')
+            hashes[rel] = hash_file(path)
+    return dict(sorted(hashes.items()))
+
+
+def load_corpora(fnam: str = MANIFEST) -> Dict[str, Corpus]:
+    with open(fnam) as f:
+        data = json.load(f)
+    return {name: Corpus(name=name, **item) for name, item in data.items()}
+
+
+def save_corpora(corpora: Dict[str, Corpus], fnam: str = MANIFEST) -> None:
+    data = {}
+    for name, corpus in sorted(corpora.items()):
+        item = corpus._asdict()
+        del item['name']
+        data[name] = item
+    with open(fnam, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+
+def verify_corpus(corpus: Corpus) -> List[str]:
+    """Compare corpus files to recorded hashes and return a list of problems."""
+    if not os.path.isdir(corpus.root):
+        return ['%s: directory %s not found' % (corpus.name, corpus.root)]
+    problems = []
+    actual = hash_tree(corpus.root)
+    for path, digest in corpus.files.items():
+        if path not in actual:
+            problems.append('%s: missing file %s' % (corpus.name, path))
+        elif actual[path] != digest:
+            problems.append('%s: modified file %s' % (corpus.name, path))
+    for path in actual:
+        if path not in corpus.files:
+            problems.append('%s: unexpected file %s' % (corpus.name, path))
+    return problems
+
+
+def get_mypy_args(corpus: Corpus) -> List[str]:
+    args = []
+    if corpus.config_file:
+        args += ['--config-file', corpus.config_file]
+    return args + ['--no-incremental', '--no-error-summary', '--show-traceback'] + corpus.targets
+
+
+def run_mypy(mypy_bin: str, corpus: Corpus) -> Tuple[int, str, str]:
+    """Type check a corpus and return (exit status, stdout, stderr)."""
+    env = os.environ.copy()
+    env.pop('PYTHONPATH', None)
+    env.pop('MYPYPATH', None)
+    result = subprocess.run([mypy_bin] + get_mypy_args(corpus),
+                            env=env,
+                            capture_output=True,
+                            text=True)
+    return result.returncode, result.stdout, result.stderr
+
+
+def count_errors(output: str) -> int:
+    return len(ERROR_RE.findall(output))
+
+
+def is_crash(status: int, stdout: str, stderr: str) -> bool:
+    """Did mypy crash or report a blocking error?
+
+    Errors in the corpus (exit status 1) aren't crashes, since newer mypy versions
+    may report new errors.
+    """
+    return status not in (0, 1) or TRACEBACK in stdout or TRACEBACK in stderr
+
+
+def check_output(corpus: Corpus, output: str) -> Optional[str]:
+    """Check mypy output for a corpus and return a warning, if any.
+
+    If the number of errors changed, mypy may do different work than when the corpus
+    was frozen. A few new or fixed errors don't matter much, but if there are many,
+    consider freezing a new version of the corpus.
+    """
+    errors = count_errors(output)
+    if errors != corpus.expected_errors:
+        return ('%s: expected %d errors but mypy reported %d (the corpus was frozen with %s)' % (
+            corpus.name, corpus.expected_errors, errors, corpus.frozen_with))
+    return None
+
+
+def freeze_corpus(name: str, root: str, targets: List[str], config_file: Optional[str],
+                  mypy_bin: str) -> Corpus:
+    """Create a corpus, recording file hashes and the errors reported by mypy_bin."""
+    version = subprocess.run([mypy_bin, '--version'], capture_output=True, text=True,
+                             check=True).stdout.strip()
+    corpus = Corpus(name=name,
+                    root=root,
+                    targets=targets,
+                    config_file=config_file,
+                    files=hash_tree(root),
+                    expected_errors=0,
+                    frozen_with=version)
+    status, stdout, stderr = run_mypy(mypy_bin, corpus)
+    if is_crash(status, stdout, stderr):
+        raise RuntimeError('mypy failed:\n%s\n%s' % (stdout, stderr))
+    return corpus._replace(expected_errors=count_errors(stdout))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="""Manage frozen corpora type checked by the mypy_corpus_* benchmarks
+                       (recorded in %s).""" % MANIFEST)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='list corpora')
+    verify = subparsers.add_parser('verify', help='check corpus files against recorded hashes')
+    verify.add_argument('names', nargs='*', help='corpora to verify (default: all)')
+    freeze = subparsers.add_parser(
+        'freeze', help='add a new corpus, recording the errors reported by mypy')
+    freeze.add_argument('name', help="corpus name, including a version (such as 'mypy_v2')")
+    freeze.add_argument('root', help='directory with all files of the corpus')
+    freeze.add_argument('--target', action='append', required=True,
+                        help='file or directory to type check (can be repeated)')
+    freeze.add_argument('--config-file', help='mypy config file')
+    freeze.add_argument('--mypy', required=True, help='mypy executable used to count errors')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    corpora = load_corpora() if os.path.isfile(MANIFEST) else {}
+    if args.command == 'list':
+        for corpus in corpora.values():
+            print('%-20s %5d files %5d errors  %s' % (
+                corpus.name, len(corpus.files), corpus.expected_errors, corpus.root))
+    elif args.command == 'verify':
+        names = args.names or list(corpora)
+        problems = []
+        for name in names:
+            if name not in corpora:
+                sys.exit('unknown corpus: %s' % name)
+            problems += verify_corpus(corpora[name])
+        for problem in problems:
+            print(problem)
+        if problems:
+            sys.exit(1)
+        print('%d corpora ok' % len(names))
+    else:
+        if args.name in corpora:
+            sys.exit('corpus %s already exists (frozen corpora are not modified; use a new '
+                     'name)' % args.name)
+        corpus = freeze_corpus(args.name, args.root, args.target, args.config_file, args.mypy)
+        corpora[corpus.name] = corpus
+        save_corpora(corpora)
+        print('froze %s: %d files, %d errors' % (
+            corpus.name, len(corpus.files), corpus.expected_errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,31 @@ from reporting.common import (
     get_hardware_id, get_os_version, get_c_compiler_version, CC, DATA_DIR, SOURCE_DIRS,
     SCALING_FNAM
 )
+from reporting.environment import get_environment_fingerprint, record_environment
+from reporting.metrics import MetricItem, load_metrics
+
+
+CSV_HEADER = ("Timestamp,Runtime (s),Runtime (stddev),Mypy commit," +
+              "Benchmark commit,Python version,Hardware,OS,C compiler,Environment," +
+              "Estimator\n")
 
 
 def write_csv_header(fnam: str) -> None:
     with open(fnam, "w") as f:
-        f.write("Timestamp,Runtime (s),Runtime (stddev),Mypy commit," +
-                "Benchmark commit,Python version,Hardware,OS,C compiler\n")
+        f.write(CSV_HEADER)
+
+
+def upgrade_csv_header(fnam: str) -> None:
+    """Update the header of an existing .csv file if new columns have been added.
+
+    Old rows are left as is (readers treat missing trailing fields as empty).
+    """
+    with open(fnam) as f:
+        lines = f.readlines()
+    if lines and lines[0] != CSV_HEADER:
+        lines[0] = CSV_HEADER
+        with open(fnam, "w") as f:
+            f.writelines(lines)
 
 
 def write_csv_line(fnam: str,
@@ -24,21 +43,50 @@ def write_csv_line(fnam: str,
                    runtime: float,
                    stdev: float,
                    mypy_commit: str,
-                   benchmark_commit: str) -> None:
+                   benchmark_commit: str,
+                   python_version: Optional[str] = None,
+                   hardware_id: Optional[str] = None,
+                   os_version: Optional[str] = None,
+                   c_compiler: Optional[str] = None,
+                   environment: Optional[Dict[str, str]] = None,
+                   estimator: Optional[str] = None) -> str:
+    """Append a result to a .csv file and return the environment id.
+
+    The estimator is the method used to calculate the runtime from measurements
+    (see runbench.get_estimator). It's empty if unknown, as in old results.
+
+    The environment fields default to the configuration of the current machine.
+    Results collected elsewhere (e.g. by a remote worker) should pass them explicitly.
+    The environment fingerprint is stored in the same directory as the .csv
+    file, and the row refers to it using the environment id.
+    """
     if not os.path.exists(fnam):
         write_csv_header(fnam)
+    else:
+        upgrade_csv_header(fnam)
+    c_compiler = c_compiler or get_c_compiler_description()
+    if environment is None:
+        environment = get_environment_fingerprint(c_compiler)
+    env_id = record_environment(os.path.dirname(fnam), environment)
     with open(fnam, "a") as f:
-        f.write("%s,%.6f,%.6f,%s,%s,%s,%s,%s,%s\n" % (
+        f.write("%s,%.6f,%.6f,%s,%s,%s,%s,%s,%s,%s,%s\n" % (
             timestamp,
             runtime,
             stdev,
             mypy_commit,
             benchmark_commit,
-            sys.version.split()[0],
-            get_hardware_id(),
-            get_os_version(),
-            '%s %s' % (CC, get_c_compiler_version(CC)),
+            python_version or sys.version.split()[0],
+            hardware_id or get_hardware_id(),
+            os_version or get_os_version(),
+            c_compiler,
+            env_id,
+            estimator or '',
         ))
+    return env_id
+
+
+def get_c_compiler_description() -> str:
+    return '%s %s' % (CC, get_c_compiler_version(CC))
 
 
 class DataItem(NamedTuple):
@@ -51,6 +99,10 @@ class DataItem(NamedTuple):
     python_version: str
     hardware_id: str
     os_version: str
+    # Id of environment fingerprint (empty for old results)
+    environment: str = ''
+    # Estimator used to calculate runtime (empty for old results)
+    estimator: str = ''
 
 
 def read_csv(fnam: str) -> List[DataItem]:
@@ -62,7 +114,7 @@ def read_csv(fnam: str) -> List[DataItem]:
     lines = lines[1:]
     result = []
     for line in lines:
-        fields = line.split(',')
+        fields = line.rstrip('\n').split(',')
         item = DataItem(
             benchmark=benchmark,
             timestamp=datetime.fromisoformat(fields[0]),
@@ -73,6 +125,8 @@ def read_csv(fnam: str) -> List[DataItem]:
             python_version=fields[5],
             hardware_id=fields[6],
             os_version=fields[7],
+            environment=fields[9] if len(fields) > 9 else '',
+            estimator=fields[10] if len(fields) > 10 else '',
         )
         result.append(item)
     return result
@@ -101,6 +155,8 @@ class BenchmarkData(NamedTuple):
     # Scaling information for benchmark results between different hardware and
     # python versions (benchmark name as key)
     scaling: Dict[str, List[ScalingItem]]
+    # Metrics other than runtime (benchmark name as key)
+    metrics: Dict[str, List[MetricItem]]
 
 
 def load_data(data_repo: str) -> BenchmarkData:
@@ -129,8 +185,9 @@ def load_data(data_repo: str) -> BenchmarkData:
                      in get_benchmark_names().items()
                      if compiled_only}
     scaling = load_scaling_data(data_repo)
+    metrics = load_metrics(data_repo)
     return BenchmarkData(baselines, runs, microbenchmarks, source_locations, compiled_only,
-                         scaling)
+                         scaling, metrics)
 
 
 def load_scaling_data(data_repo: str) -> Dict[str, List[ScalingItem]]:
@@ -193,7 +250,14 @@ def sort_data_items(items: List[DataItem], commit_order: Dict[str, int]) -> List
 
 
 def find_baseline(baselines: List[DataItem], run: DataItem) -> Optional[DataItem]:
-    """Find the corresponding baseline measurement for a benchmark run."""
+    """Find the corresponding baseline measurement for a benchmark run.
+
+    Prefer a baseline collected in an identical environment, if there is one.
+    """
+    if run.environment:
+        for item in baselines:
+            if item.environment == run.environment:
+                return item
     for item in baselines:
         if (item.python_version == run.python_version
                 and item.hardware_id == run.hardware_id
@@ -258,15 +322,7 @@ def normalize_data(data: BenchmarkData, current_py: str, current_hw: str) -> Non
                         and run.python_version.startswith(scale_item.old_python_version)
                         and scale_item.new_hardware_id == current_hw
                         and scale_item.new_python_version.startswith(current_py)):
-                    run = DataItem(benchmark=run.benchmark,
-                                   timestamp=run.timestamp,
-                                   runtime=run.runtime / scale_item.factor,
-                                   stdev_percent=run.stdev_percent,
-                                   mypy_commit=run.mypy_commit,
-                                   benchmark_commit=run.benchmark_commit,
-                                   python_version=run.python_version,
-                                   hardware_id=run.hardware_id,
-                                   os_version=run.os_version)
+                    run = run._replace(runtime=run.runtime / scale_item.factor)
                     break
             new_runs.append(run)
         runs[:] = new_runs
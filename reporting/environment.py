@@ -0,0 +1,166 @@
+"""Fingerprint of the hardware and software environment used for running benchmarks.
+
+The fingerprint records things that affect benchmark results, such as the CPU
+model, frequency scaling configuration and how Python was built. Each
+benchmark result refers to a fingerprint using a short id, and fingerprints
+are stored in <data_repo>/data/environments.json.
+"""
+
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import sysconfig
+
+
+# File (under the data directory) that maps environment ids to fingerprints
+ENVIRONMENTS_FNAM = 'environments.json'
+
+CPU_DIR = '/sys/devices/system/cpu'
+
+
+def read_file(fnam: str) -> Optional[str]:
+    try:
+        with open(fnam) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def parse_cpuinfo(data: str) -> Dict[str, str]:
+    """Parse the first processor entry of /proc/cpuinfo contents."""
+    result: Dict[str, str] = {}
+    for line in data.splitlines():
+        if not line.strip():
+            if result:
+                break
+            continue
+        key, sep, value = line.partition(':')
+        if sep:
+            result.setdefault(key.strip(), value.strip())
+    return result
+
+
+def normalize_cpu_model(model: str) -> str:
+    """Normalize a CPU model name to a short, human-readable form.
+
+    For example, '11th Gen Intel(R) Core(TM) i5-1145G7 @ 2.60GHz' becomes
+    'Intel Core i5-1145G7'.
+    """
+    model = re.sub(r'\((R|TM|tm|r)\)', '', model)
+    model = re.sub(r'@.*', '', model)
+    model = re.sub(r'\b[0-9]+(st|nd|rd|th) Gen\b', '', model)
+    model = re.sub(r'\b[0-9]+-Core Processor\b', '', model)
+    model = re.sub(r'\b(CPU|Processor)\b', '', model)
+    return ' '.join(model.split())
+
+
+def get_cpu_model() -> Optional[str]:
+    cpuinfo = read_file('/proc/cpuinfo')
+    if cpuinfo is not None:
+        info = parse_cpuinfo(cpuinfo)
+        # 'model name' is used on x86, 'Model' on some ARM systems
+        for key in 'model name', 'Model', 'Hardware':
+            if key in info:
+                return normalize_cpu_model(info[key])
+    if sys.platform == 'darwin':
+        try:
+            output = subprocess.check_output(['sysctl', '-n', 'machdep.cpu.brand_string'])
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return normalize_cpu_model(output.decode('utf-8'))
+    return platform.processor() or None
+
+
+def get_microcode() -> str:
+    cpuinfo = read_file('/proc/cpuinfo')
+    if cpuinfo is None:
+        return ''
+    return parse_cpuinfo(cpuinfo).get('microcode', '')
+
+
+def get_turbo_state() -> str:
+    # intel_pstate driver
+    no_turbo = read_file(os.path.join(CPU_DIR, 'intel_pstate', 'no_turbo'))
+    if no_turbo is not None:
+        return 'off' if no_turbo == '1' else 'on'
+    # acpi-cpufreq driver (e.g. AMD)
+    boost = read_file(os.path.join(CPU_DIR, 'cpufreq', 'boost'))
+    if boost is not None:
+        return 'on' if boost == '1' else 'off'
+    return ''
+
+
+def get_python_build_flags() -> str:
+    """Return optimization options used for building Python ('PGO', 'LTO')."""
+    config_args = sysconfig.get_config_var('CONFIG_ARGS') or ''
+    flags = []
+    if '--enable-optimizations' in config_args:
+        flags.append('PGO')
+    if '--with-lto' in config_args:
+        flags.append('LTO')
+    return '+'.join(flags)
+
+
+def get_environment_fingerprint(c_compiler: str) -> Dict[str, str]:
+    """Collect information about the current environment.
+
+    Values that aren't available on the current platform are empty strings.
+    """
+    return {
+        'cpu_model': get_cpu_model() or '',
+        'cpu_count': str(os.cpu_count() or ''),
+        'microcode': get_microcode(),
+        'governor': read_file(os.path.join(CPU_DIR, 'cpu0', 'cpufreq', 'scaling_governor')) or '',
+        'turbo': get_turbo_state(),
+        'isolated_cpus': read_file(os.path.join(CPU_DIR, 'isolated')) or '',
+        'kernel': platform.release(),
+        'python_version': sys.version.split()[0],
+        'python_build_flags': get_python_build_flags(),
+        'python_compiler': platform.python_compiler(),
+        'c_compiler': c_compiler,
+    }
+
+
+def environment_id(fingerprint: Dict[str, str]) -> str:
+    data = json.dumps(fingerprint, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()[:12]
+
+
+def load_environments(data_dir: str) -> Dict[str, Dict[str, str]]:
+    """Load all recorded fingerprints (environment id as key)."""
+    fnam = os.path.join(data_dir, ENVIRONMENTS_FNAM)
+    if not os.path.isfile(fnam):
+        return {}
+    with open(fnam) as f:
+        return json.load(f)
+
+
+def record_environment(data_dir: str, fingerprint: Dict[str, str]) -> str:
+    """Store fingerprint in the data directory (if it's new) and return its id."""
+    env_id = environment_id(fingerprint)
+    environments = load_environments(data_dir)
+    if env_id not in environments:
+        environments[env_id] = fingerprint
+        with open(os.path.join(data_dir, ENVIRONMENTS_FNAM), 'w') as f:
+            json.dump(environments, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return env_id
+
+
+def describe_environment(fingerprint: Dict[str, str]) -> str:
+    """Return a short summary of settings that often affect results."""
+    items = []
+    if fingerprint.get('python_build_flags'):
+        items.append('Python built with %s' % fingerprint['python_build_flags'])
+    if fingerprint.get('governor'):
+        items.append('%s governor' % fingerprint['governor'])
+    if fingerprint.get('turbo'):
+        items.append('turbo %s' % fingerprint['turbo'])
+    if fingerprint.get('kernel'):
+        items.append('kernel %s' % fingerprint['kernel'])
+    return ', '.join(items)
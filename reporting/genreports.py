@@ -18,7 +18,9 @@ from reporting.data import (
 )
 from reporting.report_runs import gen_reports_for_benchmarks
 from reporting.report_summary import gen_summary_reports
-from reporting.common import REPORTS_DIR, BENCHMARKS_DIR
+from reporting.parallel import gen_parallel_scaling_report
+from reporting.common import REPORTS_DIR, BENCHMARKS_DIR, DATA_DIR
+from reporting.environment import load_environments, describe_environment
 
 
 def parse_args() -> Tuple[str, str]:
@@ -51,6 +53,10 @@ def main() -> None:
         os_version,
         hardware_id,
     )
+    environments = load_environments(os.path.join(data_repo, DATA_DIR))
+    fingerprint = environments.get(recent_item.environment)
+    if fingerprint and describe_environment(fingerprint):
+        environment_summary += " (%s)" % describe_environment(fingerprint)
 
     normalize_data(data, python_version, hardware_id)
 
@@ -63,6 +69,10 @@ def main() -> None:
     gen_summary_reports(data, summary_report_dir, commit_order, commit_times,
                         environment_summary)
 
+    # Generate report about scaling of parallel type checking.
+    gen_parallel_scaling_report(data.runs, summary_report_dir, commit_order, commit_times,
+                                environments)
+
 
 if __name__ == '__main__':
     main()
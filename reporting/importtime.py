@@ -0,0 +1,142 @@
+"""Utilities for measuring module import time (see runbench.py --import-time).
+
+Import times are measured in a fresh interpreter using "python -X importtime".
+Besides benchmark modules, synthetic modules that only contain a single kind of
+definition (module-level constants, functions, classes or native classes) are
+measured. Comparing them to an empty module gives the cost of each kind of
+definition: module initialization, creating regular type objects and setting
+up native classes (when compiled using mypyc).
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+import os
+import re
+
+
+# Directory (and package) for generated synthetic modules
+SYNTHETIC_PACKAGE = 'startup'
+
+# Number of definitions in each synthetic module
+SYNTHETIC_ITEMS = 500
+
+# Name of module without definitions (used as baseline)
+EMPTY_MODULE = 'startup_empty'
+
+
+def gen_constants(n: int) -> List[str]:
+    lines = []
+    for i in range(n):
+        if i % 3 == 0:
+            lines.append('C%d: Final = %d' % (i, i))
+        elif i % 3 == 1:
+            lines.append('C%d: Final = "s%d"' % (i, i))
+        else:
+            lines.append('C%d: Final = (%d, "t%d")' % (i, i, i))
+    return lines
+
+
+def gen_functions(n: int) -> List[str]:
+    lines = []
+    for i in range(n):
+        lines.append('def f%d(x: int, y: str) -> int:' % i)
+        lines.append('    return x + len(y) + %d' % i)
+        lines.append('')
+    return lines
+
+
+def gen_classes(n: int, native: bool) -> List[str]:
+    lines = []
+    for i in range(n):
+        if not native:
+            lines.append('@mypyc_attr(native_class=False)')
+        lines.append('class C%d:' % i)
+        lines.append('    def __init__(self, x: int) -> None:')
+        lines.append('        self.x = x')
+        lines.append('        self.y = "y"')
+        lines.append('')
+        lines.append('    def method(self) -> int:')
+        lines.append('        return self.x + %d' % i)
+        lines.append('')
+    return lines
+
+
+def gen_synthetic_modules(n: int = SYNTHETIC_ITEMS) -> Dict[str, str]:
+    """Generate sources of synthetic modules (module name -> source)."""
+    header = [
+        'from typing import Final',
+        '',
+        'from mypy_extensions import mypyc_attr',
+        '',
+    ]
+    modules = {
+        EMPTY_MODULE: [],
+        'startup_constants': gen_constants(n),
+        'startup_functions': gen_functions(n),
+        'startup_classes': gen_classes(n, native=False),
+        'startup_native_classes': gen_classes(n, native=True),
+    }
+    return {name: '\n'.join(header + lines) + '\n' for name, lines in modules.items()}
+
+
+def write_synthetic_modules(n: int = SYNTHETIC_ITEMS) -> List[str]:
+    """Write synthetic modules to SYNTHETIC_PACKAGE and return full module names.
+
+    Files are only written if their contents changed, so that the results of
+    compiling them can be reused.
+    """
+    os.makedirs(SYNTHETIC_PACKAGE, exist_ok=True)
+    sources = gen_synthetic_modules(n)
+    sources['__init__'] = ''
+    for name, source in sources.items():
+        fnam = os.path.join(SYNTHETIC_PACKAGE, name + '.py')
+        if os.path.exists(fnam):
+            with open(fnam) as f:
+                if f.read() == source:
+                    continue
+        with open(fnam, 'w') as f:
+            f.write(source)
+    return ['%s.%s' % (SYNTHETIC_PACKAGE, name) for name in sources if name != '__init__']
+
+
+class ImportTime(NamedTuple):
+    module: str
+    # Time spent importing the module itself, excluding nested imports (microseconds)
+    self_us: int
+    # Time spent importing the module, including nested imports (microseconds)
+    cumulative_us: int
+    # Nesting level (0 = imported directly by the main program)
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportTime]:
+    """Parse output of "python -X importtime"."""
+    result = []
+    for line in output.splitlines():
+        m = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)', line)
+        if m:
+            result.append(ImportTime(m.group(4),
+                                     int(m.group(1)),
+                                     int(m.group(2)),
+                                     len(m.group(3)) // 2))
+    return result
+
+
+def find_import_time(items: List[ImportTime], module: str) -> Optional[ImportTime]:
+    for item in items:
+        if item.module == module:
+            return item
+    return None
+
+
+def cost_per_item(times: Dict[str, float], n: int = SYNTHETIC_ITEMS) -> Dict[str, float]:
+    """Estimate cost of a single definition (microseconds) from synthetic module times.
+
+    The times argument has the import self time of each synthetic module
+    (microseconds), with the module name without the package as key.
+    """
+    baseline = times[EMPTY_MODULE]
+    result = {}
+    for name, t in times.items():
+        if name != EMPTY_MODULE:
+            result[name.replace('startup_', '')] = (t - baseline) / n
+    return result
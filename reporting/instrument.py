@@ -0,0 +1,265 @@
+"""Per-function instrumentation of compiled benchmarks (see runbench.py --instrument).
+
+The source of a benchmark module is rewritten so that each function records
+the number of calls and the time spent in it, and the result is compiled
+using mypyc as usual. Unlike cProfile, this sees native functions, and unlike
+sampling profilers, this counts calls.
+
+Times include the instrumentation overhead, which is significant for tiny
+functions that are called very often, so compare instrumented runs only with
+other instrumented runs. Two sets of results, for example collected using two
+mypy commits, can be compared to find which functions got slower:
+
+  python3 -m reporting.instrument old.json new.json
+"""
+
+from typing import Dict, List, NamedTuple, Tuple
+import argparse
+import ast
+import json
+import time
+
+
+# Names of the runtime hooks in instrumented modules
+ENTER = '_instrument_enter'
+LEAVE = '_instrument_leave'
+REGISTER = '_instrument_register'
+BASE = '_instrument_base'
+
+
+class FunctionStats(NamedTuple):
+    calls: int
+    # Time spent in the function, including callees (seconds)
+    total: float
+    # Time spent in the function, excluding instrumented callees (seconds)
+    self_time: float
+
+
+# Runtime state of instrumented modules. The function id is the index.
+names: List[str] = []
+calls: List[int] = []
+total_ns: List[int] = []
+self_ns: List[int] = []
+# Number of active calls of each function (recursive calls are only counted
+# once in total time)
+active: List[int] = []
+# Active calls, innermost last: [function id, start time, time spent in callees]
+stack: List[List[int]] = []
+
+
+def register(functions: List[str]) -> int:
+    """Register functions of an instrumented module and return id of the first one."""
+    base = len(names)
+    names.extend(functions)
+    for counts in calls, total_ns, self_ns, active:
+        counts.extend([0] * len(functions))
+    return base
+
+
+def enter(func_id: int) -> None:
+    active[func_id] += 1
+    stack.append([func_id, time.perf_counter_ns(), 0])
+
+
+def leave(func_id: int) -> None:
+    t = time.perf_counter_ns()
+    _, start, callees = stack.pop()
+    elapsed = t - start
+    calls[func_id] += 1
+    self_ns[func_id] += elapsed - callees
+    active[func_id] -= 1
+    if not active[func_id]:
+        total_ns[func_id] += elapsed
+    if stack:
+        stack[-1][2] += elapsed
+
+
+def reset() -> None:
+    for counts in calls, total_ns, self_ns:
+        counts[:] = [0] * len(counts)
+
+
+def get_stats() -> Dict[str, FunctionStats]:
+    """Return statistics of functions that were called (function name as key)."""
+    result = {}
+    for i, name in enumerate(names):
+        if calls[i]:
+            result[name] = FunctionStats(calls[i], total_ns[i] * 1e-9, self_ns[i] * 1e-9)
+    return result
+
+
+def is_generator(node: ast.FunctionDef) -> bool:
+    """Does a function contain yield (not counting nested functions and classes)?"""
+    todo: List[ast.AST] = list(node.body)
+    while todo:
+        item = todo.pop()
+        if isinstance(item, (ast.Yield, ast.YieldFrom)):
+            return True
+        if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
+                                 ast.Lambda)):
+            todo.extend(ast.iter_child_nodes(item))
+    return False
+
+
+def is_overload(node: ast.FunctionDef) -> bool:
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Name) and decorator.id == 'overload':
+            return True
+        if isinstance(decorator, ast.Attribute) and decorator.attr == 'overload':
+            return True
+    return False
+
+
+class Instrumenter(ast.NodeTransformer):
+    """Wrap the body of each function in calls to the runtime hooks.
+
+    Generators and async functions are not instrumented, since their time
+    would include time spent suspended.
+    """
+
+    def __init__(self) -> None:
+        # Qualified names of instrumented functions (index is function id relative to BASE)
+        self.functions: List[str] = []
+        self.scope: List[str] = []
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> ast.ClassDef:
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+        return node
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> ast.AsyncFunctionDef:
+        self.scope += [node.name, '<locals>']
+        self.generic_visit(node)
+        del self.scope[-2:]
+        return node
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        qualname = '.'.join(self.scope + [node.name])
+        self.scope += [node.name, '<locals>']
+        self.generic_visit(node)
+        del self.scope[-2:]
+        if is_generator(node) or is_overload(node):
+            return node
+        func_id = len(self.functions)
+        self.functions.append(qualname)
+        body = node.body
+        docstring = []
+        if (isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str)):
+            docstring, body = body[:1], body[1:]
+        enter_stmt = ast.parse('%s(%s + %d)' % (ENTER, BASE, func_id)).body[0]
+        leave_stmt = ast.parse('%s(%s + %d)' % (LEAVE, BASE, func_id)).body[0]
+        try_stmt = ast.Try(body=body or [ast.Pass()], handlers=[], orelse=[],
+                           finalbody=[leave_stmt])
+        node.body = docstring + [enter_stmt, try_stmt]
+        return node
+
+
+def instrument_source(source: str) -> Tuple[str, List[str]]:
+    """Instrument all functions in module source code.
+
+    Return (instrumented source, qualified names of instrumented functions).
+    """
+    tree = ast.parse(source)
+    instrumenter = Instrumenter()
+    tree = instrumenter.visit(tree)
+    header = ast.parse('from reporting.instrument import enter as %s, leave as %s, '
+                       'register as %s\n'
+                       '%s: int = %s(%r)\n' % (ENTER, LEAVE, REGISTER, BASE, REGISTER,
+                                               instrumenter.functions))
+    # The header must come after the docstring and __future__ imports
+    i = 0
+    while i < len(tree.body):
+        stmt = tree.body[i]
+        if isinstance(stmt, ast.ImportFrom) and stmt.module == '__future__':
+            i += 1
+        elif (i == 0 and isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant)
+                and isinstance(stmt.value.value, str)):
+            i += 1
+        else:
+            break
+    tree.body[i:i] = header.body
+    return ast.unparse(ast.fix_missing_locations(tree)) + '\n', instrumenter.functions
+
+
+def merge_stats(a: Dict[str, FunctionStats],
+                b: Dict[str, FunctionStats]) -> Dict[str, FunctionStats]:
+    result = dict(a)
+    for name, stats in b.items():
+        if name in result:
+            old = result[name]
+            stats = FunctionStats(old.calls + stats.calls,
+                                  old.total + stats.total,
+                                  old.self_time + stats.self_time)
+        result[name] = stats
+    return result
+
+
+def write_stats(fnam: str, stats: Dict[str, FunctionStats]) -> None:
+    with open(fnam, 'w') as f:
+        json.dump({name: list(s) for name, s in sorted(stats.items())}, f, indent=1)
+        f.write('\n')
+
+
+def read_stats(fnam: str) -> Dict[str, FunctionStats]:
+    with open(fnam) as f:
+        data = json.load(f)
+    return {name: FunctionStats(int(c), float(t), float(s)) for name, (c, t, s) in data.items()}
+
+
+def format_stats(stats: Dict[str, FunctionStats], limit: int) -> List[str]:
+    """Format a table of at most limit functions with the most self time."""
+    total = sum(s.self_time for s in stats.values())
+    lines = ['%10s %10s %10s %7s %10s  %s' % ('Calls', 'Total ms', 'Self ms', 'Self', 'us/call',
+                                              'Function')]
+    items = sorted(stats.items(), key=lambda item: (-item[1].self_time, item[0]))
+    for name, s in items[:limit]:
+        lines.append('%10d %10.2f %10.2f %6.2f%% %10.3f  %s' % (
+            s.calls, s.total * 1e3, s.self_time * 1e3,
+            100.0 * s.self_time / total if total else 0.0,
+            s.total * 1e6 / s.calls,
+            name))
+    return lines
+
+
+def format_stats_diff(a: Dict[str, FunctionStats],
+                      b: Dict[str, FunctionStats],
+                      limit: int) -> List[str]:
+    """Format a table of at most limit functions with the largest changes in self time."""
+    empty = FunctionStats(0, 0.0, 0.0)
+    lines = ['%10s %10s %10s %10s %10s  %s' % ('Self A ms', 'Self B ms', 'Change ms', 'Calls A',
+                                               'Calls B', 'Function')]
+    functions = sorted(set(a) | set(b),
+                       key=lambda name: (-abs(b.get(name, empty).self_time
+                                              - a.get(name, empty).self_time), name))
+    for name in functions[:limit]:
+        sa = a.get(name, empty)
+        sb = b.get(name, empty)
+        lines.append('%10.2f %10.2f %+10.2f %10d %10d  %s' % (
+            sa.self_time * 1e3, sb.self_time * 1e3, (sb.self_time - sa.self_time) * 1e3,
+            sa.calls, sb.calls, name))
+    return lines
+
+
+def parse_args() -> Tuple[str, str, int]:
+    parser = argparse.ArgumentParser(
+        description="""Compare two sets of per-function statistics (generated using
+                       runbench.py --instrument). Both should be collected using the same
+                       number of iterations.""")
+    parser.add_argument("stats_a", help="baseline statistics")
+    parser.add_argument("stats_b", help="new statistics")
+    parser.add_argument("--limit", type=int, default=20,
+                        help="show at most N functions (default 20)")
+    args = parser.parse_args()
+    return args.stats_a, args.stats_b, args.limit
+
+
+def main() -> None:
+    stats_a, stats_b, limit = parse_args()
+    for line in format_stats_diff(read_stats(stats_a), read_stats(stats_b), limit):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
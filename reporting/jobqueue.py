@@ -0,0 +1,232 @@
+"""Queue of benchmark jobs shared between a coordinator and worker processes.
+
+The queue is stored in a SQLite database file. The coordinator (see
+reporting.update) adds (mypy commit, benchmark) jobs, and workers (see
+reporting.worker) claim jobs, run them and push back results tagged with
+the hardware and environment they were collected on. Each job also records
+the mypyc-benchmarks commit of the coordinator, and workers only run jobs
+if their checkout is at the same commit.
+
+Workers can run on the same machine or on several identical machines, as
+long as they all can access the database file (the file system must
+support POSIX locks, so NFS is not a good idea).
+"""
+
+from typing import NamedTuple, List, Optional, Dict
+from datetime import datetime
+import json
+import sqlite3
+import time
+
+
+# Job states
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mypy_commit TEXT NOT NULL,
+    benchmark TEXT NOT NULL,
+    state TEXT NOT NULL,
+    worker_id TEXT,
+    claimed_at REAL,
+    benchmark_commit TEXT NOT NULL DEFAULT '',
+    UNIQUE(mypy_commit, benchmark)
+);
+CREATE TABLE IF NOT EXISTS results (
+    job_id INTEGER PRIMARY KEY REFERENCES jobs(id),
+    worker_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    runtime REAL NOT NULL,
+    stdev_percent REAL NOT NULL,
+    benchmark_commit TEXT NOT NULL,
+    python_version TEXT NOT NULL,
+    hardware_id TEXT NOT NULL,
+    os_version TEXT NOT NULL,
+    c_compiler TEXT NOT NULL,
+    environment TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    exported INTEGER NOT NULL DEFAULT 0,
+    estimator TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+class Job(NamedTuple):
+    id: int
+    mypy_commit: str
+    benchmark: str
+    # mypyc-benchmarks commit to run the job with (empty for jobs added before
+    # this was recorded)
+    benchmark_commit: str = ''
+
+
+class JobResult(NamedTuple):
+    job: Job
+    worker_id: str
+    timestamp: datetime
+    runtime: float
+    stdev_percent: float
+    benchmark_commit: str
+    python_version: str
+    hardware_id: str
+    os_version: str
+    c_compiler: str
+    # Environment fingerprint (see reporting.environment)
+    environment: Dict[str, str]
+    # Metrics other than runtime (see reporting.metrics)
+    metrics: Dict[str, float]
+    # Estimator used to calculate runtime (see runbench.get_estimator)
+    estimator: str = ''
+
+
+class JobQueue:
+    def __init__(self, path: str) -> None:
+        # Use autocommit mode and explicit transactions where needed.
+        self.conn = sqlite3.connect(path, timeout=60.0, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+        # Upgrade databases created before the estimator and benchmark commit columns
+        # were added
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(results)')]
+        if 'estimator' not in columns:
+            self.conn.execute(
+                "ALTER TABLE results ADD COLUMN estimator TEXT NOT NULL DEFAULT ''")
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(jobs)')]
+        if 'benchmark_commit' not in columns:
+            self.conn.execute(
+                "ALTER TABLE jobs ADD COLUMN benchmark_commit TEXT NOT NULL DEFAULT ''")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def add_job(self, mypy_commit: str, benchmark: str, benchmark_commit: str) -> None:
+        """Add a job to run using the given mypyc-benchmarks commit.
+
+        If the job is already in the queue, it's only updated if it's pending or
+        failed: it will use the given benchmark commit, and a failed job is made
+        pending again, since the failure may have been transient.
+        """
+        self.conn.execute(
+            'INSERT INTO jobs (mypy_commit, benchmark, state, benchmark_commit) '
+            'VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (mypy_commit, benchmark) DO UPDATE '
+            'SET state = excluded.state, worker_id = NULL, claimed_at = NULL, '
+            'benchmark_commit = excluded.benchmark_commit '
+            'WHERE state IN (?, ?)',
+            (mypy_commit, benchmark, PENDING, benchmark_commit, PENDING, FAILED))
+
+    def claim_job(self, worker_id: str) -> Optional[Job]:
+        """Atomically take the oldest pending job, or return None if there are none."""
+        # BEGIN IMMEDIATE acquires the write lock up front so that two workers
+        # can't claim the same job.
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute(
+                'SELECT id, mypy_commit, benchmark, benchmark_commit FROM jobs '
+                'WHERE state = ? ORDER BY id LIMIT 1',
+                (PENDING,)).fetchone()
+            if row is None:
+                self.conn.execute('COMMIT')
+                return None
+            self.conn.execute(
+                'UPDATE jobs SET state = ?, worker_id = ?, claimed_at = ? WHERE id = ?',
+                (RUNNING, worker_id, time.time(), row[0]))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return Job(*row)
+
+    def complete_job(self, result: JobResult) -> None:
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?)',
+                (result.job.id, result.worker_id, result.timestamp.isoformat(), result.runtime,
+                 result.stdev_percent, result.benchmark_commit, result.python_version,
+                 result.hardware_id, result.os_version, result.c_compiler,
+                 json.dumps(result.environment), json.dumps(result.metrics), result.estimator))
+            self.conn.execute('UPDATE jobs SET state = ? WHERE id = ?', (DONE, result.job.id))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def fail_job(self, job: Job) -> None:
+        self.conn.execute('UPDATE jobs SET state = ? WHERE id = ?', (FAILED, job.id))
+
+    def release_job(self, job: Job) -> None:
+        """Make a claimed job pending again, so that another worker can run it."""
+        self.conn.execute(
+            'UPDATE jobs SET state = ?, worker_id = NULL, claimed_at = NULL WHERE id = ?',
+            (PENDING, job.id))
+
+    def requeue_stale_jobs(self, max_age: float) -> int:
+        """Make jobs claimed more than max_age seconds ago pending again.
+
+        This recovers from workers that died while running a job. Return the
+        number of requeued jobs.
+        """
+        cursor = self.conn.execute(
+            'UPDATE jobs SET state = ?, worker_id = NULL, claimed_at = NULL '
+            'WHERE state = ? AND claimed_at < ?',
+            (PENDING, RUNNING, time.time() - max_age))
+        return cursor.rowcount
+
+    def heartbeat(self, worker_id: str) -> None:
+        """Record that a worker is alive."""
+        self.conn.execute('INSERT OR REPLACE INTO workers VALUES (?, ?)',
+                          (worker_id, time.time()))
+
+    def last_heartbeat(self) -> Optional[float]:
+        """Return the time of the most recent heartbeat of any worker, if any."""
+        row = self.conn.execute('SELECT MAX(last_seen) FROM workers').fetchone()
+        return row[0]
+
+    def num_unfinished(self) -> int:
+        row = self.conn.execute(
+            'SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)', (PENDING, RUNNING)).fetchone()
+        return row[0]
+
+    def take_results(self) -> List[JobResult]:
+        """Return results that haven't been returned before, in job order."""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = self.conn.execute(
+                'SELECT jobs.id, jobs.mypy_commit, jobs.benchmark, results.worker_id, '
+                'results.timestamp, results.runtime, results.stdev_percent, '
+                'results.benchmark_commit, results.python_version, results.hardware_id, '
+                'results.os_version, results.c_compiler, results.environment, results.metrics, '
+                'results.estimator, jobs.benchmark_commit '
+                'FROM results JOIN jobs ON results.job_id = jobs.id '
+                'WHERE results.exported = 0 ORDER BY jobs.id').fetchall()
+            self.conn.execute('UPDATE results SET exported = 1 WHERE exported = 0')
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        result = []
+        for row in rows:
+            result.append(JobResult(
+                job=Job(row[0], row[1], row[2], row[15]),
+                worker_id=row[3],
+                timestamp=datetime.fromisoformat(row[4]),
+                runtime=row[5],
+                stdev_percent=row[6],
+                benchmark_commit=row[7],
+                python_version=row[8],
+                hardware_id=row[9],
+                os_version=row[10],
+                c_compiler=row[11],
+                environment=json.loads(row[12]),
+                metrics=json.loads(row[13]),
+                estimator=row[14],
+            ))
+        return result
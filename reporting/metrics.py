@@ -0,0 +1,92 @@
+"""Storage of benchmark metrics other than runtime, such as instruction counts.
+
+Metrics of each benchmark are stored in <data_repo>/data/metrics/<benchmark>.csv,
+with one row per metric per benchmark run.
+"""
+
+from typing import NamedTuple, Dict, List
+from datetime import datetime
+import glob
+import os
+
+from reporting.common import DATA_DIR
+
+
+# Subdirectory for metrics (under DATA_DIR)
+METRICS_DIR = 'metrics'
+
+METRICS_CSV_HEADER = 'Timestamp,Mypy commit,Benchmark commit,Environment,Metric,Value\n'
+
+
+class MetricItem(NamedTuple):
+    benchmark: str
+    timestamp: datetime
+    mypy_commit: str
+    benchmark_commit: str
+    environment: str
+    metric: str
+    value: float
+
+
+def get_metrics_csv_path(data_repo: str, benchmark: str) -> str:
+    metrics_dir = os.path.join(data_repo, DATA_DIR, METRICS_DIR)
+    if not os.path.exists(metrics_dir):
+        os.makedirs(metrics_dir)
+    return os.path.join(metrics_dir, benchmark + '.csv')
+
+
+def format_value(value: float) -> str:
+    """Format a metric value without losing precision.
+
+    Counts (such as instructions and binary sizes) are written as integers.
+    """
+    if float(value).is_integer():
+        return '%d' % value
+    return repr(float(value))
+
+
+def write_metrics(data_repo: str,
+                  benchmark: str,
+                  timestamp: datetime,
+                  mypy_commit: str,
+                  benchmark_commit: str,
+                  environment: str,
+                  metrics: Dict[str, float]) -> None:
+    fnam = get_metrics_csv_path(data_repo, benchmark)
+    if not os.path.exists(fnam):
+        with open(fnam, 'w') as f:
+            f.write(METRICS_CSV_HEADER)
+    with open(fnam, 'a') as f:
+        for metric, value in sorted(metrics.items()):
+            f.write('%s,%s,%s,%s,%s,%s\n' % (
+                timestamp, mypy_commit, benchmark_commit, environment, metric,
+                format_value(value)))
+
+
+def read_metrics_csv(fnam: str) -> List[MetricItem]:
+    benchmark = os.path.basename(fnam).partition('.csv')[0]
+    with open(fnam) as f:
+        lines = f.readlines()[1:]
+    result = []
+    for line in lines:
+        fields = line.rstrip('\n').split(',')
+        result.append(MetricItem(
+            benchmark=benchmark,
+            timestamp=datetime.fromisoformat(fields[0]),
+            mypy_commit=fields[1],
+            benchmark_commit=fields[2],
+            environment=fields[3],
+            metric=fields[4],
+            value=float(fields[5]),
+        ))
+    return result
+
+
+def load_metrics(data_repo: str) -> Dict[str, List[MetricItem]]:
+    """Load metrics of all benchmarks (benchmark name as key)."""
+    result = {}
+    for fnam in glob.glob(os.path.join(data_repo, DATA_DIR, METRICS_DIR, '*.csv')):
+        items = read_metrics_csv(fnam)
+        if items:
+            result[items[0].benchmark] = items
+    return result
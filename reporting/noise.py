@@ -0,0 +1,248 @@
+"""Monitor interference from other system activity while running benchmarks.
+
+runbench.py uses NoiseMonitor to sample system state during each benchmark
+iteration: runnable tasks, CPU frequency, thermal throttling events, context
+switches and CPU time used by other processes. Iterations that ran under
+interference are tagged, and they can also be rejected and rerun.
+
+Benchmarks that run multiple processes on purpose (such as parallel mypy
+workers or a mypy daemon) are defined using multi_process=True. Their own
+processes can't be reliably told apart from other activity, so runnable tasks
+and CPU time used by other processes are recorded but not checked for them.
+
+This only works on Linux (using /proc and /sys). Elsewhere no interference is
+detected.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import glob
+import os
+import sys
+import threading
+import time
+
+
+# Interval (seconds) between samples of runnable tasks and CPU frequency
+SAMPLE_INTERVAL = 0.1
+
+# An iteration is noisy if other processes used more than this fraction of a CPU
+MAX_OTHER_CPU = 0.1
+
+# An iteration is noisy if on average more than this many tasks other than the
+# runner and the benchmark process were runnable
+MAX_EXTRA_LOAD = 1.0
+
+# Runnable tasks that belong to the benchmark: the runner (which is sampling) and the
+# benchmark process (or a child process it's waiting for)
+OWN_TASKS = 2
+
+# An iteration is noisy if the CPU frequency drops below this fraction of the
+# highest frequency seen in earlier iterations
+MIN_FREQUENCY_RATIO = 0.9
+
+CPU_DIR = '/sys/devices/system/cpu'
+
+
+def read_file(fnam: str) -> Optional[str]:
+    try:
+        with open(fnam) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def parse_proc_stat(data: str) -> Tuple[float, int, int]:
+    """Parse /proc/stat contents.
+
+    Return (total busy CPU time over all CPUs in clock ticks, total context switches,
+    currently runnable tasks). Time stolen by the hypervisor counts as busy, since
+    it's not available to us.
+    """
+    busy = 0.0
+    ctxt = 0
+    running = 0
+    for line in data.splitlines():
+        fields = line.split()
+        if fields and fields[0] == 'cpu':
+            # user nice system idle iowait irq softirq steal ...
+            values = [int(x) for x in fields[1:9]]
+            busy = float(sum(values) - values[3] - values[4])
+        elif fields and fields[0] == 'ctxt':
+            ctxt = int(fields[1])
+        elif fields and fields[0] == 'procs_running':
+            running = int(fields[1])
+    return busy, ctxt, running
+
+
+def read_busy_time_and_context_switches() -> Optional[Tuple[float, int]]:
+    """Return (busy CPU time in seconds, context switches) since boot, if available."""
+    data = read_file('/proc/stat')
+    if data is None:
+        return None
+    busy, ctxt, _ = parse_proc_stat(data)
+    return busy / os.sysconf('SC_CLK_TCK'), ctxt
+
+
+def read_extra_load() -> Optional[int]:
+    """Return the number of runnable tasks other than the benchmark, if available.
+
+    Unlike the load average, this isn't affected by earlier activity.
+    """
+    data = read_file('/proc/stat')
+    if data is None:
+        return None
+    return max(parse_proc_stat(data)[2] - OWN_TASKS, 0)
+
+
+def read_frequency(cpu_dir: str = CPU_DIR) -> Optional[float]:
+    """Return highest current frequency of all CPUs (MHz), if available.
+
+    The benchmark runs on a busy CPU, which runs at the highest frequency. Idle CPUs
+    clock down, so an average would drop on a quiet machine.
+    """
+    values = []
+    for fnam in glob.glob(os.path.join(cpu_dir, 'cpu[0-9]*', 'cpufreq', 'scaling_cur_freq')):
+        value = read_file(fnam)
+        if value is not None:
+            values.append(int(value) / 1000.0)
+    return max(values, default=None)
+
+
+def read_throttle_count() -> int:
+    """Return total number of thermal throttling events on all CPUs since boot."""
+    total = 0
+    for fnam in glob.glob(os.path.join(CPU_DIR, 'cpu[0-9]*', 'thermal_throttle',
+                                       '*_throttle_count')):
+        value = read_file(fnam)
+        if value is not None:
+            total += int(value)
+    return total
+
+
+def get_own_cpu_time() -> Tuple[float, int]:
+    """Return (CPU time of this process and waited-for children, involuntary context switches).
+
+    Only the involuntary context switches of children are included.
+    """
+    times = os.times()
+    cpu = times.user + times.system + times.children_user + times.children_system
+    if sys.platform == 'win32':
+        return cpu, 0
+    import resource
+    return cpu, resource.getrusage(resource.RUSAGE_CHILDREN).ru_nivcsw
+
+
+class NoiseSample(NamedTuple):
+    """System activity during a single benchmark iteration."""
+    # CPU time used by other processes divided by elapsed time (1.0 == one full CPU)
+    other_cpu: float
+    # Average number of runnable tasks other than the benchmark
+    extra_load: float
+    # Lowest CPU frequency (MHz) sampled (see read_frequency), or 0.0 if unknown
+    min_frequency: float
+    # Thermal throttling events (all CPUs)
+    throttle_events: int
+    # Context switches (all processes)
+    context_switches: int
+    # Involuntary context switches of benchmark processes
+    preemptions: int
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            'noise_other_cpu': self.other_cpu,
+            'noise_extra_load': self.extra_load,
+            'noise_min_frequency': self.min_frequency,
+            'noise_throttle_events': float(self.throttle_events),
+            'noise_context_switches': float(self.context_switches),
+            'noise_preemptions': float(self.preemptions),
+        }
+
+
+def classify(sample: NoiseSample, reference_frequency: float,
+             multi_process: bool = False) -> List[str]:
+    """Return reasons why a sample was collected under interference (empty if quiet).
+
+    If multi_process is True, the benchmark runs multiple processes, and runnable
+    tasks and CPU time used by other processes are ignored.
+    """
+    reasons = []
+    if sample.other_cpu > MAX_OTHER_CPU and not multi_process:
+        reasons.append('other_cpu')
+    if sample.extra_load > MAX_EXTRA_LOAD and not multi_process:
+        reasons.append('load')
+    if sample.throttle_events:
+        reasons.append('throttled')
+    if (sample.min_frequency and reference_frequency
+            and sample.min_frequency < MIN_FREQUENCY_RATIO * reference_frequency):
+        reasons.append('frequency')
+    return reasons
+
+
+class NoiseMonitor:
+    """Sample system activity in a background thread while a benchmark iteration runs.
+
+    Call start() before and stop() after each iteration. If multi_process is True,
+    the benchmark runs multiple processes (see classify).
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, multi_process: bool = False) -> None:
+        self.interval = interval
+        self.multi_process = multi_process
+        # Highest average frequency of an iteration seen (used as reference for
+        # frequency drops)
+        self.reference_frequency = 0.0
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.start_time = time.time()
+        self.start_busy = read_busy_time_and_context_switches()
+        self.start_own = get_own_cpu_time()
+        self.start_throttle = read_throttle_count()
+        self.loads: List[int] = []
+        self.frequencies: List[float] = []
+        self.stop_event.clear()
+        self.sample()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        load = read_extra_load()
+        if load is not None:
+            self.loads.append(load)
+        frequency = read_frequency()
+        if frequency is not None:
+            self.frequencies.append(frequency)
+
+    def stop(self) -> Tuple[NoiseSample, List[str]]:
+        """Stop monitoring an iteration and return (sample, reasons for considering it noisy)."""
+        self.stop_event.set()
+        assert self.thread is not None
+        self.thread.join()
+        self.sample()
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        end_busy = read_busy_time_and_context_switches()
+        own_cpu, preemptions = get_own_cpu_time()
+        other_cpu = 0.0
+        context_switches = 0
+        if self.start_busy and end_busy:
+            own = own_cpu - self.start_own[0]
+            other_cpu = max(end_busy[0] - self.start_busy[0] - own, 0.0) / elapsed
+            context_switches = end_busy[1] - self.start_busy[1]
+        sample = NoiseSample(
+            other_cpu=other_cpu,
+            extra_load=sum(self.loads) / len(self.loads) if self.loads else 0.0,
+            min_frequency=min(self.frequencies, default=0.0),
+            throttle_events=read_throttle_count() - self.start_throttle,
+            context_switches=context_switches,
+            preemptions=preemptions - self.start_own[1],
+        )
+        reasons = classify(sample, self.reference_frequency, self.multi_process)
+        if self.frequencies:
+            self.reference_frequency = max(self.reference_frequency,
+                                           sum(self.frequencies) / len(self.frequencies))
+        return sample, reasons
@@ -0,0 +1,165 @@
+"""Generate report about how parallel type checking scales with the number of workers.
+
+The mypy_parallel benchmarks run the same workload using different numbers of
+workers. For each mypy commit, this calculates the speedup and efficiency
+relative to a single worker, and fits Amdahl's law to the runtimes to estimate
+the serial fraction of the work. An increase in the serial fraction suggests
+more synchronization overhead.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import os
+
+from reporting.data import DataItem
+from reporting.markdown import bold, mypy_commit_link
+
+
+# Benchmarks of the same workload with different numbers of workers (None = all CPUs)
+PARALLEL_BENCHMARKS: Dict[str, Optional[int]] = {
+    'mypy_parallel_1': 1,
+    'mypy_parallel_2': 2,
+    'mypy_parallel': 4,
+    'mypy_parallel_8': 8,
+    'mypy_parallel_max': None,
+}
+
+# Highlight changes in serial fraction of at least this many percentage points
+SIGNIFICANT_SERIAL_FRACTION_CHANGE = 1.0
+
+
+class ScalingPoint(NamedTuple):
+    workers: int
+    runtime: float
+    # Runtime with one worker divided by runtime
+    speedup: float
+    # Speedup divided by number of workers
+    efficiency: float
+
+
+class ParallelScaling(NamedTuple):
+    mypy_commit: str
+    points: List[ScalingPoint]
+    # Estimated fraction of work that doesn't benefit from more workers (Amdahl's law)
+    serial_fraction: float
+
+
+def fit_amdahl(points: List[Tuple[int, float]]) -> Tuple[float, float]:
+    """Fit Amdahl's law to (number of workers, runtime) pairs.
+
+    The model is T(n) = T1 * (s + (1 - s) / n), where s is the serial fraction.
+    Return (estimated T1, s). The serial fraction is clamped to [0, 1].
+    """
+    assert len(points) >= 2
+    # Least squares fit of T = a + b * x, where x = 1 / n, a = T1 * s and b = T1 * (1 - s)
+    xs = [1.0 / n for n, _ in points]
+    ys = [t for _, t in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    assert sxx > 0.0, 'at least two different worker counts needed'
+    b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    a = mean_y - b * mean_x
+    t1 = a + b
+    if t1 <= 0.0:
+        return t1, 0.0
+    return t1, min(max(a / t1, 0.0), 1.0)
+
+
+def get_workers(benchmark: str,
+                item: DataItem,
+                environments: Dict[str, Dict[str, str]]) -> Optional[int]:
+    """Return number of workers used in a run, or None if unknown."""
+    workers = PARALLEL_BENCHMARKS[benchmark]
+    if workers is not None:
+        return workers
+    # All CPUs were used
+    cpu_count = environments.get(item.environment, {}).get('cpu_count')
+    return int(cpu_count) if cpu_count else None
+
+
+def gen_parallel_scaling_data(runs: Dict[str, List[DataItem]],
+                              commit_order: Dict[str, int],
+                              environments: Dict[str, Dict[str, str]]) -> List[ParallelScaling]:
+    """Calculate parallel scaling for each mypy commit, from recent to old.
+
+    Only commits with results using one worker and at least one other number of
+    workers are included.
+    """
+    # mypy commit -> number of workers -> runtime
+    runtimes: Dict[str, Dict[int, float]] = {}
+    for benchmark in PARALLEL_BENCHMARKS:
+        for item in runs.get(benchmark, []):
+            if item.mypy_commit not in commit_order or not item.runtime:
+                continue
+            workers = get_workers(benchmark, item, environments)
+            if workers is not None:
+                # Keep the first result for each commit
+                runtimes.setdefault(item.mypy_commit, {}).setdefault(workers, item.runtime)
+    result = []
+    for commit in sorted(runtimes, key=lambda c: commit_order[c]):
+        by_workers = runtimes[commit]
+        if 1 not in by_workers or len(by_workers) < 2:
+            continue
+        t1 = by_workers[1]
+        points = [ScalingPoint(n, t, t1 / t, t1 / t / n) for n, t in sorted(by_workers.items())]
+        _, serial_fraction = fit_amdahl([(p.workers, p.runtime) for p in points])
+        result.append(ParallelScaling(commit, points, serial_fraction))
+    return result
+
+
+def gen_parallel_scaling_table(data: List[ParallelScaling],
+                               commit_dates: Dict[str, Tuple[str, str]]) -> List[str]:
+    """Generate markdown table with speedup and efficiency per number of workers."""
+    workers = sorted({p.workers for item in data for p in item.points})
+    lines = []
+    lines.append('| Date | %s | Serial fraction | Mypy commit |' % ' | '.join(
+        '%d workers' % n if n > 1 else '1 worker' for n in workers))
+    lines.append('| --- | %s | :---: | --- |' % ' | '.join(':---:' for _ in workers))
+    for i, item in enumerate(data):
+        by_workers = {p.workers: p for p in item.points}
+        cells = []
+        for n in workers:
+            p = by_workers.get(n)
+            if p is None:
+                cells.append('')
+            elif n == 1:
+                cells.append('%.2fs' % p.runtime)
+            else:
+                cells.append('%.2fx (%.0f%%)' % (p.speedup, 100.0 * p.efficiency))
+        serial = '%.1f%%' % (100.0 * item.serial_fraction)
+        # Items are sorted from recent to old
+        if i + 1 < len(data):
+            change = 100.0 * (item.serial_fraction - data[i + 1].serial_fraction)
+            if abs(change) >= SIGNIFICANT_SERIAL_FRACTION_CHANGE:
+                serial += ' ' + bold('%+.1f' % change)
+        lines.append('| %s | %s | %s | %s |' % (
+            commit_dates.get(item.mypy_commit, ("???", "???"))[0],
+            ' | '.join(cells),
+            serial,
+            mypy_commit_link(item.mypy_commit),
+        ))
+    return lines
+
+
+def gen_parallel_scaling_report(runs: Dict[str, List[DataItem]],
+                                output_dir: str,
+                                commit_order: Dict[str, int],
+                                commit_dates: Dict[str, Tuple[str, str]],
+                                environments: Dict[str, Dict[str, str]]) -> None:
+    data = gen_parallel_scaling_data(runs, commit_order, environments)
+    if not data:
+        return
+    fnam = os.path.join(output_dir, 'parallel-scaling.md')
+    lines = []
+    lines.append('# Parallel type checking scaling')
+    lines.append('')
+    lines.append('Speedup of the mypy_parallel workload relative to one worker, and '
+                 + 'efficiency (speedup per worker) in parentheses. The serial fraction is '
+                 + "estimated by fitting Amdahl's law to the runtimes. Changes of at least "
+                 + '%.1f percentage points are highlighted.' % SIGNIFICANT_SERIAL_FRACTION_CHANGE)
+    lines.append('')
+    lines.extend(gen_parallel_scaling_table(data, commit_dates))
+    os.makedirs(output_dir, exist_ok=True)
+    print('writing %s' % fnam)
+    with open(fnam, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,231 @@
+"""Utilities for benchmark profiles in the collapsed stack format.
+
+runbench.py --profile writes profiles in the collapsed stack format used by
+flame graph tools: each line has semicolon-separated stack frames (outermost
+first), followed by a space and a sample count (or microseconds, for cProfile).
+
+This module can also compare two profiles, for example profiles collected
+using two mypy commits, to find which functions got slower:
+
+  python3 -m reporting.profiles old.folded new.folded
+"""
+
+from typing import Dict, List, NamedTuple, Tuple, Any
+import argparse
+import os
+import re
+
+
+# Collapsed stacks (semicolon-separated frames -> weight)
+Stacks = Dict[str, float]
+
+# Ignore stacks with less than this many microseconds when converting cProfile data
+MIN_PSTATS_WEIGHT = 1.0
+
+# Don't expand cProfile call graphs deeper than this
+MAX_PSTATS_DEPTH = 100
+
+
+def demangle_mypyc_symbol(symbol: str) -> str:
+    """Convert a C symbol generated by mypyc to a Python-style name.
+
+    For example, 'CPyDef_richards___Task___run' becomes 'richards.Task.run'.
+    Other symbols are returned unmodified.
+    """
+    for prefix in 'CPyDef_', 'CPyPy_':
+        if symbol.startswith(prefix):
+            return symbol[len(prefix):].replace('___', '.')
+    return symbol
+
+
+def parse_perf_frame(line: str) -> str:
+    """Return the function name from a stack frame line of 'perf script' output."""
+    _, _, rest = line.strip().partition(' ')
+    symbol, _, dso = rest.rpartition(' (')
+    if not symbol:
+        symbol = rest
+    # Remove offset such as '+0x1f'
+    symbol = re.sub(r'\+0x[0-9a-f]+$', '', symbol)
+    if symbol == '[unknown]' and dso:
+        return '[%s]' % os.path.basename(dso.rstrip(')'))
+    return demangle_mypyc_symbol(symbol)
+
+
+def collapse_perf_script(output: str) -> Stacks:
+    """Collapse stacks from 'perf script' output, counting samples per stack."""
+    stacks: Stacks = {}
+    for block in re.split(r'\n\s*\n', output):
+        lines = [line for line in block.splitlines() if line.strip()]
+        if not lines or lines[0].startswith('#'):
+            continue
+        comm = lines[0].split()[0]
+        frames = [parse_perf_frame(line) for line in reversed(lines[1:])]
+        add_stack(stacks, [comm] + frames, 1.0)
+    return stacks
+
+
+def pstats_function_name(func: Tuple[str, int, str]) -> str:
+    fnam, line, name = func
+    if fnam == '~':
+        # Built-in function
+        return name
+    return '%s:%s:%d' % (name, os.path.basename(fnam), line)
+
+
+def collapse_pstats(stats: Dict[Any, Any]) -> Stacks:
+    """Collapse stacks from cProfile data (the 'stats' attribute of pstats.Stats).
+
+    cProfile only records caller/callee pairs, not full stacks, so time spent
+    in a function called from multiple places is distributed over the calling
+    stacks in proportion to the time spent in each call site. Weights are in
+    microseconds. Recursive calls are folded into the outermost call.
+    """
+    callees: Dict[Any, Dict[Any, float]] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, caller_ct) in callers.items():
+            callees.setdefault(caller, {})[func] = caller_ct
+    roots = [func for func, (_, _, _, _, callers) in stats.items()
+             if not any(caller in stats for caller in callers)]
+    stacks: Stacks = {}
+
+    def expand(func: Any, stack: List[Any], fraction: float) -> None:
+        # fraction is the share of all calls to func that happen in this stack
+        tt, ct = stats[func][2], stats[func][3]
+        stack = stack + [func]
+        names = [pstats_function_name(f) for f in stack]
+        self_time = tt * fraction * 1e6
+        if self_time >= MIN_PSTATS_WEIGHT:
+            add_stack(stacks, names, self_time)
+        if len(stack) >= MAX_PSTATS_DEPTH:
+            return
+        for callee, edge_ct in callees.get(func, {}).items():
+            if callee in stack or callee not in stats:
+                continue
+            callee_ct = stats[callee][3]
+            if callee_ct <= 0.0:
+                continue
+            callee_fraction = edge_ct * fraction / callee_ct
+            if callee_ct * callee_fraction * 1e6 >= MIN_PSTATS_WEIGHT:
+                expand(callee, stack, callee_fraction)
+
+    for root in roots:
+        expand(root, [], 1.0)
+    return stacks
+
+
+def add_stack(stacks: Stacks, frames: List[str], weight: float) -> None:
+    key = ';'.join(frame.replace(';', ':') for frame in frames)
+    stacks[key] = stacks.get(key, 0.0) + weight
+
+
+def merge_stacks(a: Stacks, b: Stacks) -> Stacks:
+    result = dict(a)
+    for stack, weight in b.items():
+        result[stack] = result.get(stack, 0.0) + weight
+    return result
+
+
+def write_collapsed(fnam: str, stacks: Stacks) -> None:
+    with open(fnam, 'w') as f:
+        for stack, weight in sorted(stacks.items()):
+            f.write('%s %d\n' % (stack, round(weight)))
+
+
+def read_collapsed(fnam: str) -> Stacks:
+    stacks: Stacks = {}
+    with open(fnam) as f:
+        for line in f:
+            stack, _, weight = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] = stacks.get(stack, 0.0) + float(weight)
+    return stacks
+
+
+def function_times(stacks: Stacks) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """Return (self weight, total weight) of each function in collapsed stacks.
+
+    Total weight includes the weight of callees. A function that appears
+    multiple times in a stack (due to recursion) is only counted once.
+    """
+    self_times: Dict[str, float] = {}
+    total_times: Dict[str, float] = {}
+    for stack, weight in stacks.items():
+        frames = stack.split(';')
+        self_times[frames[-1]] = self_times.get(frames[-1], 0.0) + weight
+        for frame in set(frames):
+            total_times[frame] = total_times.get(frame, 0.0) + weight
+    return self_times, total_times
+
+
+class FunctionDelta(NamedTuple):
+    function: str
+    # Self weight as percentage of total weight of profile a
+    self_a: float
+    self_b: float
+    # Total weight (including callees) as percentage of total weight of profile a
+    total_a: float
+    total_b: float
+
+
+def diff_profiles(a: Stacks, b: Stacks) -> List[FunctionDelta]:
+    """Compare functions in two profiles, largest increase in self weight first.
+
+    Weights are shown as percentages of the total weight of profile a.
+    """
+    total = sum(a.values())
+    if not total:
+        return []
+    # Use the same scale for both profiles, since otherwise a function getting
+    # slower would make all other functions look faster.
+    scale = 100.0 / total
+    self_a, total_a = function_times(a)
+    self_b, total_b = function_times(b)
+    result = []
+    for func in set(total_a) | set(total_b):
+        result.append(FunctionDelta(func,
+                                    self_a.get(func, 0.0) * scale,
+                                    self_b.get(func, 0.0) * scale,
+                                    total_a.get(func, 0.0) * scale,
+                                    total_b.get(func, 0.0) * scale))
+    result.sort(key=lambda d: (-(d.self_b - d.self_a), d.function))
+    return result
+
+
+def format_profile_diff(deltas: List[FunctionDelta], limit: int) -> List[str]:
+    """Format functions with the largest changes (at most limit slower and faster ones)."""
+    lines = ['%-9s %-9s %-9s %-9s  %s' % ('Self A', 'Self B', 'Change', 'Total B', 'Function')]
+    changed = [d for d in deltas if abs(d.self_b - d.self_a) >= 0.01]
+    slower = [d for d in changed if d.self_b > d.self_a][:limit]
+    faster = [d for d in reversed(changed) if d.self_b < d.self_a][:limit]
+    for d in slower + faster:
+        lines.append('%-9s %-9s %-9s %-9s  %s' % ('%.2f%%' % d.self_a,
+                                                 '%.2f%%' % d.self_b,
+                                                 '%+.2f%%' % (d.self_b - d.self_a),
+                                                 '%.2f%%' % d.total_b,
+                                                 d.function))
+    return lines
+
+
+def parse_args() -> Tuple[str, str, int]:
+    parser = argparse.ArgumentParser(
+        description="""Compare two profiles in collapsed stack format (generated using
+                       runbench.py --profile). Percentages are relative to the total
+                       weight of the first profile, so profiles should be collected using the
+                       same number of iterations.""")
+    parser.add_argument("profile_a", help="baseline profile")
+    parser.add_argument("profile_b", help="new profile")
+    parser.add_argument("--limit", type=int, default=20,
+                        help="show at most N slower and N faster functions (default 20)")
+    args = parser.parse_args()
+    return args.profile_a, args.profile_b, args.limit
+
+
+def main() -> None:
+    profile_a, profile_b, limit = parse_args()
+    deltas = diff_profiles(read_collapsed(profile_a), read_collapsed(profile_b))
+    for line in format_profile_diff(deltas, limit):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
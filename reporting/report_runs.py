@@ -8,6 +8,12 @@ from reporting.data import (
     DataItem, find_baseline, BenchmarkData, sort_data_items, is_significant_percent_change,
     significant_percent_change, get_benchmark_names
 )
+from reporting.metrics import MetricItem
+
+
+# Highlight changes in metrics other than runtime that are at least this large
+# (percentage). Metrics such as instruction counts are much less noisy than runtimes.
+SIGNIFICANT_METRIC_CHANGE = 1.0
 
 
 class BenchmarkItem(NamedTuple):
@@ -97,6 +103,50 @@ def gen_benchmark_table(data: List[BenchmarkItem]) -> List[str]:
     return lines
 
 
+def format_metric_value(value: float) -> str:
+    for limit, suffix in (1e9, 'G'), (1e6, 'M'), (1e3, 'k'):
+        if abs(value) >= limit:
+            return '%.3f%s' % (value / limit, suffix)
+    return '%.4g' % value
+
+
+def gen_metrics_table(items: List[MetricItem],
+                      commit_order: Dict[str, int],
+                      commit_dates: Dict[str, Tuple[str, str]]) -> List[str]:
+    """Generate markdown table with metrics other than runtime, one row per mypy commit."""
+    values: Dict[str, Dict[str, float]] = {}
+    for item in items:
+        if item.mypy_commit in commit_order:
+            values.setdefault(item.mypy_commit, {})[item.metric] = item.value
+    commits = sorted(values, key=lambda c: commit_order[c])
+    metrics = sorted({item.metric for item in items})
+    lines = []
+    lines.append('| Date | %s | Mypy commit |' % ' | '.join(metrics))
+    lines.append('| --- | %s | --- |' % ' | '.join(':---:' for _ in metrics))
+    for i, commit in enumerate(commits):
+        # Commits are sorted from recent to old
+        previous = values[commits[i + 1]] if i + 1 < len(commits) else {}
+        cells = []
+        for metric in metrics:
+            value = values[commit].get(metric)
+            if value is None:
+                cells.append('')
+                continue
+            cell = format_metric_value(value)
+            old = previous.get(metric)
+            if old:
+                change = 100.0 * (value / old - 1.0)
+                if abs(change) >= SIGNIFICANT_METRIC_CHANGE:
+                    cell += ' ' + bold('%+.1f%%' % change)
+            cells.append(cell)
+        lines.append('| %s | %s | %s |' % (
+            commit_dates.get(commit, ("???", "???"))[0],
+            ' | '.join(cells),
+            mypy_commit_link(commit),
+        ))
+    return lines
+
+
 def gen_reports_for_benchmarks(data: BenchmarkData,
                                output_dir: str,
                                commit_order: Dict[str, int],
@@ -134,6 +184,13 @@ def gen_reports_for_benchmarks(data: BenchmarkData,
             )
             lines.append("")
         lines.extend(table)
+        if benchmark in data.metrics:
+            lines.append('')
+            lines.append('## Other metrics')
+            lines.append('')
+            lines.append('Changes of at least %.1f%% are highlighted.' % SIGNIFICANT_METRIC_CHANGE)
+            lines.append('')
+            lines.extend(gen_metrics_table(data.metrics[benchmark], commit_order, commit_dates))
         os.makedirs(output_dir, exist_ok=True)
         print('writing %s' % fnam)
         with open(fnam, 'w') as f:
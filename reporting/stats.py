@@ -0,0 +1,215 @@
+"""Statistical helpers for analyzing benchmark measurements."""
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import math
+import random
+import statistics
+
+
+def mean(a: Sequence[float]) -> float:
+    return sum(a) / len(a)
+
+
+def percentile(sorted_a: Sequence[float], p: float) -> float:
+    """Return the p'th percentile (0 <= p <= 1) of sorted data, using interpolation."""
+    assert sorted_a
+    k = (len(sorted_a) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_a) - 1)
+    return sorted_a[lo] + (sorted_a[hi] - sorted_a[lo]) * (k - lo)
+
+
+def median(a: Sequence[float]) -> float:
+    return percentile(sorted(a), 0.5)
+
+
+def mad(a: Sequence[float]) -> float:
+    """Return the median absolute deviation scaled to estimate the standard deviation."""
+    m = median(a)
+    return 1.4826 * median([abs(x - m) for x in a])
+
+
+def stdev(a: Sequence[float]) -> float:
+    return statistics.stdev(a) if len(a) > 1 else 0.0
+
+
+def detect_warmup(a: Sequence[float], threshold: float = 3.0, min_change: float = 0.01) -> int:
+    """Return the number of warm-up samples at the start of a.
+
+    Each sample at the start is tested against all later samples: it's a warm-up
+    sample if it's slower than their median by more than threshold robust standard
+    deviations (estimated using the median absolute deviation) and by more than
+    min_change (relative to the median). The first sample that passes the test
+    starts the steady state. At most half of the samples are treated as warm-up.
+    """
+    k = 0
+    while k < len(a) // 2:
+        rest = a[k + 1:]
+        m = median(rest)
+        deviation = median([abs(x - m) for x in rest])
+        if a[k] - m <= max(threshold * 1.4826 * deviation, min_change * m):
+            break
+        k += 1
+    return k
+
+
+def resample(rand: random.Random, a: Sequence[float]) -> List[float]:
+    return [a[rand.randrange(len(a))] for _ in range(len(a))]
+
+
+def paired_bootstrap_ratio_ci(a: Sequence[float],
+                              b: Sequence[float],
+                              confidence: float = 0.95,
+                              resamples: int = 2000,
+                              seed: int = 0) -> Tuple[float, float]:
+    """Return bootstrap confidence interval for mean(a) / mean(b) of paired samples.
+
+    a[i] and b[i] were measured together, so pairs are resampled (percentile
+    bootstrap). Drift that affects both samples of a pair cancels out.
+    """
+    assert len(a) == len(b)
+    rand = random.Random(seed)
+    n = len(a)
+    ratios = []
+    for _ in range(resamples):
+        indices = [rand.randrange(n) for _ in range(n)]
+        ratios.append(sum(a[i] for i in indices) / sum(b[i] for i in indices))
+    ratios.sort()
+    alpha = (1.0 - confidence) / 2
+    return percentile(ratios, alpha), percentile(ratios, 1.0 - alpha)
+
+
+def paired_permutation_test(a: Sequence[float],
+                            b: Sequence[float],
+                            resamples: int = 10000,
+                            seed: int = 0) -> float:
+    """Return two-sided p-value for a difference between paired samples a and b.
+
+    This is a sign-flip permutation test on the log ratios log(a[i] / b[i]): under
+    the null hypothesis, each ratio is as likely to be above as below 1. This makes
+    no other assumptions about the distributions.
+    """
+    assert len(a) == len(b)
+    rand = random.Random(seed)
+    diffs = [math.log(x / y) for x, y in zip(a, b)]
+    observed = abs(sum(diffs))
+    count = 0
+    for _ in range(resamples):
+        if abs(sum(d if rand.random() < 0.5 else -d for d in diffs)) >= observed:
+            count += 1
+    # Include the observed permutation so that the p-value is never zero.
+    return (count + 1) / (resamples + 1)
+
+
+def bootstrap_ci(a: Sequence[float],
+                 statistic: Callable[[Sequence[float]], float],
+                 confidence: float = 0.95,
+                 resamples: int = 2000,
+                 seed: int = 0) -> Tuple[float, float]:
+    """Return percentile bootstrap confidence interval for statistic(a)."""
+    rand = random.Random(seed)
+    values = sorted(statistic(resample(rand, a)) for _ in range(resamples))
+    alpha = (1.0 - confidence) / 2
+    return percentile(values, alpha), percentile(values, 1.0 - alpha)
+
+
+def hodges_lehmann(a: Sequence[float]) -> float:
+    """Return the Hodges-Lehmann estimate of location (median of all pairwise means)."""
+    n = len(a)
+    return median([(a[i] + a[j]) / 2 for i in range(n) for j in range(i, n)])
+
+
+class Estimate(NamedTuple):
+    # Estimate of a typical runtime
+    value: float
+    # Estimate of the standard deviation of a single sample
+    stdev: float
+    # Samples that were used (outliers are excluded)
+    samples: List[float]
+    # Confidence interval of value, if the estimator provides one
+    ci: Optional[Tuple[float, float]] = None
+
+
+def estimate_smoothen(a: Sequence[float]) -> Estimate:
+    """Mean after removing (at most) one third of the slowest samples.
+
+    These are likely outliers, but this also biases the estimate downward.
+    """
+    samples = sorted(a)[: 2 * (len(a) + 1) // 3]
+    return Estimate(mean(samples), stdev(samples), samples)
+
+
+def estimate_mean(a: Sequence[float]) -> Estimate:
+    """Mean of all samples."""
+    return Estimate(mean(a), stdev(a), list(a))
+
+
+def estimate_median(a: Sequence[float]) -> Estimate:
+    """Median, with a bootstrap confidence interval."""
+    return Estimate(median(a), mad(a), list(a), bootstrap_ci(a, median))
+
+
+def estimate_mad(a: Sequence[float], threshold: float = 3.0) -> Estimate:
+    """Mean after removing samples more than threshold robust standard deviations from median.
+
+    The robust standard deviation is estimated using the median absolute deviation.
+    If it's zero (most samples are identical, such as with a coarse timer), all
+    samples are used.
+    """
+    m = median(a)
+    limit = threshold * mad(a)
+    if limit > 0:
+        samples = [x for x in a if abs(x - m) <= limit]
+    else:
+        samples = list(a)
+    return Estimate(mean(samples), stdev(samples), samples)
+
+
+def estimate_hodges_lehmann(a: Sequence[float]) -> Estimate:
+    """Hodges-Lehmann estimate (robust, but more efficient than the median)."""
+    return Estimate(hodges_lehmann(a), mad(a), list(a))
+
+
+# Estimators for summarizing runtimes (name -> estimator)
+ESTIMATORS: Dict[str, Callable[[Sequence[float]], Estimate]] = {
+    'smoothen': estimate_smoothen,
+    'mean': estimate_mean,
+    'median': estimate_median,
+    'mad': estimate_mad,
+    'hodges_lehmann': estimate_hodges_lehmann,
+}
+
+
+def detect_bimodality(a: Sequence[float],
+                      min_fraction: float = 0.15,
+                      min_separation: float = 4.0,
+                      min_change: float = 0.01) -> Optional[Tuple[float, float]]:
+    """If samples split into two clusters, return the means of the clusters.
+
+    The samples are split into two clusters at the point that minimizes the
+    total within-cluster variance. The split is reported if both clusters have at
+    least min_fraction of samples, and the cluster means differ by at least
+    min_separation pooled within-cluster standard deviations and by at least
+    min_change (relative).
+    """
+    a = sorted(a)
+    n = len(a)
+    min_size = max(2, int(min_fraction * n + 0.5))
+    best: Optional[Tuple[float, int]] = None
+    for k in range(min_size, n - min_size + 1):
+        ss = sum_of_squares(a[:k]) + sum_of_squares(a[k:])
+        if best is None or ss < best[0]:
+            best = (ss, k)
+    if best is None:
+        return None
+    ss, k = best
+    low, high = mean(a[:k]), mean(a[k:])
+    pooled_stdev = (ss / (n - 2)) ** 0.5
+    if high - low < min_separation * pooled_stdev or high - low < min_change * low:
+        return None
+    return low, high
+
+
+def sum_of_squares(a: Sequence[float]) -> float:
+    m = mean(a)
+    return sum((x - m) ** 2 for x in a)
@@ -0,0 +1,82 @@
+from pathlib import Path
+import os
+
+from reporting.corpora import (
+    Corpus, check_output, count_errors, hash_tree, is_crash, load_corpora, save_corpora,
+    verify_corpus,
+)
+
+
+OUTPUT = """\
+pkg/a.py:10: error: Incompatible types in assignment  [assignment]
+pkg/a.py:10: note: See documentation
+pkg/b.py:3:5: error: Name "x" is not defined  [name-defined]
+"""
+
+
+def write(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def make_corpus(root: str) -> Corpus:
+    return Corpus(name='test_v1', root=root, targets=[os.path.join(root, 'pkg')],
+                  config_file=None, files=hash_tree(root), expected_errors=2,
+                  frozen_with='mypy 1.0.0')
+
+
+def test_hash_tree(tmp_path: Path) -> None:
+    root = str(tmp_path)
+    write(os.path.join(root, 'pkg', 'a.py'), 'x = 1\n')
+    write(os.path.join(root, 'pkg', '__pycache__', 'a.cpython-312.pyc'), 'bytecode')
+    write(os.path.join(root, 'pkg', 'b.pyc'), 'bytecode')
+    write(os.path.join(root, 'setup.cfg'), '')
+    hashes = hash_tree(root)
+    assert list(hashes) == ['pkg/a.py', 'setup.cfg']
+    assert hashes['setup.cfg'] == (
+        'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855')
+
+
+def test_verify_corpus(tmp_path: Path) -> None:
+    root = str(tmp_path)
+    write(os.path.join(root, 'pkg', 'a.py'), 'x = 1\n')
+    write(os.path.join(root, 'pkg', 'b.py'), 'y = 1\n')
+    corpus = make_corpus(root)
+    assert verify_corpus(corpus) == []
+    write(os.path.join(root, 'pkg', 'a.py'), 'x = 2\n')
+    os.remove(os.path.join(root, 'pkg', 'b.py'))
+    write(os.path.join(root, 'pkg', 'c.py'), '')
+    assert verify_corpus(corpus) == [
+        'test_v1: modified file pkg/a.py',
+        'test_v1: missing file pkg/b.py',
+        'test_v1: unexpected file pkg/c.py',
+    ]
+    assert verify_corpus(corpus._replace(root=os.path.join(root, 'missing'))) == [
+        'test_v1: directory %s not found' % os.path.join(root, 'missing')]
+
+
+def test_manifest_round_trip(tmp_path: Path) -> None:
+    write(os.path.join(str(tmp_path), 'pkg', 'a.py'), 'x = 1\n')
+    corpus = make_corpus(str(tmp_path))
+    fnam = os.path.join(str(tmp_path), 'corpora.json')
+    save_corpora({corpus.name: corpus}, fnam)
+    assert load_corpora(fnam) == {'test_v1': corpus}
+
+
+def test_check_output(tmp_path: Path) -> None:
+    assert count_errors(OUTPUT) == 2
+    assert count_errors('') == 0
+    corpus = make_corpus(str(tmp_path))
+    assert check_output(corpus, OUTPUT) is None
+    warning = check_output(corpus, OUTPUT + 'pkg/c.py:1: error: Bad  [misc]\n')
+    assert warning is not None
+    assert 'expected 2 errors but mypy reported 3' in warning
+
+
+def test_is_crash() -> None:
+    assert not is_crash(0, '', '')
+    # Errors in the corpus
+    assert not is_crash(1, OUTPUT, '')
+    assert is_crash(2, '', 'mypy: error: Invalid config file')
+    assert is_crash(1, OUTPUT, 'Traceback (most recent call last):\n  ...')
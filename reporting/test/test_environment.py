@@ -0,0 +1,44 @@
+from datetime import datetime
+from pathlib import Path
+
+from reporting.data import read_csv, write_csv_line, CSV_HEADER
+from reporting.environment import (
+    normalize_cpu_model, parse_cpuinfo, environment_id, load_environments
+)
+
+
+def test_normalize_cpu_model() -> None:
+    assert normalize_cpu_model(
+        '11th Gen Intel(R) Core(TM) i5-1145G7 @ 2.60GHz') == 'Intel Core i5-1145G7'
+    assert normalize_cpu_model(
+        'Intel(R) Core(TM) i7-2600K CPU @ 3.40GHz') == 'Intel Core i7-2600K'
+    assert normalize_cpu_model(
+        'AMD Ryzen 9 3950X 16-Core Processor') == 'AMD Ryzen 9 3950X'
+
+
+def test_parse_cpuinfo() -> None:
+    data = 'processor\t: 0\nmodel name\t: Foo CPU\nmicrocode\t: 0x1\n\nprocessor\t: 1\n'
+    assert parse_cpuinfo(data) == {'processor': '0', 'model name': 'Foo CPU', 'microcode': '0x1'}
+
+
+def test_environment_id_is_stable() -> None:
+    assert environment_id({'a': '1', 'b': '2'}) == environment_id({'b': '2', 'a': '1'})
+    assert environment_id({'a': '1'}) != environment_id({'a': '2'})
+
+
+def test_write_csv_line_records_environment(tmp_path: Path) -> None:
+    fnam = str(tmp_path / 'richards.csv')
+    old_header = CSV_HEADER.replace(',Environment', '')
+    old_row = '2020-01-01 00:00:00,1.000000,2.000000,c0,b0,3.8.1,hw,os,clang 10\n'
+    with open(fnam, 'w') as f:
+        f.write(old_header + old_row)
+    env = {'cpu_model': 'Foo'}
+    write_csv_line(fnam, 'richards', datetime(2021, 1, 1), 0.5, 1.0, 'c1', 'b1',
+                   python_version='3.9.0', hardware_id='hw', os_version='os',
+                   c_compiler='clang 11', environment=env, estimator='median')
+    with open(fnam) as f:
+        assert f.readline() == CSV_HEADER
+    items = read_csv(fnam)
+    assert [item.environment for item in items] == ['', environment_id(env)]
+    assert [item.estimator for item in items] == ['', 'median']
+    assert load_environments(str(tmp_path)) == {environment_id(env): env}
@@ -0,0 +1,38 @@
+from reporting.importtime import (
+    ImportTime, gen_synthetic_modules, parse_importtime, find_import_time, cost_per_item
+)
+
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | encodings
+import time:        50 |         50 |     mypy_extensions
+import time:       700 |        750 |   startup
+import time:      2000 |       2750 | startup.startup_classes
+"""
+
+
+def test_parse_importtime() -> None:
+    items = parse_importtime(IMPORTTIME_OUTPUT)
+    assert items[0] == ImportTime('_io', 120, 120, 1)
+    assert len(items) == 5
+    assert find_import_time(items, 'startup.startup_classes') == ImportTime(
+        'startup.startup_classes', 2000, 2750, 0)
+    assert find_import_time(items, 'missing') is None
+
+
+def test_gen_synthetic_modules() -> None:
+    modules = gen_synthetic_modules(3)
+    assert sorted(modules) == ['startup_classes', 'startup_constants', 'startup_empty',
+                               'startup_functions', 'startup_native_classes']
+    for source in modules.values():
+        compile(source, '<string>', 'exec')
+    assert modules['startup_functions'].count('def ') == 3
+    assert modules['startup_classes'].count('native_class=False') == 3
+    assert 'native_class=False' not in modules['startup_native_classes']
+
+
+def test_cost_per_item() -> None:
+    times = {'startup_empty': 100.0, 'startup_functions': 600.0, 'startup_classes': 1100.0}
+    assert cost_per_item(times, 10) == {'functions': 50.0, 'classes': 100.0}
@@ -0,0 +1,65 @@
+from typing import Any, Dict
+from pathlib import Path
+
+from reporting import instrument
+from reporting.instrument import (
+    FunctionStats, instrument_source, merge_stats, write_stats, read_stats, format_stats_diff
+)
+
+
+SOURCE = '''\
+"""Docstring."""
+from __future__ import annotations
+
+
+def fib(n: int) -> int:
+    """Docstring."""
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+
+class C:
+    def method(self) -> int:
+        def nested() -> int:
+            return 1
+        return nested()
+
+    def gen(self) -> object:
+        yield 1
+'''
+
+
+def test_instrument_source() -> None:
+    source, functions = instrument_source(SOURCE)
+    assert functions == ['fib', 'C.method.<locals>.nested', 'C.method']
+    lines = source.splitlines()
+    assert lines[0] == '"""Docstring."""'
+    assert lines[1] == 'from __future__ import annotations'
+    assert lines[2].startswith('from reporting.instrument import')
+    # Run the instrumented code
+    base = len(instrument.names)
+    namespace: Dict[str, Any] = {'__name__': 'test'}
+    exec(compile(source, 'test.py', 'exec'), namespace)
+    assert namespace['_instrument_base'] == base
+    fib = namespace['fib']
+    assert fib.__doc__ == 'Docstring.'
+    assert fib(5) == 5
+    stats = instrument.get_stats()
+    assert stats['fib'].calls == 15
+    assert stats['fib'].total <= stats['fib'].self_time + 1e-3
+    assert stats['fib'].total > 0.0
+    assert 'C.method' not in stats
+    assert not instrument.stack
+
+
+def test_merge_and_diff_stats(tmp_path: Path) -> None:
+    a = {'f': FunctionStats(2, 3.0, 1.0), 'g': FunctionStats(1, 2.0, 2.0)}
+    b = {'f': FunctionStats(2, 5.0, 4.0)}
+    assert merge_stats(a, b) == {'f': FunctionStats(4, 8.0, 5.0), 'g': FunctionStats(1, 2.0, 2.0)}
+    fnam = str(tmp_path / 'stats.json')
+    write_stats(fnam, a)
+    assert read_stats(fnam) == a
+    lines = format_stats_diff(a, b, 10)
+    assert lines[1].split() == ['1000.00', '4000.00', '+3000.00', '2', '2', 'f']
+    assert lines[2].split() == ['2000.00', '0.00', '-2000.00', '1', '0', 'g']
@@ -0,0 +1,130 @@
+from datetime import datetime
+from pathlib import Path
+import multiprocessing
+from typing import List
+
+from reporting.jobqueue import JobQueue, JobResult, Job
+from reporting.worker import acquire_machine_lock
+
+
+def make_result(job: Job, runtime: float) -> JobResult:
+    return JobResult(job, 'w', datetime(2024, 1, 2, 3, 4, 5), runtime, 1.5, 'bc', '3.12.1',
+                     'hw', 'os', 'clang 18', {'cpu_model': 'x'},
+                     {'instructions': 1e9}, 'smoothen')
+
+
+def test_claim_complete_and_take_results(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path / 'q.db'))
+    queue.add_job('c1', 'richards', 'bc')
+    queue.add_job('c1', 'deltablue', 'bc')
+    queue.add_job('c1', 'richards', 'bc')  # Duplicate is ignored
+    assert queue.num_unfinished() == 2
+    job1 = queue.claim_job('w')
+    job2 = queue.claim_job('w')
+    assert job1 == Job(1, 'c1', 'richards', 'bc')
+    assert job2 == Job(2, 'c1', 'deltablue', 'bc')
+    assert queue.claim_job('w') is None
+    queue.complete_job(make_result(job2, 0.5))
+    queue.fail_job(job1)
+    assert queue.num_unfinished() == 0
+    assert queue.take_results() == [make_result(job2, 0.5)]
+    assert queue.take_results() == []
+
+
+def test_add_failed_job_again(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path / 'q.db'))
+    queue.add_job('c1', 'richards', 'bc')
+    queue.add_job('c1', 'deltablue', 'bc')
+    job1 = queue.claim_job('w')
+    job2 = queue.claim_job('w')
+    assert job1 is not None and job2 is not None
+    queue.fail_job(job1)
+    queue.complete_job(make_result(job2, 0.5))
+    queue.add_job('c1', 'richards', 'bc')
+    queue.add_job('c1', 'deltablue', 'bc')
+    # Only the failed job is retried
+    assert queue.num_unfinished() == 1
+    assert queue.claim_job('w') == job1
+    assert queue.claim_job('w') is None
+
+
+def test_add_pending_job_with_new_benchmark_commit(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path / 'q.db'))
+    queue.add_job('c1', 'richards', 'bc')
+    queue.add_job('c1', 'richards', 'bc2')
+    job = queue.claim_job('w')
+    assert job is not None
+    assert job.benchmark_commit == 'bc2'
+    queue.release_job(job)
+    assert queue.claim_job('w2') == job
+
+
+def test_requeue_stale_jobs(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path / 'q.db'))
+    queue.add_job('c1', 'richards', 'bc')
+    job = queue.claim_job('w')
+    assert queue.requeue_stale_jobs(3600.0) == 0
+    assert queue.requeue_stale_jobs(-1.0) == 1
+    assert queue.claim_job('w2') == job
+
+
+def test_heartbeat(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path / 'q.db'))
+    assert queue.last_heartbeat() is None
+    queue.heartbeat('w1')
+    first = queue.last_heartbeat()
+    assert first is not None
+    queue.heartbeat('w2')
+    last = queue.last_heartbeat()
+    assert last is not None and last >= first
+
+
+def claim_all(path: str, worker_id: str) -> List[int]:
+    queue = JobQueue(path)
+    claimed = []
+    while True:
+        job = queue.claim_job(worker_id)
+        if job is None:
+            break
+        claimed.append(job.id)
+        queue.complete_job(make_result(job, 1.0))
+    queue.close()
+    return claimed
+
+
+def test_concurrent_workers_claim_each_job_once(tmp_path: Path) -> None:
+    path = str(tmp_path / 'q.db')
+    queue = JobQueue(path)
+    for i in range(200):
+        queue.add_job('c%d' % i, 'bm', 'bc')
+    with multiprocessing.Pool(4) as pool:
+        claimed = pool.starmap(claim_all, [(path, 'w%d' % i) for i in range(4)])
+    all_claimed = [job_id for ids in claimed for job_id in ids]
+    assert sorted(all_claimed) == list(range(1, 201))
+    assert len(queue.take_results()) == 200
+
+
+def test_one_worker_per_machine(tmp_path: Path) -> None:
+    fnam = str(tmp_path / 'worker.lock')
+    lock = acquire_machine_lock(fnam)
+    assert lock is not None
+    assert acquire_machine_lock(fnam) is None
+    lock.close()
+    second = acquire_machine_lock(fnam)
+    assert second is not None
+    second.close()
+
+
+def test_shared_machine_lock(tmp_path: Path) -> None:
+    fnam = str(tmp_path / 'worker.lock')
+    first = acquire_machine_lock(fnam, shared=True)
+    second = acquire_machine_lock(fnam, shared=True)
+    assert first is not None and second is not None
+    # A worker that doesn't allow sharing can't run alongside them
+    assert acquire_machine_lock(fnam) is None
+    first.close()
+    second.close()
+    exclusive = acquire_machine_lock(fnam)
+    assert exclusive is not None
+    assert acquire_machine_lock(fnam, shared=True) is None
+    exclusive.close()
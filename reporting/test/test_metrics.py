@@ -0,0 +1,77 @@
+from datetime import datetime
+from pathlib import Path
+import json
+
+import pytest
+
+from benchmarking import MetricsCollector, collectors
+from reporting.collect import read_metrics_from_json
+from reporting.metrics import MetricItem, write_metrics, load_metrics
+from reporting.report_runs import format_metric_value
+
+
+def test_write_and_load_metrics(tmp_path: Path) -> None:
+    data_repo = str(tmp_path)
+    t = datetime(2024, 5, 6, 7, 8, 9)
+    write_metrics(data_repo, 'richards', t, 'c1', 'b1', 'e1',
+                  {'instructions': 98765432109.0, 'cycles': 5.0})
+    write_metrics(data_repo, 'richards', t, 'c2', 'b1', 'e1',
+                  {'instructions': 1.5e9, 'gc_pause': 0.123456789012})
+    metrics = load_metrics(data_repo)
+    assert list(metrics) == ['richards']
+    assert metrics['richards'] == [
+        MetricItem('richards', t, 'c1', 'b1', 'e1', 'cycles', 5.0),
+        MetricItem('richards', t, 'c1', 'b1', 'e1', 'instructions', 98765432109.0),
+        MetricItem('richards', t, 'c2', 'b1', 'e1', 'gc_pause', 0.123456789012),
+        MetricItem('richards', t, 'c2', 'b1', 'e1', 'instructions', 1.5e9),
+    ]
+    with open(tmp_path / 'data' / 'metrics' / 'richards.csv') as f:
+        assert ',instructions,98765432109\n' in f.read()
+
+
+def test_format_metric_value() -> None:
+    assert format_metric_value(1.5e9) == '1.500G'
+    assert format_metric_value(2500.0) == '2.500k'
+    assert format_metric_value(0.25) == '0.25'
+
+
+def test_read_metrics_from_json(tmp_path: Path) -> None:
+    fnam = str(tmp_path / 'results.json')
+    with open(fnam, 'w') as f:
+        json.dump({'benchmarks': [{
+            'name': 'richards',
+            'interpreted': None,
+            'compiled': {'metrics': {'peak_rss': [3.0, 1.0, 2.0]}},
+            'build': {'build_time': 10.5, 'c_lines': 5000.0},
+        }]}, f)
+    assert read_metrics_from_json(fnam, compiled=True) == {
+        'peak_rss': 2.0, 'build_time': 10.5, 'c_lines': 5000.0,
+    }
+    assert read_metrics_from_json(fnam, compiled=False) == {}
+
+
+def test_read_metrics_from_json_excludes_noise(tmp_path: Path) -> None:
+    fnam = str(tmp_path / 'results.json')
+    with open(fnam, 'w') as f:
+        json.dump({'benchmarks': [{
+            'name': 'mypy_self_check',
+            'interpreted': None,
+            'compiled': {'metrics': {
+                'gc_pause': [0.5, 0.25, 0.75],
+                'noise_extra_load': [0.0, 2.0, 0.5],
+                'noise_other_cpu': [0.01, 0.02, 0.03],
+            }},
+        }]}, f)
+    assert read_metrics_from_json(fnam, compiled=True) == {'gc_pause': 0.5}
+
+
+def test_metrics_collector_requires_stop() -> None:
+    class Incomplete(MetricsCollector):
+        def start(self) -> None:
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore[abstract]
+    collector = collectors['gc']()
+    collector.start()
+    assert collector.stop()['gc_gen0_collections'] >= 0.0
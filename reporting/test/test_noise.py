@@ -0,0 +1,62 @@
+from pathlib import Path
+import os
+
+from benchmarking import benchmarks
+from benchmarks import mypy_parallel
+from reporting.noise import NoiseSample, parse_proc_stat, classify, read_frequency
+
+
+PROC_STAT = """\
+cpu  100 20 30 1000 50 5 5 10 0 0
+cpu0 50 10 15 500 25 2 3 5 0 0
+intr 12345 0 0
+ctxt 98765
+btime 1700000000
+procs_running 3
+"""
+
+
+QUIET = NoiseSample(other_cpu=0.01, extra_load=0.2, min_frequency=3000.0, throttle_events=0,
+                    context_switches=1000, preemptions=10)
+
+
+def test_parse_proc_stat() -> None:
+    # Idle and iowait time are not busy
+    assert parse_proc_stat(PROC_STAT) == (170.0, 98765, 3)
+
+
+def test_read_frequency_ignores_idle_cpus(tmp_path: Path) -> None:
+    assert read_frequency(str(tmp_path)) is None
+    # One busy CPU and three idle CPUs that have clocked down (kHz)
+    for i, khz in enumerate([3600000, 800000, 800000, 1200000]):
+        os.makedirs(tmp_path / ('cpu%d' % i) / 'cpufreq')
+        with open(tmp_path / ('cpu%d' % i) / 'cpufreq' / 'scaling_cur_freq', 'w') as f:
+            f.write('%d\n' % khz)
+    frequency = read_frequency(str(tmp_path))
+    assert frequency == 3600.0
+    assert classify(QUIET._replace(min_frequency=frequency), 3600.0) == []
+
+
+def test_classify() -> None:
+    assert classify(QUIET, 3100.0) == []
+    # Frequency is unknown
+    assert classify(QUIET._replace(min_frequency=0.0), 3100.0) == []
+    assert classify(QUIET._replace(other_cpu=0.5), 3100.0) == ['other_cpu']
+    assert classify(QUIET._replace(extra_load=1.5, throttle_events=1), 3100.0) == [
+        'load', 'throttled']
+    assert classify(QUIET._replace(min_frequency=2000.0), 3100.0) == ['frequency']
+    # No reference frequency yet (first iteration)
+    assert classify(QUIET._replace(min_frequency=2000.0), 0.0) == []
+
+
+def test_multi_process_benchmark_not_rejected() -> None:
+    info = next(b for b in benchmarks
+                if b.module == mypy_parallel.__name__ and b.name == 'mypy_parallel')
+    assert info.multi_process
+    # Four busy mypy workers that aren't waited-for children of the runner
+    workers = QUIET._replace(extra_load=3.0, other_cpu=3.0)
+    assert classify(workers, 3100.0) == ['other_cpu', 'load']
+    assert classify(workers, 3100.0, info.multi_process) == []
+    # Other checks still apply
+    assert classify(workers._replace(throttle_events=2), 3100.0, info.multi_process) == [
+        'throttled']
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from reporting.data import DataItem
+from reporting.parallel import fit_amdahl, gen_parallel_scaling_data, gen_parallel_scaling_table
+
+
+def make_item(benchmark: str, commit: str, runtime: float, environment: str = 'e1') -> DataItem:
+    return DataItem(benchmark, datetime(2024, 1, 1), runtime, 1.0, commit, 'b1', '3.12.0',
+                    'hw', 'os', environment)
+
+
+def amdahl(t1: float, serial: float, n: int) -> float:
+    return t1 * (serial + (1.0 - serial) / n)
+
+
+def test_fit_amdahl() -> None:
+    points = [(n, amdahl(10.0, 0.2, n)) for n in (1, 2, 4, 8)]
+    t1, serial = fit_amdahl(points)
+    assert abs(t1 - 10.0) < 1e-9
+    assert abs(serial - 0.2) < 1e-9
+    # Slower with more workers: clamped to fully serial
+    assert fit_amdahl([(1, 1.0), (2, 1.5)])[1] == 1.0
+
+
+def test_gen_parallel_scaling_data() -> None:
+    runs = {
+        'mypy_parallel_1': [make_item('mypy_parallel_1', 'c1', 10.0),
+                            make_item('mypy_parallel_1', 'c2', 10.0)],
+        'mypy_parallel_2': [make_item('mypy_parallel_2', 'c1', amdahl(10.0, 0.1, 2)),
+                            make_item('mypy_parallel_2', 'c2', amdahl(10.0, 0.3, 2))],
+        'mypy_parallel': [make_item('mypy_parallel', 'c1', amdahl(10.0, 0.1, 4)),
+                          make_item('mypy_parallel', 'c2', amdahl(10.0, 0.3, 4))],
+        'mypy_parallel_max': [make_item('mypy_parallel_max', 'c1', amdahl(10.0, 0.1, 16))],
+        # Only one worker count, so no scaling
+        'mypy_parallel_8': [make_item('mypy_parallel_8', 'c3', 2.0)],
+    }
+    data = gen_parallel_scaling_data(runs, {'c2': 0, 'c1': 1, 'c3': 2},
+                                     {'e1': {'cpu_count': '16'}})
+    assert [item.mypy_commit for item in data] == ['c2', 'c1']
+    assert [p.workers for p in data[1].points] == [1, 2, 4, 16]
+    assert abs(data[1].serial_fraction - 0.1) < 1e-9
+    assert abs(data[0].serial_fraction - 0.3) < 1e-9
+    assert abs(data[1].points[1].speedup - 10.0 / 5.5) < 1e-9
+    lines = gen_parallel_scaling_table(data, {})
+    assert lines[0] == ('| Date | 1 worker | 2 workers | 4 workers | 16 workers | '
+                        + 'Serial fraction | Mypy commit |')
+    assert '30.0% **+20.0**' in lines[2]
+    assert lines[3].split(' | ')[2] == '1.82x (91%)'
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from reporting.profiles import (
+    demangle_mypyc_symbol, collapse_perf_script, collapse_pstats, write_collapsed,
+    read_collapsed, function_times, diff_profiles
+)
+
+
+PERF_SCRIPT_OUTPUT = """\
+python 1234 12345.678901:     250000 cycles:u:
+\t    7f0000001234 CPyDef_richards___Task___run+0x24 (/src/richards.cpython-312.so)
+\t    7f0000005678 CPyDef_richards___schedule+0x10 (/src/richards.cpython-312.so)
+\t    55000000abcd _PyEval_EvalFrameDefault+0x1f3 (/usr/bin/python3.12)
+
+python 1234 12345.679901:     250000 cycles:u:
+\t    7f0000001234 CPyDef_richards___Task___run+0x30 (/src/richards.cpython-312.so)
+\t    7f0000005678 CPyDef_richards___schedule+0x10 (/src/richards.cpython-312.so)
+\t    55000000abcd _PyEval_EvalFrameDefault+0x1f3 (/usr/bin/python3.12)
+
+python 1234 12345.680901:     250000 cycles:u:
+\t    7f0000009999 [unknown] (/usr/lib/libc.so.6)
+"""
+
+
+def test_demangle_mypyc_symbol() -> None:
+    assert demangle_mypyc_symbol('CPyDef_richards___Task___run') == 'richards.Task.run'
+    assert demangle_mypyc_symbol('CPyPy_richards___schedule') == 'richards.schedule'
+    assert demangle_mypyc_symbol('PyObject_GetAttr') == 'PyObject_GetAttr'
+
+
+def test_collapse_perf_script() -> None:
+    assert collapse_perf_script(PERF_SCRIPT_OUTPUT) == {
+        'python;_PyEval_EvalFrameDefault;richards.schedule;richards.Task.run': 2.0,
+        'python;[libc.so.6]': 1.0,
+    }
+
+
+def test_collapse_pstats() -> None:
+    main = ('m.py', 1, 'main')
+    f = ('m.py', 5, 'f')
+    g = ('m.py', 9, 'g')
+    # func -> (primitive calls, calls, self time, cumulative time, callers)
+    stats = {
+        main: (1, 1, 1.0, 9.0, {}),
+        f: (2, 2, 2.0, 6.0, {main: (2, 2, 2.0, 6.0)}),
+        # g is called from both main and f
+        g: (4, 4, 6.0, 6.0, {main: (1, 1, 2.0, 2.0), f: (3, 3, 4.0, 4.0)}),
+    }
+    stacks = collapse_pstats(stats)
+    assert stacks == {
+        'main:m.py:1': 1e6,
+        'main:m.py:1;f:m.py:5': 2e6,
+        'main:m.py:1;f:m.py:5;g:m.py:9': 4e6,
+        'main:m.py:1;g:m.py:9': 2e6,
+    }
+    assert sum(stacks.values()) == 9e6
+
+
+def test_write_and_read_collapsed(tmp_path: Path) -> None:
+    fnam = str(tmp_path / 'p.folded')
+    write_collapsed(fnam, {'a;b': 2.0, 'a': 1.0})
+    assert read_collapsed(fnam) == {'a;b': 2.0, 'a': 1.0}
+
+
+def test_diff_profiles() -> None:
+    a = {'main;f': 50.0, 'main;g': 50.0}
+    b = {'main;f': 100.0, 'main;g': 50.0, 'main;g;g': 10.0}
+    assert function_times(b) == ({'f': 100.0, 'g': 60.0}, {'main': 160.0, 'f': 100.0,
+                                                           'g': 60.0})
+    deltas = diff_profiles(a, b)
+    assert [d.function for d in deltas] == ['f', 'g', 'main']
+    assert deltas[0].self_a == 50.0
+    assert deltas[0].self_b == 100.0
+    assert deltas[1].total_b == 60.0
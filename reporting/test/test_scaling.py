@@ -1,4 +1,9 @@
-from reporting.data import ScalingItem, infer_scaling_item, add_inferred_scaling_items
+from datetime import datetime
+
+from reporting.data import (
+    BenchmarkData, DataItem, ScalingItem, infer_scaling_item, add_inferred_scaling_items,
+    normalize_data,
+)
 
 
 item1 = ScalingItem(1.5, 'h1', '3.9', 'h2', '3.9')
@@ -22,3 +27,11 @@ def test_add_inferred_scaling_items() -> None:
     assert result[0] == item1
     assert result[1] == item2
     assert result[2] == ScalingItem(3.0, 'h1', '3.9', 'h2', '3.10')
+
+
+def test_normalize_data_keeps_fields() -> None:
+    run = DataItem('richards', datetime(2024, 5, 6), 3.0, 1.5, 'c1', 'b1', '3.9.1', 'h1',
+                   'Linux', environment='e1', estimator='median')
+    data = BenchmarkData({}, {'richards': [run]}, set(), {}, set(), {'richards': [item1]}, {})
+    normalize_data(data, '3.9.2', 'h2')
+    assert data.runs['richards'] == [run._replace(runtime=2.0)]
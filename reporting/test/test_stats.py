@@ -0,0 +1,85 @@
+from reporting.stats import (
+    percentile, paired_bootstrap_ratio_ci, paired_permutation_test, detect_warmup,
+    detect_bimodality,
+    hodges_lehmann, ESTIMATORS
+)
+
+
+def test_percentile() -> None:
+    assert percentile([1.0, 2.0, 3.0], 0.0) == 1.0
+    assert percentile([1.0, 2.0, 3.0], 0.5) == 2.0
+    assert percentile([1.0, 2.0, 3.0], 1.0) == 3.0
+    assert percentile([1.0, 2.0], 0.25) == 1.25
+
+
+def test_paired_bootstrap_ratio_ci() -> None:
+    a = [1.0, 1.02, 0.98, 1.01, 0.99] * 4
+    b = [0.5, 0.51, 0.49, 0.505, 0.495] * 4
+    low, high = paired_bootstrap_ratio_ci(a, b)
+    assert 1.99 < low <= 2.0 <= high < 2.01
+
+
+def test_paired_bootstrap_ratio_ci_cancels_drift() -> None:
+    # Runtimes drift by 50% during the run, but B is always 2% faster
+    a = [1.0 + 0.05 * i for i in range(10)]
+    b = [x / 1.02 for x in a]
+    low, high = paired_bootstrap_ratio_ci(a, b)
+    assert 1.0199 < low <= high < 1.0201
+
+
+def test_paired_permutation_test() -> None:
+    a = [1.0, 1.02, 0.98, 1.01, 0.99] * 4
+    assert paired_permutation_test(a, [x * 1.1 for x in a], resamples=1000) < 0.01
+    assert paired_permutation_test(a, list(reversed(a)), resamples=1000) > 0.5
+    # Drift dominates the variance, but the pairs show a consistent 1% difference
+    drifting = [1.0 + 0.05 * i for i in range(20)]
+    noise = [1.0 + 0.002 * (-1) ** i for i in range(20)]
+    slower = [x * 1.01 * e for x, e in zip(drifting, noise)]
+    assert paired_permutation_test(drifting, slower, resamples=1000) < 0.01
+
+
+def test_detect_warmup() -> None:
+    steady = [1.0, 1.01, 0.99, 1.02, 1.0, 0.98, 1.01, 1.0]
+    assert detect_warmup(steady) == 0
+    assert detect_warmup([3.0, 1.5] + steady) == 2
+    # Faster samples at the start are not warm-up
+    assert detect_warmup([0.5] + steady) == 0
+    # Small differences are ignored even if the steady state has no noise
+    assert detect_warmup([1.005, 1.0, 1.0, 1.0, 1.0]) == 0
+    # At most half of the samples are warm-up
+    assert detect_warmup([5.0, 5.0, 5.0, 1.0, 1.0, 1.0]) == 3
+    assert detect_warmup([]) == 0
+
+
+def test_estimators() -> None:
+    a = [1.0, 1.1, 0.9, 1.05, 0.95, 1.0, 5.0]
+    assert ESTIMATORS['mean'](a).value == sum(a) / len(a)
+    assert ESTIMATORS['smoothen'](a).samples == [0.9, 0.95, 1.0, 1.0, 1.05]
+    # The outlier is rejected
+    assert ESTIMATORS['mad'](a).samples == a[:-1]
+    median = ESTIMATORS['median'](a)
+    assert median.value == 1.0
+    assert median.ci is not None
+    assert median.ci[0] <= 1.0 <= median.ci[1]
+    assert hodges_lehmann([1.0, 2.0, 3.0]) == 2.0
+    assert abs(ESTIMATORS['hodges_lehmann'](a).value - 1.025) < 1e-9
+
+
+def test_estimate_mad_identical_samples() -> None:
+    # The median absolute deviation is zero, so no samples are rejected
+    a = [1.0, 1.0, 1.0, 1.0, 2.0]
+    estimate = ESTIMATORS['mad'](a)
+    assert estimate.samples == a
+    assert estimate.value == 1.2
+    assert estimate.stdev > 0
+
+
+def test_detect_bimodality() -> None:
+    one_cluster = [1.0, 1.01, 0.99, 1.02, 0.98, 1.0, 1.01, 0.99, 1.0, 1.0]
+    assert detect_bimodality(one_cluster) is None
+    clusters = detect_bimodality(one_cluster + [x + 0.5 for x in one_cluster])
+    assert clusters is not None
+    assert abs(clusters[0] - 1.0) < 1e-9
+    assert abs(clusters[1] - 1.5) < 1e-9
+    # A single outlier is not a cluster
+    assert detect_bimodality(one_cluster + [2.0]) is None
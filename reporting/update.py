@@ -8,24 +8,30 @@ This does several things:
 
 * Pull repos.
 * Collect interpreted baselines for any new benchmarks.
-* Run compiled benchmarks against any new commits.
+* Run compiled benchmarks against any new commits (optionally using a pool
+  of worker processes, see reporting.worker).
 * Generate reports.
 * Commit new data and reports.
 * Push repos.
 """
 
-from typing import List, Tuple
+from typing import List, Tuple, Optional
 from datetime import datetime, UTC
 import argparse
 import os
 import subprocess
 import sys
+import time
 
-from reporting.common import DATA_DIR, REPORTS_DIR, BENCHMARKS_DIR
+from reporting.common import DATA_DIR, REPORTS_DIR, BENCHMARKS_DIR, get_csv_path
 from reporting.gitutil import (
-    pull_repo, push_repo, git_commit, get_commit_range, checkout_commit, get_revision_hash
+    pull_repo, push_repo, git_commit, get_commit_range, checkout_commit, get_revision_hash,
+    get_current_commit
 )
-from reporting.data import get_benchmark_names, load_data
+from reporting.data import get_benchmark_names, load_data, write_csv_line
+from reporting.jobqueue import JobQueue
+from reporting.metrics import write_metrics, METRICS_DIR
+from reporting.environment import ENVIRONMENTS_FNAM
 
 
 benchmarks_repo = os.path.dirname(os.path.dirname(__file__))
@@ -33,6 +39,27 @@ benchmarks_repo = os.path.dirname(os.path.dirname(__file__))
 # If True, don't modify file system
 dry_run = False
 
+# If True, also record hardware performance counters
+counters = False
+
+# If True, also record mypyc compile time and generated code size
+build_metrics = False
+
+# If True, allow several workers on this machine (see reporting.worker)
+allow_shared_machine = False
+
+# Check the job queue for new results this often (seconds)
+QUEUE_POLL_INTERVAL = 30.0
+
+# Requeue jobs if a worker hasn't finished them after this many seconds (the
+# worker has probably died)
+STALE_JOB_TIMEOUT = 6 * 3600.0
+
+# Warn if no worker has recorded a heartbeat for this many seconds, and stop
+# waiting for results after NO_WORKER_TIMEOUT seconds (see reporting.worker)
+NO_WORKER_WARNING = 10 * 60.0
+NO_WORKER_TIMEOUT = 2 * 3600.0
+
 
 def log(*args: object) -> None:
     print('[%s]' % datetime.now(UTC), *args)
@@ -112,23 +139,163 @@ def collect_new_benchmarks(data_repo: str) -> List[str]:
     return new_benchmarks_missing_baselines + new_compiled_only_benchmarks
 
 
-def run_compiled_benchmarks(mypy_repo: str, data_repo: str, new_benchmarks: List[str]) -> None:
+def run_compiled_benchmarks(mypy_repo: str,
+                            data_repo: str,
+                            new_benchmarks: List[str],
+                            queue_path: Optional[str] = None,
+                            num_local_workers: int = 0) -> None:
     benchmarks = get_benchmark_names()
     heading('Determining new mypy/mypyc commits')
     commits = get_commits_without_results(mypy_repo, data_repo)
     log('Found %d mypy/mypyc commits without benchmark results:' % len(commits))
     for commit in commits:
         log(' * %s' % commit)
+    jobs = []
     for commit in commits:
-        heading('Running benchmarks against mypy commit %s' % commit)
         for benchmark in benchmarks:
-            run_benchmark(commit, benchmark, mypy_repo, data_repo)
+            jobs.append((commit, benchmark))
     if not commits:
         # If there are no new commits, we still have to get a result
         # for each new benchmark.
         for benchmark in new_benchmarks:
             master_commit = get_revision_hash(mypy_repo, 'master')
-            run_benchmark(master_commit, benchmark, mypy_repo, data_repo)
+            jobs.append((master_commit, benchmark))
+    if queue_path:
+        run_jobs_using_workers(jobs, mypy_repo, data_repo, queue_path, num_local_workers)
+    else:
+        for commit, benchmark in jobs:
+            run_benchmark(commit, benchmark, mypy_repo, data_repo)
+
+
+def run_jobs_using_workers(jobs: List[Tuple[str, str]],
+                           mypy_repo: str,
+                           data_repo: str,
+                           queue_path: str,
+                           num_local_workers: int) -> None:
+    """Run (commit, benchmark) jobs using worker processes and a shared job queue.
+
+    Workers may be started separately (on this or on other machines), and
+    num_local_workers additional workers are started on this machine.
+    """
+    heading('Running %d jobs using job queue %s' % (len(jobs), queue_path))
+    if dry_run:
+        for commit, benchmark in jobs:
+            log('Queue benchmark "%s" against mypy commit %s' % (benchmark, commit))
+        return
+    queue = JobQueue(queue_path)
+    try:
+        # Workers must run jobs using the same benchmarks as this process
+        benchmark_commit = get_current_commit(benchmarks_repo)
+        for commit, benchmark in jobs:
+            queue.add_job(commit, benchmark, benchmark_commit)
+        workers = start_local_workers(queue_path, mypy_repo, num_local_workers)
+        started = time.time()
+        warned = False
+        while queue.num_unfinished():
+            export_results(queue, data_repo)
+            if workers and all(p.poll() is not None for p in workers):
+                log('All local workers have exited, but %d jobs are unfinished' %
+                    queue.num_unfinished())
+                break
+            if queue.requeue_stale_jobs(STALE_JOB_TIMEOUT):
+                log('Requeued stale jobs')
+            idle = time.time() - max(queue.last_heartbeat() or 0.0, started)
+            if idle > NO_WORKER_TIMEOUT:
+                log('No worker heartbeat for %d minutes, giving up (%d jobs are unfinished)' %
+                    (idle // 60, queue.num_unfinished()))
+                break
+            if idle > NO_WORKER_WARNING and not warned:
+                log('No worker heartbeat for %d minutes; start workers using '
+                    '"python3 -m reporting.worker %s <mypy_repo>"' % (idle // 60, queue_path))
+            warned = idle > NO_WORKER_WARNING
+            time.sleep(QUEUE_POLL_INTERVAL)
+        export_results(queue, data_repo)
+        for p in workers:
+            p.wait()
+    finally:
+        queue.close()
+
+
+def export_results(queue: JobQueue, data_repo: str) -> None:
+    """Append new results from the job queue to .csv files."""
+    for result in queue.take_results():
+        log('Got result for "%s" against mypy commit %s from worker %s' % (
+            result.job.benchmark, result.job.mypy_commit, result.worker_id))
+        fnam = get_csv_path(data_repo, result.job.benchmark)
+        env_id = write_csv_line(fnam,
+                                result.job.benchmark,
+                                result.timestamp,
+                                result.runtime,
+                                result.stdev_percent,
+                                result.job.mypy_commit,
+                                result.benchmark_commit,
+                                python_version=result.python_version,
+                                hardware_id=result.hardware_id,
+                                os_version=result.os_version,
+                                c_compiler=result.c_compiler,
+                                environment=result.environment,
+                                estimator=result.estimator)
+        if result.metrics:
+            write_metrics(data_repo, result.job.benchmark, result.timestamp,
+                          result.job.mypy_commit, result.benchmark_commit, env_id,
+                          result.metrics)
+
+
+def start_local_workers(queue_path: str,
+                        mypy_repo: str,
+                        num_workers: int) -> List['subprocess.Popen[bytes]']:
+    """Start worker processes, each with separate repo clones and virtualenv.
+
+    Running a job modifies the mypy and benchmark repos and installs mypy
+    dependencies in the virtualenv, so workers can't share them. These are kept
+    under <queue_path>.workers/ and reused in later runs.
+    """
+    workers = []
+    for i in range(num_workers):
+        worker_dir = os.path.join('%s.workers' % os.path.abspath(queue_path), 'worker-%d' % i)
+        worker_benchmarks_repo = os.path.join(worker_dir, 'mypyc-benchmarks')
+        worker_mypy_repo = os.path.join(worker_dir, 'mypy')
+        worker_venv = os.path.join(worker_dir, 'venv')
+        update_clone(benchmarks_repo, worker_benchmarks_repo)
+        checkout_commit(worker_benchmarks_repo, get_current_commit(benchmarks_repo))
+        update_clone(mypy_repo, worker_mypy_repo)
+        bin_dir = create_venv(worker_venv)
+        worker_id = 'local-%d' % i
+        log('Starting worker %s in %s' % (worker_id, worker_dir))
+        cmd = [os.path.join(bin_dir, 'python'), '-u', '-m', 'reporting.worker',
+               os.path.abspath(queue_path), worker_mypy_repo, '--worker-id', worker_id,
+               '--exit-when-empty']
+        if counters:
+            cmd.append('--counters')
+        if build_metrics:
+            cmd.append('--build-metrics')
+        if allow_shared_machine:
+            cmd.append('--allow-shared-machine')
+        # Jobs run 'python' and 'pip', which must also use the virtualenv
+        env = os.environ.copy()
+        env['VIRTUAL_ENV'] = worker_venv
+        env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
+        workers.append(subprocess.Popen(cmd, cwd=worker_benchmarks_repo, env=env))
+    return workers
+
+
+def create_venv(venv_dir: str) -> str:
+    """Create a virtualenv unless it exists, and return the directory with its executables.
+
+    Packages installed for the current interpreter are available in the virtualenv,
+    and packages installed in the virtualenv override them.
+    """
+    if not os.path.isdir(venv_dir):
+        run([sys.executable, '-m', 'venv', '--system-site-packages', venv_dir], cwd='.')
+    return os.path.join(venv_dir, 'Scripts' if sys.platform == 'win32' else 'bin')
+
+
+def update_clone(repo: str, clone_dir: str) -> None:
+    if os.path.isdir(clone_dir):
+        run(['git', 'fetch', '--quiet', 'origin'], cwd=clone_dir)
+    else:
+        os.makedirs(os.path.dirname(clone_dir), exist_ok=True)
+        run(['git', 'clone', '--quiet', os.path.abspath(repo), clone_dir], cwd='.')
 
 
 def get_commits_without_results(mypy_repo: str, data_repo: str) -> List[str]:
@@ -145,6 +312,10 @@ def run_benchmark(commit: str, benchmark: str, mypy_repo: str, data_repo: str) -
     log('Running benchmark "%s" against mypy commit %s' % (benchmark, commit))
     cmd = ['python', '-u', '-m', 'reporting.collect',
            benchmark, mypy_repo, data_repo, '%s~1' % commit, commit]
+    if counters:
+        cmd.append('--counters')
+    if build_metrics:
+        cmd.append('--build-metrics')
     run(cmd, cwd=benchmarks_repo)
 
 
@@ -164,8 +335,14 @@ def commit(data_repo: str, new_benchmarks: List[str]) -> None:
         run(['git', 'add',
              os.path.join(data_repo, REPORTS_DIR, BENCHMARKS_DIR, '%s.md' % benchmark)],
             cwd=data_repo)
+    environments_path = os.path.join(data_repo, DATA_DIR, ENVIRONMENTS_FNAM)
+    if os.path.isfile(environments_path) or dry_run:
+        run(['git', 'add', environments_path], cwd=data_repo)
     log('Committing changes to repository')
     if not dry_run:
+        metrics_dir = os.path.join(DATA_DIR, METRICS_DIR)
+        if os.path.isdir(os.path.join(data_repo, metrics_dir)):
+            run(['git', 'add', metrics_dir], cwd=data_repo)
         git_commit(data_repo, [DATA_DIR, REPORTS_DIR], 'Update benchmark data and reports')
 
 
@@ -175,7 +352,7 @@ def push_repos(repos: List[str]) -> None:
             push_repo(repo)
 
 
-def parse_args() -> Tuple[str, str, bool, bool]:
+def parse_args() -> Tuple[str, str, bool, bool, Optional[str], int, bool, bool, bool]:
     parser = argparse.ArgumentParser(
         description="""Update mypyc benchmark data and reports based on recent commits.
                        Collect benchmark timings for new mypy commits. Collect baselines
@@ -192,13 +369,39 @@ def parse_args() -> Tuple[str, str, bool, bool]:
     parser.add_argument(
         "--no-git", action='store_true',
         help="don't pull git repos or commit changed or created files")
+    parser.add_argument(
+        "--queue", metavar="PATH", default=None,
+        help="""run benchmarks using worker processes that pull jobs from a job queue
+                database at PATH (see reporting.worker)""")
+    parser.add_argument(
+        "--local-workers", metavar="N", type=int, default=0,
+        help="""start N worker processes on this machine (requires --queue; N > 1
+                requires --allow-shared-machine)""")
+    parser.add_argument(
+        "--allow-shared-machine", action='store_true',
+        help="""allow several workers on this machine (for testing; workers disturb each
+                other's measurements, so use one worker per machine for timing-sensitive
+                runs)""")
+    parser.add_argument(
+        "--counters", action='store_true',
+        help="also record hardware performance counters (instructions retired etc.)")
+    parser.add_argument(
+        "--build-metrics", action='store_true',
+        help="also record mypyc compile time and generated code size")
     args = parser.parse_args()
-    return args.mypy_repo, args.data_repo, args.dry_run, args.no_git
+    if args.local_workers and not args.queue:
+        parser.error("--local-workers requires --queue")
+    if args.local_workers > 1 and not args.allow_shared_machine:
+        parser.error("more than one local worker requires --allow-shared-machine (run "
+                     "reporting.worker on other machines to add workers)")
+    return (args.mypy_repo, args.data_repo, args.dry_run, args.no_git, args.queue,
+            args.local_workers, args.counters, args.build_metrics, args.allow_shared_machine)
 
 
 def main() -> None:
-    global dry_run
-    mypy_repo, data_repo, dry_run, no_git = parse_args()
+    global dry_run, counters, build_metrics, allow_shared_machine
+    (mypy_repo, data_repo, dry_run, no_git, queue_path, num_local_workers,
+     counters, build_metrics, allow_shared_machine) = parse_args()
 
     heading('Starting a run')
     log('mypy_repo:', mypy_repo)
@@ -212,7 +415,8 @@ def main() -> None:
     # Collect baseline interpreted measurements for any new benchmarks.
     new_benchmarks = collect_new_benchmarks(data_repo)
 
-    run_compiled_benchmarks(mypy_repo, data_repo, new_benchmarks)
+    run_compiled_benchmarks(mypy_repo, data_repo, new_benchmarks, queue_path,
+                            num_local_workers)
 
     checkout_commit(mypy_repo, 'master')
 
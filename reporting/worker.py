@@ -0,0 +1,199 @@
+"""Benchmark worker that runs jobs from a shared job queue.
+
+Run "python3 -m reporting.worker --help" for more information.
+
+The worker must be run in the root directory of a mypyc-benchmarks checkout,
+and each worker needs a separate mypy repository, mypyc-benchmarks checkout and
+virtualenv, since jobs modify all of them. reporting.update can start local
+workers with separate checkouts and virtualenvs automatically (see
+--local-workers).
+
+By default only one worker can run on a machine at a time, since workers on the
+same machine would disturb each other's measurements (and reject each other's
+iterations as noisy). Use --allow-shared-machine to run several workers on a
+machine, for example for testing. Don't use it for timing-sensitive runs.
+"""
+
+from typing import IO, Optional, Tuple
+from datetime import datetime, UTC
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from reporting.collect import run_bench_with_metrics, sync_typeshed, install_mypy_deps
+from reporting.common import get_hardware_id, get_os_version
+from reporting.data import get_c_compiler_description
+from reporting.environment import get_environment_fingerprint
+from reporting.gitutil import checkout_commit, get_current_commit
+from reporting.jobqueue import JobQueue, JobResult, Job
+
+
+# Wait this long (seconds) before polling for new jobs if the queue is empty
+POLL_INTERVAL = 10.0
+
+# Record a heartbeat in the queue this often (seconds), also while running a job
+HEARTBEAT_INTERVAL = 60.0
+
+# Workers on this machine hold a lock on this file while running
+LOCK_FNAM = os.path.join(tempfile.gettempdir(), 'mypyc-benchmarks-worker.lock')
+
+
+def log(worker_id: str, *args: object) -> None:
+    print('[%s %s]' % (datetime.now(UTC), worker_id), *args)
+    sys.stdout.flush()
+
+
+def default_worker_id() -> str:
+    return '%s-%d' % (socket.gethostname(), os.getpid())
+
+
+def acquire_machine_lock(fnam: str = LOCK_FNAM, shared: bool = False) -> Optional[IO[str]]:
+    """Lock a file to prevent other workers from running on this machine.
+
+    If shared is true, only prevent workers that don't allow sharing the machine
+    (see --allow-shared-machine) from running. Return the open lock file (keep it
+    open while running), or None if another worker holds a conflicting lock.
+    Locking isn't supported on Windows.
+    """
+    f = open(fnam, 'a')
+    if sys.platform == 'win32':
+        return f
+    import fcntl
+    try:
+        fcntl.flock(f.fileno(), (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def start_heartbeat(queue_path: str, worker_id: str) -> threading.Event:
+    """Record heartbeats in a background thread until the returned event is set.
+
+    The coordinator uses these to detect that no workers are running.
+    """
+    stop = threading.Event()
+
+    def beat() -> None:
+        # SQLite connections can't be shared between threads
+        queue = JobQueue(queue_path)
+        try:
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                queue.heartbeat(worker_id)
+        finally:
+            queue.close()
+
+    threading.Thread(target=beat, daemon=True).start()
+    return stop
+
+
+def run_job(job: Job, worker_id: str, mypy_repo: str, counters: bool,
+            build_metrics: bool = False) -> JobResult:
+    now = datetime.now(UTC)
+    checkout_commit(mypy_repo, job.mypy_commit)
+    sync_typeshed(mypy_repo)
+    install_mypy_deps(mypy_repo)
+    runtime, stdev, metrics, estimator = run_bench_with_metrics(job.benchmark, mypy_repo,
+                                                                counters=counters,
+                                                                build_metrics=build_metrics)
+    c_compiler = get_c_compiler_description()
+    return JobResult(
+        job=job,
+        worker_id=worker_id,
+        timestamp=now,
+        runtime=runtime,
+        stdev_percent=stdev,
+        benchmark_commit=get_current_commit('.'),
+        python_version=sys.version.split()[0],
+        hardware_id=get_hardware_id(),
+        os_version=get_os_version(),
+        c_compiler=c_compiler,
+        environment=get_environment_fingerprint(c_compiler),
+        metrics=metrics,
+        estimator=estimator,
+    )
+
+
+def run_worker(queue_path: str,
+               mypy_repo: str,
+               worker_id: str,
+               exit_when_empty: bool,
+               counters: bool,
+               build_metrics: bool = False,
+               allow_shared_machine: bool = False) -> None:
+    lock = acquire_machine_lock(shared=allow_shared_machine)
+    if lock is None:
+        sys.exit('error: Another worker is running on this machine (lock file: %s; use '
+                 '--allow-shared-machine to run several workers)' % LOCK_FNAM)
+    queue = JobQueue(queue_path)
+    log(worker_id, 'started; queue: %s; mypy repo: %s' % (queue_path, mypy_repo))
+    queue.heartbeat(worker_id)
+    heartbeat = start_heartbeat(queue_path, worker_id)
+    try:
+        while True:
+            job = queue.claim_job(worker_id)
+            if job is None:
+                if exit_when_empty:
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+            benchmark_commit = get_current_commit('.')
+            if job.benchmark_commit and job.benchmark_commit != benchmark_commit:
+                # Results would be tagged with the wrong benchmark commit
+                queue.release_job(job)
+                sys.exit('error: Job %d needs mypyc-benchmarks commit %s, but this checkout is '
+                         'at %s (update the checkout and restart the worker)' % (
+                             job.id, job.benchmark_commit, benchmark_commit))
+            log(worker_id, 'running "%s" against mypy commit %s' % (job.benchmark,
+                                                                      job.mypy_commit))
+            try:
+                result = run_job(job, worker_id, mypy_repo, counters, build_metrics)
+            except Exception as e:
+                log(worker_id, 'job %d failed: %s' % (job.id, e))
+                queue.fail_job(job)
+                continue
+            queue.complete_job(result)
+    finally:
+        heartbeat.set()
+        queue.close()
+        lock.close()
+    log(worker_id, 'no more jobs')
+
+
+def parse_args() -> Tuple[str, str, str, bool, bool, bool, bool]:
+    parser = argparse.ArgumentParser(
+        description="""Run benchmark jobs from a job queue and push back results. Note that
+                       this will check out commits in the target mypy repository, and this
+                       will also install mypy dependencies in the current virtualenv!""")
+    parser.add_argument("queue", help="path to the job queue database")
+    parser.add_argument("mypy_repo", help="target mypy repository (this will be modified!)")
+    parser.add_argument("--worker-id", default=default_worker_id(),
+                        help="name of the worker (default: <hostname>-<pid>)")
+    parser.add_argument("--exit-when-empty", action="store_true",
+                        help="exit when there are no pending jobs instead of waiting")
+    parser.add_argument("--counters", action="store_true",
+                        help="also record hardware performance counters")
+    parser.add_argument("--build-metrics", action="store_true",
+                        help="also record mypyc compile time and generated code size")
+    parser.add_argument("--allow-shared-machine", action="store_true",
+                        help="""allow other workers that use this option to run on this
+                                machine (for testing; workers disturb each other's
+                                measurements, so use one worker for timing-sensitive runs)""")
+    args = parser.parse_args()
+    return (args.queue, args.mypy_repo, args.worker_id, args.exit_when_empty, args.counters,
+            args.build_metrics, args.allow_shared_machine)
+
+
+def main() -> None:
+    (queue_path, mypy_repo, worker_id, exit_when_empty, counters, build_metrics,
+     allow_shared_machine) = parse_args()
+    run_worker(queue_path, mypy_repo, worker_id, exit_when_empty, counters, build_metrics,
+               allow_shared_machine)
+
+
+if __name__ == "__main__":
+    main()
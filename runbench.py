@@ -1,25 +1,49 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
 from importlib import import_module
-from typing import NamedTuple
+from typing import TYPE_CHECKING, NamedTuple, Any, Iterator, Sequence
 import argparse
+import ast
+import fnmatch
 import glob
+import json
+import random
 import re
 import os
+import pstats
 import sys
 import time
+import shutil
 import subprocess
 import statistics
+import tempfile
 from pathlib import Path
 
 from benchmarking import BenchmarkInfo, benchmarks
 from typing_extensions import Final
 
+# Modules under reporting/ are imported where they are used, since most runs only
+# need some of them
+if TYPE_CHECKING:
+    from reporting.instrument import FunctionStats
+    from reporting.noise import NoiseMonitor
+    from reporting.profiles import Stacks
+    from reporting.stats import Estimate
+
 
 # Minimum total time (seconds) to run a benchmark
 MIN_TIME = 2.0
 # Minimum number of iterations to run a benchmark
 MIN_ITER = 10
+# Default number of iterations to run a benchmark with --profile
+PROFILE_ITER = 5
+# Default number of fresh interpreters used to measure import time with --import-time
+IMPORT_TIME_ITER = 20
+# Sampling frequency (Hz) used with 'perf record'
+PERF_FREQUENCY = 999
+# How to handle iterations that ran under interference from other system activity
+NOISE_MODES: Final = ('off', 'tag', 'reject')
 
 
 BINARY_EXTENSION: Final = 'pyd' if sys.platform == 'win32' else 'so'
@@ -29,25 +53,64 @@ def run_in_subprocess(benchmark: BenchmarkInfo,
                       compiled: bool,
                       priority: bool = False,
                       env: dict[str, str] | None = None) -> float:
+    return run_in_subprocess_with_metrics(benchmark, binary, compiled, priority, env)[0]
+
+
+def run_in_subprocess_with_metrics(
+        benchmark: BenchmarkInfo,
+        binary: str | None,
+        compiled: bool,
+        priority: bool = False,
+        env: dict[str, str] | None = None,
+        collectors: Sequence[str] = ()) -> tuple[float, dict[str, float]]:
+    """Run a benchmark iteration in a subprocess.
+
+    Return (elapsed time, metrics from collectors). See benchmarking.collectors
+    for valid collector names.
+    """
     module = benchmark.module
-    program = 'import %s; import benchmarking as bm; print("\\nelapsed:", bm.run_once("%s"))' % (
-        module,
-        benchmark.name,
-    )
+    if collectors:
+        program = 'import %s; import benchmarking as bm; bm.run_once_with_metrics("%s", %r)' % (
+            module,
+            benchmark.name,
+            list(collectors),
+        )
+    else:
+        program = 'import %s; import benchmarking as bm; print("\\nelapsed:", bm.run_once("%s"))' % (
+            module,
+            benchmark.name,
+        )
+    output = run_program_in_subprocess(program, binary, compiled, priority, env)
+    return parse_elapsed_time(output), parse_metrics(output)
+
 
+def run_program_in_subprocess(program: str,
+                               binary: str | None,
+                               compiled: bool,
+                               priority: bool = False,
+                               env: dict[str, str] | None = None,
+                               wrapper: Sequence[str] = (),
+                               python_options: Sequence[str] = (),
+                               capture_stderr: bool = False) -> bytes:
+    """Run Python code in a subprocess and return the output.
+
+    If not compiled, the binary is hidden so that the benchmark is interpreted. If
+    wrapper is given, it's prepended to the command line (e.g. a profiler). If
+    capture_stderr is true, stderr is included in the output.
+    """
     if not compiled and binary:
         os.rename(binary, binary + '.tmp')
-    cmd = [sys.executable, '-c', program]
+    cmd = list(wrapper) + [sys.executable] + list(python_options) + ['-c', program]
     if priority:
         # Use nice to increase process priority.
         cmd = ['sudo', 'nice', '-n', '-5'] + cmd
     try:
-        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, env=env)
+        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, env=env,
+                                stderr=subprocess.STDOUT if capture_stderr else None)
     finally:
         if not compiled and binary:
             os.rename(binary + '.tmp', binary)
-
-    return parse_elapsed_time(result.stdout)
+    return result.stdout
 
 
 def parse_elapsed_time(output: bytes) -> float:
@@ -56,11 +119,66 @@ def parse_elapsed_time(output: bytes) -> float:
     return float(m.group(1))
 
 
-def smoothen(a: list[float]) -> list[float]:
-    # Remove (at most) one third of the slowest runs (these are likely outliers).
-    return sorted(a)[: 2 * (len(a) + 1) // 3]
+def parse_metrics(output: bytes) -> dict[str, float]:
+    m = re.search(rb"\bmetrics: (\{.*\})", output)
+    if m is None:
+        return {}
+    return json.loads(m.group(1))
+
+
+class ModeResult(NamedTuple):
+    # Typical runtime, as calculated by the estimator (not necessarily the mean)
+    mean: float
+    stdev: float
+    # All measured times (seconds), in run order, including any outliers
+    times: list[float]
+    # Values of other metrics (metric name as key), in run order
+    metrics: dict[str, list[float]]
+    # Number of warm-up iterations at the start that were excluded from mean and stdev
+    warmup: int = 0
+    # Total time spent in warm-up iterations in excess of the steady-state mean
+    warmup_cost: float = 0.0
+    # Confidence interval of mean, if the estimator provides one
+    ci: tuple[float, float] | None = None
+    # If runtimes split into two clusters, means of the clusters
+    clusters: tuple[float, float] | None = None
+    # Reasons for considering each iteration noisy (in run order; empty if quiet)
+    noise: list[list[str]] | None = None
+    # Number of noisy iterations that were rejected and rerun
+    rejected: int = 0
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    # Number of iterations used for calculating results (after removing outliers)
+    iterations: int
+    interpreted: ModeResult | None
+    compiled: ModeResult | None
+    # Metrics about compiling the benchmark (see compile_benchmark_with_metrics)
+    build: dict[str, float] | None = None
+    # Estimator used to calculate mean and stdev from runtimes (see get_estimator)
+    estimator: str = ''
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'name': self.name,
+            'iterations': self.iterations,
+            'interpreted': self.interpreted._asdict() if self.interpreted else None,
+            'compiled': self.compiled._asdict() if self.compiled else None,
+            'build': self.build,
+            'estimator': self.estimator,
+        }
 
 
+def get_min_iter(benchmark: BenchmarkInfo, min_iter: int) -> int:
+    if min_iter < 0:
+        # Use default minimum iterations
+        if benchmark.min_iterations is not None:
+            return benchmark.min_iterations
+        else:
+            return MIN_ITER
+    return min_iter
+
 
 def run_benchmark(benchmark: BenchmarkInfo,
                   compiled_benchmark: BenchmarkInfo,
@@ -70,17 +188,31 @@ def run_benchmark(benchmark: BenchmarkInfo,
                   interpreted: bool,
                   compiled: bool,
                   min_iter: int,
-                  mypy_repo: str | None) -> None:
+                  mypy_repo: str | None,
+                  raw_label: str = '',
+                  collectors: Sequence[str] = (),
+                  estimator: str | None = None,
+                  noise: str = 'off') -> BenchmarkResult:
+    """Run a benchmark in interpreted and/or compiled mode, and print results.
+
+    Iterations at the start that are clearly slower than later iterations are
+    treated as warm-up and excluded from results (see detect_warmup). Outliers
+    may be excluded by the estimator (see get_estimator).
+
+    If noise is 'tag', iterations that ran under interference from other system
+    activity are recorded (see reporting.noise). If it's 'reject', they are also
+    discarded and rerun, at most min_iter times.
+
+    If raw_label is given, prefix the raw output line with it.
+    """
+    from reporting.stats import ESTIMATORS, detect_bimodality, detect_warmup
+
     assert compiled or interpreted
     if benchmark.compiled_only:
         assert not interpreted
 
-    if min_iter < 0:
-        # Use default minimum iterations
-        if benchmark.min_iterations is not None:
-            min_iter = benchmark.min_iterations
-        else:
-            min_iter = MIN_ITER
+    min_iter = get_min_iter(benchmark, min_iter)
+    estimator = get_estimator(benchmark, estimator)
 
     if benchmark.prepare:
         if not raw_output:
@@ -101,72 +233,759 @@ def run_benchmark(benchmark: BenchmarkInfo,
 
     times_compiled = []
     times_interpreted = []
+    metrics_compiled: dict[str, list[float]] = {}
+    metrics_interpreted: dict[str, list[float]] = {}
+    noise_compiled: list[list[str]] = []
+    noise_interpreted: list[list[str]] = []
+    monitor = get_noise_monitor(benchmark, noise)
     n = 0
+    warmup = 0
+    rejected = 0
     while True:
         if benchmark.stable_hash_seed:
             # This makes hash values more predictable.
             env["PYTHONHASHSEED"] = "1"
+        runs = []
         if compiled:
-            t = run_in_subprocess(compiled_benchmark, binary, compiled=True, priority=priority, env=env)
-            times_compiled.append(t)
+            runs.append((run_monitored(monitor, compiled_benchmark, binary, True, priority, env,
+                                       collectors),
+                         times_compiled, metrics_compiled, noise_compiled))
         if interpreted:
-            t = run_in_subprocess(benchmark, binary, compiled=False, priority=priority, env=env)
-            times_interpreted.append(t)
+            runs.append((run_monitored(monitor, benchmark, binary, False, priority, env,
+                                       collectors),
+                         times_interpreted, metrics_interpreted, noise_interpreted))
+        if (noise == 'reject' and rejected < min_iter
+                and any(reasons for (_, _, reasons), _, _, _ in runs)):
+            # Discard results from both modes so that iterations stay in sync
+            rejected += 1
+            if not raw_output:
+                sys.stdout.write('x')
+                sys.stdout.flush()
+            continue
+        for (t, metrics, reasons), times, all_metrics, all_noise in runs:
+            times.append(t)
+            append_metrics(all_metrics, metrics)
+            all_noise.append(reasons)
         if not raw_output:
             sys.stdout.write('.')
             sys.stdout.flush()
         n += 1
         long_enough = sum(times_interpreted) >= MIN_TIME or sum(times_compiled) >= MIN_TIME
         if long_enough and n >= min_iter:
-            break
+            # Iterations until runtimes have stabilized (e.g. file system caches are
+            # warm) are discarded, so run more iterations if needed.
+            warmup = max(detect_warmup(times_interpreted), detect_warmup(times_compiled))
+            if n - warmup >= min_iter:
+                break
     if not raw_output:
         print()
     if benchmark.compiled_only:
         # TODO: Remove this once it's no longer needed for debugging
         print(f'runtimes: {sorted(times_compiled)}')
-    if benchmark.strip_outlier_runs:
-        times_interpreted = smoothen(times_interpreted)
-        times_compiled = smoothen(times_compiled)
-    n = max(len(times_interpreted), len(times_compiled))
-    if interpreted:
-        stdev1 = statistics.stdev(times_interpreted)
-        mean1 = sum(times_interpreted) / n
-    else:
-        stdev1 = 0.0
-        mean1 = 0.0
-    if compiled:
-        stdev2 = statistics.stdev(times_compiled)
-        mean2 = sum(times_compiled) / n
-    else:
-        stdev2 = 0.0
-        mean2 = 0.0
+    all_times_interpreted = times_interpreted
+    all_times_compiled = times_compiled
+    times_interpreted = times_interpreted[warmup:]
+    times_compiled = times_compiled[warmup:]
+    est1 = ESTIMATORS[estimator](times_interpreted) if interpreted else None
+    est2 = ESTIMATORS[estimator](times_compiled) if compiled else None
+    n = max(len(est.samples) for est in (est1, est2) if est)
+    mean1 = est1.value if est1 else 0.0
+    stdev1 = est1.stdev if est1 else 0.0
+    mean2 = est2.value if est2 else 0.0
+    stdev2 = est2.stdev if est2 else 0.0
+    warmup_cost1 = sum(all_times_interpreted[:warmup]) - warmup * mean1
+    warmup_cost2 = sum(all_times_compiled[:warmup]) - warmup * mean2
     if not raw_output:
-        if interpreted:
-            print('interpreted: %.6fs (avg of %d iterations; stdev %.2g%%)' % (
-                mean1, n, 100.0 * stdev1 / mean1)
-            )
-        if compiled:
-            print('compiled:    %.6fs (avg of %d iterations; stdev %.2g%%)' % (
-                mean2, n, 100.0 * stdev2 / mean2)
-            )
+        if est1:
+            print('interpreted: %s' % format_estimate(est1, estimator))
+            print_bimodality_warning(times_interpreted)
+            print_warmup(warmup, warmup_cost1)
+            print_noise(noise_interpreted, rejected)
+            print_metrics(metrics_interpreted)
+        if est2:
+            print('compiled:    %s' % format_estimate(est2, estimator))
+            print_bimodality_warning(times_compiled)
+            print_warmup(warmup, warmup_cost2)
+            print_noise(noise_compiled, rejected)
+            print_metrics(metrics_compiled)
         if compiled and interpreted:
             print()
-            relative = sum(times_interpreted) / sum(times_compiled)
+            relative = mean1 / mean2
             print('compiled is %.3fx faster' % relative)
     else:
+        if raw_label:
+            sys.stdout.write('%s ' % raw_label)
         print('%d %.6f %.6f %.6f %.6f' % (
             n,
-            sum(times_interpreted) / n,
+            mean1,
             stdev1,
-            sum(times_compiled) / n,
+            mean2,
             stdev2))
+    return BenchmarkResult(
+        benchmark.name,
+        n,
+        ModeResult(mean1, stdev1, all_times_interpreted, metrics_interpreted, warmup,
+                   warmup_cost1, est1.ci if est1 else None,
+                   detect_bimodality(times_interpreted),
+                   noise_interpreted if monitor else None, rejected) if interpreted else None,
+        ModeResult(mean2, stdev2, all_times_compiled, metrics_compiled, warmup,
+                   warmup_cost2, est2.ci if est2 else None,
+                   detect_bimodality(times_compiled),
+                   noise_compiled if monitor else None, rejected) if compiled else None,
+        estimator=estimator,
+    )
+
+
+def get_noise_monitor(benchmark: BenchmarkInfo, noise: str) -> NoiseMonitor | None:
+    if noise == 'off':
+        return None
+    from reporting.noise import NoiseMonitor
+    return NoiseMonitor(multi_process=benchmark.multi_process)
+
+
+def run_monitored(monitor: NoiseMonitor | None,
+                  benchmark: BenchmarkInfo,
+                  binary: str | None,
+                  compiled: bool,
+                  priority: bool,
+                  env: dict[str, str] | None,
+                  collectors: Sequence[str]) -> tuple[float, dict[str, float], list[str]]:
+    """Run a benchmark iteration in a subprocess while monitoring system noise.
+
+    Return (elapsed time, metrics, reasons for considering the iteration noisy).
+    Noise metrics are included in metrics. If monitor is None, don't monitor.
+    """
+    if monitor is None:
+        t, metrics = run_in_subprocess_with_metrics(benchmark, binary, compiled, priority, env,
+                                                    collectors)
+        return t, metrics, []
+    monitor.start()
+    try:
+        t, metrics = run_in_subprocess_with_metrics(benchmark, binary, compiled, priority, env,
+                                                    collectors)
+    finally:
+        sample, reasons = monitor.stop()
+    metrics.update(sample.metrics())
+    return t, metrics, reasons
+
+
+def get_estimator(benchmark: BenchmarkInfo, estimator: str | None) -> str:
+    """Return name of estimator to use for a benchmark (see reporting.stats.ESTIMATORS).
+
+    If estimator is given (using --estimator), it overrides the default of the benchmark.
+    """
+    if estimator:
+        return estimator
+    if benchmark.estimator:
+        return benchmark.estimator
+    return 'smoothen' if benchmark.strip_outlier_runs else 'mean'
+
+
+def format_estimate(estimate: Estimate, estimator: str) -> str:
+    if estimator in ('smoothen', 'mean', 'mad'):
+        label = 'avg'
+    else:
+        label = estimator
+    result = '%.6fs (%s of %d iterations; stdev %.2g%%' % (
+        estimate.value, label, len(estimate.samples), 100.0 * estimate.stdev / estimate.value)
+    if estimate.ci:
+        result += '; 95%% CI %.6fs-%.6fs' % estimate.ci
+    return result + ')'
+
+
+def print_bimodality_warning(times: list[float]) -> None:
+    from reporting.stats import detect_bimodality
+
+    clusters = detect_bimodality(times)
+    if clusters:
+        print('    warning: runtimes are bimodal (clusters around %.6fs and %.6fs)' % clusters)
+
+
+def print_warmup(warmup: int, cost: float) -> None:
+    if warmup:
+        print('    warm-up: %d iteration%s excluded (%.6fs slower than steady state in total)' % (
+            warmup, '' if warmup == 1 else 's', cost))
+
+
+def print_noise(noise: list[list[str]], rejected: int) -> None:
+    if rejected:
+        print('    noise: %d noisy iteration%s rejected and rerun' % (
+            rejected, '' if rejected == 1 else 's'))
+    noisy = [reasons for reasons in noise if reasons]
+    if noisy:
+        counts: dict[str, int] = {}
+        for reasons in noisy:
+            for reason in reasons:
+                counts[reason] = counts.get(reason, 0) + 1
+        print('    warning: %d of %d iterations ran under interference (%s)' % (
+            len(noisy), len(noise), ', '.join('%s: %d' % item for item in sorted(counts.items()))))
+
+
+def append_metrics(all_metrics: dict[str, list[float]], metrics: dict[str, float]) -> None:
+    for name, value in metrics.items():
+        all_metrics.setdefault(name, []).append(value)
+
+
+def print_metrics(metrics: dict[str, list[float]]) -> None:
+    for name, values in sorted(metrics.items()):
+        mean = sum(values) / len(values)
+        if len(values) > 1 and mean:
+            stdev = ' (stdev %.2g%%)' % (100.0 * statistics.stdev(values) / mean)
+        else:
+            stdev = ''
+        print('    %s: %.6g%s' % (name, mean, stdev))
+
+
+def print_build_metrics(metrics: dict[str, float]) -> None:
+    print('build time: %.2fs' % metrics['build_time'])
+    for name, value in sorted(metrics.items()):
+        if name != 'build_time':
+            print('    %s: %.6g' % (name, value))
+
+
+def run_variant_in_subprocess(benchmark: BenchmarkInfo,
+                              binary: str,
+                              variant: str,
+                              priority: bool,
+                              env: dict[str, str] | None) -> float:
+    """Run a compiled benchmark using a specific variant of the binary."""
+    os.rename(variant, binary)
+    try:
+        return run_in_subprocess(benchmark, binary, compiled=True, priority=priority, env=env)
+    finally:
+        os.rename(binary, variant)
+
+
+def run_comparison(benchmark: BenchmarkInfo,
+                   binary: str,
+                   variants: list[str],
+                   labels: list[str],
+                   raw_output: bool,
+                   priority: bool,
+                   min_iter: int,
+                   estimator: str | None = None,
+                   noise: str = 'off') -> None:
+    """Compare two compiled variants of a benchmark.
+
+    Iterations of the variants are interleaved in random order, so that drift in
+    machine state affects both variants equally, and the variants are compared
+    using paired tests. Noisy iterations are handled as in run_benchmark.
+    """
+    from reporting.stats import ESTIMATORS, paired_bootstrap_ratio_ci, paired_permutation_test
+
+    assert len(variants) == len(labels) == 2
+    min_iter = get_min_iter(benchmark, min_iter)
+    estimator = get_estimator(benchmark, estimator)
+
+    if not raw_output:
+        print('running %s' % benchmark.name)
+
+    # Warm up
+    for variant in variants:
+        run_variant_in_subprocess(benchmark, binary, variant, priority=False, env=None)
+
+    env = os.environ.copy()
+    if benchmark.stable_hash_seed:
+        # This makes hash values more predictable.
+        env["PYTHONHASHSEED"] = "1"
+
+    times: list[list[float]] = [[], []]
+    noisy: list[list[str]] = []
+    monitor = get_noise_monitor(benchmark, noise)
+    n = 0
+    rejected = 0
+    while True:
+        order = [0, 1]
+        random.shuffle(order)
+        pair = [0.0, 0.0]
+        reasons: set[str] = set()
+        for i in order:
+            if monitor:
+                monitor.start()
+            try:
+                pair[i] = run_variant_in_subprocess(benchmark, binary, variants[i], priority, env)
+            finally:
+                if monitor:
+                    reasons.update(monitor.stop()[1])
+        if noise == 'reject' and rejected < min_iter and reasons:
+            rejected += 1
+            if not raw_output:
+                sys.stdout.write('x')
+                sys.stdout.flush()
+            continue
+        for i in range(2):
+            times[i].append(pair[i])
+        noisy.append(sorted(reasons))
+        if not raw_output:
+            sys.stdout.write('.')
+            sys.stdout.flush()
+        n += 1
+        if (sum(times[0]) >= MIN_TIME or sum(times[1]) >= MIN_TIME) and n >= min_iter:
+            break
+    if not raw_output:
+        print()
+    estimates = [ESTIMATORS[estimator](t) for t in times]
+    means = [est.value for est in estimates]
+    stdevs = [est.stdev for est in estimates]
+    speedup = means[0] / means[1]
+    # Both variants of a pair ran at about the same time, so use paired tests. Pairs
+    # with an outlier removed by the estimator are excluded.
+    pairs = [(x, y) for x, y in zip(times[0], times[1])
+             if is_retained(x, estimates[0]) and is_retained(y, estimates[1])]
+    n = len(pairs)
+    a = [x for x, _ in pairs]
+    b = [y for _, y in pairs]
+    ci_low, ci_high = paired_bootstrap_ratio_ci(a, b)
+    p_value = paired_permutation_test(a, b)
+    if not raw_output:
+        for label, est, t in zip(labels, estimates, times):
+            print('%s: %s' % (label, format_estimate(est, estimator)))
+            print_bimodality_warning(t)
+        print_noise(noisy, rejected)
+        print()
+        print('B is %.3fx faster than A (95%% CI %.3fx-%.3fx; p=%.3g)' % (
+            speedup, ci_low, ci_high, p_value))
+        if p_value >= 0.05:
+            print('difference is not statistically significant')
+    else:
+        print('%d %.6f %.6f %.6f %.6f %.6f %.6f %.6f %.6g' % (
+            n, means[0], stdevs[0], means[1], stdevs[1], speedup, ci_low, ci_high, p_value))
+
+
+def is_retained(x: float, estimate: Estimate) -> bool:
+    """Was a sample used by an estimator (i.e. not removed as an outlier)?
+
+    Estimators only remove the slowest or the most extreme samples, so the retained
+    samples are a range of values.
+    """
+    return min(estimate.samples) <= x <= max(estimate.samples)
+
+
+def profile_in_subprocess(benchmark: BenchmarkInfo,
+                          binary: str | None,
+                          compiled: bool,
+                          profiler: str,
+                          fnam: str,
+                          env: dict[str, str] | None) -> Stacks:
+    """Run a benchmark iteration using a profiler and return collapsed stacks.
+
+    The raw profile data is written to fnam.
+    """
+    from reporting.profiles import collapse_perf_script, collapse_pstats
+
+    python_options = []
+    if profiler == 'cprofile':
+        program = 'import %s; import benchmarking as bm; bm.run_once_profiled("%s", %r)' % (
+            benchmark.module,
+            benchmark.name,
+            fnam,
+        )
+        wrapper = []
+    else:
+        program = 'import %s; import benchmarking as bm; print("\\nelapsed:", bm.run_once("%s"))' % (
+            benchmark.module,
+            benchmark.name,
+        )
+        wrapper = ['perf', 'record', '-F', str(PERF_FREQUENCY), '-g', '-q', '-o', fnam, '--']
+        if sys.version_info >= (3, 12):
+            # Make interpreted Python functions visible to perf
+            python_options = ['-X', 'perf']
+    run_program_in_subprocess(program, binary, compiled, env=env, wrapper=wrapper,
+                              python_options=python_options)
+    if profiler == 'cprofile':
+        return collapse_pstats(pstats.Stats(fnam).stats)
+    output = subprocess.run(['perf', 'script', '-i', fnam], check=True, text=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    return collapse_perf_script(output)
+
+
+def profile_benchmark(benchmark: BenchmarkInfo,
+                      binary: str | None,
+                      compiled: bool,
+                      profiler: str,
+                      iterations: int,
+                      output: str,
+                      raw_output: bool,
+                      variant: str | None = None) -> Stacks:
+    """Profile a benchmark and write collapsed stacks of all iterations to a file.
+
+    If variant is given, profile this variant of the binary (see compile_variants).
+    """
+    from reporting.profiles import merge_stacks, write_collapsed
+
+    env = os.environ.copy()
+    if benchmark.stable_hash_seed:
+        env["PYTHONHASHSEED"] = "1"
+    stacks: Stacks = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i in range(iterations):
+            fnam = os.path.join(tmp_dir, 'profile.%d' % i)
+            if variant:
+                assert binary
+                os.rename(variant, binary)
+            try:
+                stacks = merge_stacks(stacks, profile_in_subprocess(
+                    benchmark, binary, compiled, profiler, fnam, env))
+            finally:
+                if variant:
+                    assert binary
+                    os.rename(binary, variant)
+            if not raw_output:
+                sys.stdout.write('.')
+                sys.stdout.flush()
+    if not raw_output:
+        print()
+    write_collapsed(output, stacks)
+    if not raw_output:
+        print('wrote profile of %d iterations to %s' % (iterations, output))
+    return stacks
+
+
+def run_profile(args: Args, entry: IndexEntry, index: list[IndexEntry]) -> None:
+    """Run a benchmark using a profiler (--profile) and write collapsed stacks.
+
+    With --compare, profile both variants and show which functions got slower.
+    """
+    profiler = args.profile
+    assert profiler
+    if profiler == 'perf' and not shutil.which('perf'):
+        sys.exit("error: 'perf' not found (it's needed for --profile perf)")
+    benchmark = load_benchmark(entry)
+    compiled = not args.interpreted_only
+    if compiled:
+        compiled_benchmark = load_benchmark(find_compiled_variant(entry, index))
+    elif benchmark.compiled_only:
+        sys.exit(f'Benchmark "{benchmark.name}" cannot be run in interpreted mode')
+    if compiled and profiler == 'cprofile':
+        print('note: cProfile only sees interpreted code; use --profile perf to profile '
+              + 'functions compiled with mypyc', file=sys.stderr)
+    if benchmark.prepare:
+        if args.compare:
+            sys.exit(f'Benchmark "{benchmark.name}" has a prepare step, which is not '
+                     + 'supported with --compare')
+        for prepare_func in benchmark.prepare:
+            prepare_func(args.mypy_repo)
+    iterations = args.min_iter if args.min_iter > 0 else PROFILE_ITER
+    prefix = args.profile_output or '%s-%s' % (benchmark.name, profiler)
+    if profiler == 'perf':
+        # Without frame pointers, perf can't reliably find the callers of C functions
+        cflags = '-fno-omit-frame-pointer'
+    else:
+        cflags = ''
+    if not args.compare:
+        if compiled:
+            binary = compile_benchmark(compiled_benchmark.module, args.raw, args.mypy_repo,
+                                       cflags)
+            profile_benchmark(compiled_benchmark, binary, True, profiler, iterations,
+                              prefix + '.folded', args.raw)
+        else:
+            profile_benchmark(benchmark, None, False, profiler, iterations,
+                              prefix + '.folded', args.raw)
+        return
+    binary, variants = compile_variants(compiled_benchmark.module, args.raw, args.compare,
+                                        cflags)
+    try:
+        profiles = []
+        for variant, suffix in zip(variants, ['a', 'b']):
+            profiles.append(profile_benchmark(
+                compiled_benchmark, binary, True, profiler, iterations,
+                '%s-%s.folded' % (prefix, suffix), args.raw, variant=variant))
+    finally:
+        for variant in variants:
+            os.remove(variant)
+    print()
+    from reporting.profiles import diff_profiles, format_profile_diff
+
+    print('Functions with the largest changes in self time (%% of total time of A):')
+    for line in format_profile_diff(diff_profiles(profiles[0], profiles[1]), 20):
+        print(line)
+
+
+@contextmanager
+def instrumented_source(module: str) -> Iterator[str]:
+    """Write an instrumented version of the source file of a module to a temporary directory.
+
+    Yield the directory, which is passed as src_dir to compile_benchmark for compiling
+    an instrumented binary (see reporting.instrument). The source file in this
+    repository is never modified.
+    """
+    from reporting.instrument import instrument_source
+
+    fnam = module.replace('.', '/') + '.py'
+    with open(fnam) as f:
+        source = f.read()
+    instrumented, _ = instrument_source(source)
+    with tempfile.TemporaryDirectory() as src_dir:
+        path = os.path.join(src_dir, fnam)
+        os.makedirs(os.path.dirname(path))
+        # The module must have the same full name as the original module
+        init = os.path.join(os.path.dirname(fnam), '__init__.py')
+        if os.path.isfile(init):
+            shutil.copy(init, os.path.join(src_dir, init))
+        with open(path, 'w') as f:
+            f.write(instrumented)
+        yield src_dir
+
+
+def instrument_benchmark(benchmark: BenchmarkInfo,
+                         binary: str,
+                         iterations: int,
+                         output: str,
+                         raw_output: bool,
+                         variant: str | None = None) -> dict[str, FunctionStats]:
+    """Run an instrumented compiled benchmark and write per-function statistics to a file.
+
+    Statistics are summed over all iterations. If variant is given, run this
+    variant of the binary (see compile_variants).
+    """
+    from reporting.instrument import merge_stats, read_stats, write_stats
+
+    env = os.environ.copy()
+    if benchmark.stable_hash_seed:
+        env["PYTHONHASHSEED"] = "1"
+    program = 'import %s; import benchmarking as bm; bm.run_once_instrumented("%s", %%r)' % (
+        benchmark.module,
+        benchmark.name,
+    )
+    stats: dict[str, FunctionStats] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fnam = os.path.join(tmp_dir, 'stats.json')
+        for i in range(iterations):
+            if variant:
+                os.rename(variant, binary)
+            try:
+                run_program_in_subprocess(program % fnam, binary, compiled=True, env=env)
+            finally:
+                if variant:
+                    os.rename(binary, variant)
+            stats = merge_stats(stats, read_stats(fnam))
+            if not raw_output:
+                sys.stdout.write('.')
+                sys.stdout.flush()
+    if not raw_output:
+        print()
+    write_stats(output, stats)
+    if not raw_output:
+        print('wrote statistics of %d iterations to %s' % (iterations, output))
+    return stats
+
+
+def run_instrument(args: Args, entry: IndexEntry, index: list[IndexEntry]) -> None:
+    """Run an instrumented compiled benchmark (--instrument) and show per-function statistics.
+
+    With --compare, run both variants and show which functions got slower.
+    """
+    from reporting.instrument import format_stats, format_stats_diff
+
+    if args.interpreted_only:
+        sys.exit('error: --instrument only supports compiled mode (use --profile cprofile '
+                 + 'for interpreted mode)')
+    benchmark = load_benchmark(entry)
+    compiled_benchmark = load_benchmark(find_compiled_variant(entry, index))
+    if benchmark.prepare:
+        if args.compare:
+            sys.exit(f'Benchmark "{benchmark.name}" has a prepare step, which is not '
+                     + 'supported with --compare')
+        for prepare_func in benchmark.prepare:
+            prepare_func(args.mypy_repo)
+    iterations = args.min_iter if args.min_iter > 0 else PROFILE_ITER
+    prefix = args.profile_output or '%s-instrument' % benchmark.name
+    module = compiled_benchmark.module
+    if not args.compare:
+        with instrumented_source(module) as src_dir:
+            binary = compile_benchmark(module, args.raw, args.mypy_repo, src_dir=src_dir)
+        stats = instrument_benchmark(compiled_benchmark, binary, iterations, prefix + '.json',
+                                     args.raw)
+        if not args.raw:
+            print()
+            for line in format_stats(stats, 30):
+                print(line)
+        return
+    with instrumented_source(module) as src_dir:
+        binary, variants = compile_variants(module, args.raw, args.compare, src_dir=src_dir)
+    try:
+        results = []
+        for variant, suffix in zip(variants, ['a', 'b']):
+            results.append(instrument_benchmark(
+                compiled_benchmark, binary, iterations, '%s-%s.json' % (prefix, suffix),
+                args.raw, variant=variant))
+    finally:
+        for variant in variants:
+            os.remove(variant)
+    print()
+    print('Functions with the largest changes in self time:')
+    for line in format_stats_diff(results[0], results[1], 30):
+        print(line)
+
+
+def measure_import_time(module: str,
+                        binary: str | None,
+                        compiled: bool,
+                        iterations: int) -> tuple[float, float]:
+    """Measure time to import a module in a fresh interpreter using -X importtime.
+
+    Return median (self time, cumulative time) in microseconds. Self time
+    excludes time spent importing other modules.
+    """
+    from reporting.importtime import find_import_time, parse_importtime
+
+    env = os.environ.copy()
+    # Measure imports using cached bytecode, like in typical installations. The
+    # first import writes the .pyc file, so don't include it.
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    run_program_in_subprocess('import %s' % module, binary, compiled, env=env)
+    self_times = []
+    cumulative_times = []
+    for i in range(iterations):
+        output = run_program_in_subprocess('import %s' % module, binary, compiled, env=env,
+                                           python_options=['-X', 'importtime'],
+                                           capture_stderr=True)
+        item = find_import_time(parse_importtime(output.decode()), module)
+        assert item is not None, 'no import time found for %r' % module
+        self_times.append(item.self_us)
+        cumulative_times.append(item.cumulative_us)
+    return statistics.median(self_times), statistics.median(cumulative_times)
+
+
+def run_import_times(args: Args, selected: list[IndexEntry], index: list[IndexEntry]) -> None:
+    """Measure import times of synthetic modules and modules of selected benchmarks."""
+    from reporting.importtime import SYNTHETIC_PACKAGE, cost_per_item, write_synthetic_modules
+
+    # Binaries of synthetic modules are only used here, so main() doesn't delete them
+    delete_binaries([SYNTHETIC_PACKAGE])
+    # (module used in interpreted mode, module used in compiled mode)
+    modules = [(module, module) for module in write_synthetic_modules()]
+    for entry in selected:
+        item = (entry.module, find_compiled_variant(entry, index).module)
+        if item not in modules:
+            modules.append(item)
+    iterations = args.min_iter if args.min_iter > 0 else IMPORT_TIME_ITER
+    if not args.raw:
+        print('%-40s %15s %15s %15s %15s' % ('module', 'interp self', 'interp total',
+                                             'compiled self', 'compiled total'))
+    interpreted_times: dict[str, float] = {}
+    compiled_times: dict[str, float] = {}
+    for module, compiled_module in modules:
+        interpreted = (0.0, 0.0)
+        compiled = (0.0, 0.0)
+        if not args.compiled_only:
+            interpreted = measure_import_time(module, None, False, iterations)
+        if not args.interpreted_only:
+            binary = compile_benchmark(compiled_module, True, args.mypy_repo)
+            compiled = measure_import_time(compiled_module, binary, True, iterations)
+        if module.startswith(SYNTHETIC_PACKAGE + '.'):
+            short_name = module.partition('.')[2]
+            interpreted_times[short_name] = interpreted[0]
+            compiled_times[short_name] = compiled[0]
+        if args.raw:
+            print('%s %.0f %.0f %.0f %.0f' % (module, *interpreted, *compiled))
+        else:
+            columns = ['%.0fus' % t if t else '-' for t in interpreted + compiled]
+            print('%-40s %15s %15s %15s %15s' % (module, *columns))
+    if not args.raw:
+        print()
+        print('Estimated cost per definition (from synthetic modules):')
+        for label, times in ('interpreted', interpreted_times), ('compiled', compiled_times):
+            if any(times.values()):
+                costs = cost_per_item(times)
+                print('    %-12s %s' % (label + ':', ', '.join(
+                    '%s %.2fus' % (name, cost) for name, cost in costs.items())))
+
+
+def compile_variants(module: str,
+                     raw_output: bool,
+                     mypy_repos: list[str],
+                     cflags: str = '',
+                     src_dir: str | None = None) -> tuple[str, list[str]]:
+    """Compile a benchmark using mypyc from each of the given mypy repositories.
+
+    Return (path of binary, paths of variant binaries). Before running a variant,
+    it must be renamed to the binary path (see run_variant_in_subprocess).
+    """
+    binary = ''
+    variants = []
+    for i, mypy_repo in enumerate(mypy_repos):
+        binary = compile_benchmark(module, raw_output, mypy_repo, cflags, src_dir)
+        variant = '%s.%d' % (binary, i)
+        os.rename(binary, variant)
+        variants.append(variant)
+    return binary, variants
+
+
+def compile_benchmark(module: str,
+                      raw_output: bool,
+                      mypy_repo: str | None,
+                      cflags: str = '',
+                      src_dir: str | None = None) -> str:
+    """Compile a benchmark module using mypyc and return the path of the binary.
+
+    If cflags is given, pass these additional flags to the C compiler. If src_dir
+    is given, compile the source file of the module under src_dir instead (see
+    instrumented_source). The binary is placed next to the module in this
+    repository in either case.
+    """
+    fnam = module.replace('.', '/') + '.py'
+    if not raw_output:
+        print('compiling %s...' % module)
+    if src_dir and mypy_repo:
+        mypy_repo = os.path.abspath(mypy_repo)
+    env, legacy_script = get_mypyc_env(mypy_repo, cflags)
+    if not legacy_script:
+        cmd = [sys.executable, '-m', 'mypyc']
+    else:
+        cmd = [sys.executable, legacy_script]
+    if not src_dir:
+        subprocess.run(cmd + [fnam], check=True, env=env)
+        return find_binary(module)
+    # Other modules (such as benchmarking) are found in this repository
+    env['MYPYPATH'] = os.getcwd()
+    subprocess.run(cmd + [fnam], check=True, env=env, cwd=src_dir)
+    # Also move shared libraries that newer mypyc versions generate
+    for path in glob.glob(os.path.join(src_dir, os.path.dirname(fnam), f'*.{BINARY_EXTENSION}')):
+        shutil.move(path, os.path.join(os.path.dirname(fnam), os.path.basename(path)))
+    return find_binary(module)
+
 
+def compile_benchmark_with_metrics(module: str,
+                                   raw_output: bool,
+                                   mypy_repo: str | None,
+                                   cflags: str = '') -> tuple[str, dict[str, float]]:
+    """Compile a benchmark module using mypyc and record build metrics.
 
-def compile_benchmark(module: str, raw_output: bool, mypy_repo: str | None) -> str:
+    Return (path of the binary, metrics). Metrics include the total build time,
+    time spent in each phase of the build (see buildmetrics.py), the number of
+    lines of generated C and the size of the binary. Only the total build time
+    and the binary size are available with old mypy revisions.
+    """
     fnam = module.replace('.', '/') + '.py'
     if not raw_output:
         print('compiling %s...' % module)
+    env, legacy_script = get_mypyc_env(mypy_repo, cflags)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, 'metrics.json')
+        if not legacy_script:
+            cmd = [sys.executable, 'buildmetrics.py', json_path]
+        else:
+            cmd = [sys.executable, legacy_script]
+        t0 = time.time()
+        subprocess.run(cmd + [fnam], check=True, env=env)
+        metrics = {'build_time': time.time() - t0}
+        if os.path.isfile(json_path):
+            with open(json_path) as f:
+                metrics.update(json.load(f))
+    binary = find_binary(module)
+    metrics['binary_size'] = float(os.path.getsize(binary))
+    stripped_size = get_stripped_size(binary)
+    if stripped_size is not None:
+        metrics['binary_size_stripped'] = float(stripped_size)
+    return binary, metrics
+
+
+def get_mypyc_env(mypy_repo: str | None, cflags: str) -> tuple[dict[str, str], str | None]:
+    """Return (environment for running mypyc, path to legacy mypyc script or None)."""
     env = os.environ.copy()
+    if cflags:
+        env['CFLAGS'] = (env.get('CFLAGS', '') + ' ' + cflags).strip()
     legacy_script = None
     if mypy_repo:
         # Use mypyc from specific mypy repository.
@@ -175,39 +994,142 @@ def compile_benchmark(module: str, raw_output: bool, mypy_repo: str | None) -> s
         if os.path.isfile(script_path):
             # With older mypy revisions we must use scripts/mypyc.
             legacy_script = script_path
-    if not legacy_script:
-        cmd = [sys.executable, '-m', 'mypyc']
-    else:
-        cmd = [sys.executable, legacy_script]
-    subprocess.run(cmd + [fnam], check=True, env=env)
+    return env, legacy_script
+
+
+def find_binary(module: str) -> str:
     pattern = module.replace('.', '/') + f'.*.{BINARY_EXTENSION}'
     paths = glob.glob(pattern)
     assert len(paths) == 1
     return paths[0]
 
 
-def import_all() -> None:
+def get_stripped_size(binary: str) -> int | None:
+    """Return size of a binary with symbols stripped, or None if 'strip' is not available."""
+    if sys.platform == 'win32' or not shutil.which('strip'):
+        return None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stripped = os.path.join(tmp_dir, os.path.basename(binary))
+        subprocess.run(['strip', '-o', stripped, binary], check=True)
+        return os.path.getsize(stripped)
+
+
+class IndexEntry(NamedTuple):
+    """Information about a benchmark that is available without importing it."""
+    name: str
+    module: str
+    compiled_only: bool
+    compiled_variant: bool
+
+
+def build_benchmark_index() -> list[IndexEntry]:
+    """Find all benchmarks by parsing (but not importing) the benchmark modules.
+
+    Only modules of benchmarks that will be run need to be imported (see
+    load_benchmark), which makes startup faster.
+    """
     files = glob.glob('microbenchmarks/*.py')
     files += glob.glob('benchmarks/*.py')
-    for fnam in files:
+    benchmarks_root_dir = Path(__file__).parent.resolve()
+    result = []
+    for fnam in sorted(files):
         filepath = Path(fnam).resolve()
         if filepath.name == '__init__.py' or filepath.suffix != '.py':
             continue
-        benchmarks_root_dir = Path(__file__).parent.resolve()
         module_parts = filepath.with_suffix("").relative_to(benchmarks_root_dir).parts
         module = ".".join(module_parts)
-        import_module(module)
+        # This raises SyntaxError on syntax errors, so that they get reported early.
+        tree = ast.parse(filepath.read_text(), fnam)
+        constants = get_module_dict_literals(tree)
+        for node in tree.body:
+            if not isinstance(node, ast.FunctionDef):
+                continue
+            for decorator in node.decorator_list:
+                options = get_benchmark_decorator_options(decorator, constants)
+                if options is not None:
+                    result.append(IndexEntry(
+                        node.name,
+                        module,
+                        bool(options.get('compiled_only', False)),
+                        bool(options.get('compiled_variant', False)),
+                    ))
+    return result
+
+
+def get_module_dict_literals(tree: ast.Module) -> dict[str, dict[str, object]]:
+    """Return module-level variables initialized using dict literals (such as shared options)."""
+    result = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target, value = node.targets[0], node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            target, value = node.target, node.value
+        else:
+            continue
+        if isinstance(target, ast.Name) and isinstance(value, ast.Dict):
+            try:
+                result[target.id] = ast.literal_eval(value)
+            except ValueError:
+                pass
+    return result
 
 
-def delete_binaries() -> None:
-    files = glob.glob(f'microbenchmarks/*.{BINARY_EXTENSION}')
-    files += glob.glob(f'benchmarks/*.{BINARY_EXTENSION}')
+def get_benchmark_decorator_options(
+        decorator: ast.expr,
+        constants: dict[str, dict[str, object]] | None = None) -> dict[str, object] | None:
+    """If decorator defines a benchmark, return decorator keyword arguments.
+
+    Only keyword arguments with literal values are included. Arguments passed using
+    '**NAME' are included if NAME is in constants (see get_module_dict_literals).
+    """
+    args: list[ast.keyword] = []
+    if isinstance(decorator, ast.Call):
+        args = decorator.keywords
+        decorator = decorator.func
+    if isinstance(decorator, ast.Attribute):
+        name = decorator.attr
+    elif isinstance(decorator, ast.Name):
+        name = decorator.id
+    else:
+        return None
+    if name not in ('benchmark', 'benchmark_with_context'):
+        return None
+    options = {}
+    for arg in args:
+        if arg.arg is not None:
+            try:
+                options[arg.arg] = ast.literal_eval(arg.value)
+            except ValueError:
+                pass
+        elif isinstance(arg.value, ast.Name) and constants and arg.value.id in constants:
+            options.update(constants[arg.value.id])
+    return options
+
+
+def load_benchmark(entry: IndexEntry) -> BenchmarkInfo:
+    """Import the module that defines a benchmark and return the benchmark."""
+    import_module(entry.module)
+    for benchmark in benchmarks:
+        if (benchmark.name == entry.name
+                and benchmark.module == entry.module
+                and benchmark.compiled_variant == entry.compiled_variant):
+            return benchmark
+    sys.exit(f'error: Benchmark {entry.name!r} not found in module {entry.module!r}')
+
+
+def delete_binaries(dirs: Sequence[str] = ('microbenchmarks', 'benchmarks')) -> None:
+    files = []
+    # Also delete renamed binaries (compared variants, or a binary hidden during an
+    # interpreted run) left behind by an interrupted run.
+    for pattern in f'*.{BINARY_EXTENSION}', f'*.{BINARY_EXTENSION}.*':
+        for d in dirs:
+            files += glob.glob(f'{d}/{pattern}')
     for fnam in files:
         os.remove(fnam)
 
 
 class Args(NamedTuple):
-    benchmark: str
+    benchmarks: list[str]
     mypy_repo: str | None
     is_list: bool
     raw: bool
@@ -215,18 +1137,33 @@ class Args(NamedTuple):
     compiled_only: bool
     interpreted_only: bool
     min_iter: int
+    compare: list[str] | None
+    json_path: str | None
+    counters: bool
+    tracemalloc: bool
+    profile: str | None
+    profile_output: str | None
+    instrument: bool
+    build_metrics: bool
+    import_time: bool
+    estimator: str | None
+    noise: str
 
 
 def parse_args() -> Args:
     parser = argparse.ArgumentParser(
-        description="Run a mypyc benchmark in compiled and/or interpreted modes.")
-    parser.add_argument('benchmark', nargs='?',
-                        help="name of benchmark to run (use --list to show options)")
+        description="Run mypyc benchmarks in compiled and/or interpreted modes.")
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help="""name of benchmark to run (use --list to show options); can also
+                                be a glob pattern such as 'mypy_*', or a tag ('micro' selects
+                                all microbenchmarks, 'all' selects all benchmarks)""")
     parser.add_argument('--mypy-repo', metavar="DIR", type=str, default=None,
                         help="""use mypyc from a mypy git repository (by default, use mypyc
                                 found via PATH and PYTHONPATH)""")
     parser.add_argument('--list', action='store_true', help='show names of all benchmarks')
     parser.add_argument('--raw', action='store_true', help='use machine-readable raw output')
+    parser.add_argument('--json', metavar='FILE', type=str, default=None,
+                        help='write results of all benchmarks to FILE in JSON format')
     parser.add_argument('--priority', action='store_true',
                         help="increase process priority using 'nice' (uses sudo)")
     parser.add_argument('-c', action='store_true',
@@ -236,24 +1173,129 @@ def parse_args() -> Args:
     parser.add_argument('--min-iter', type=int, default=-1, metavar="N",
                         help="""set minimum number of iterations (half of the results
                                 will be discarded; default %d)""" % MIN_ITER)
+    parser.add_argument('--compare', nargs=2, metavar=('REPO_A', 'REPO_B'), default=None,
+                        help="""compare compiled benchmark performance using mypyc from two mypy
+                                repositories (iterations are interleaved in random order)""")
+    parser.add_argument('--counters', action='store_true',
+                        help="""also record hardware performance counters (instructions, cycles,
+                                branch misses, cache misses) for each iteration (Linux only)""")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="""also record peak traced memory and allocated memory blocks using
+                                tracemalloc (this makes benchmarks much slower)""")
+    parser.add_argument('--profile', choices=['cprofile', 'perf'], default=None,
+                        help="""run the benchmark under a profiler for a fixed number of
+                                iterations (%d by default; see --min-iter) and write a
+                                collapsed stack file for flame graphs; use 'perf' for
+                                compiled code (Linux only)""" % PROFILE_ITER)
+    parser.add_argument('--profile-output', metavar='PREFIX', type=str, default=None,
+                        help="""write profile to PREFIX.folded, or PREFIX-a.folded and
+                                PREFIX-b.folded with --compare (default
+                                <benchmark>-<profiler>); with --instrument, write
+                                PREFIX.json (default <benchmark>-instrument)""")
+    parser.add_argument('--instrument', action='store_true',
+                        help="""compile the benchmark with every function instrumented, run it
+                                for a fixed number of iterations (%d by default; see
+                                --min-iter) and show calls and time per function (times
+                                include instrumentation overhead)""" % PROFILE_ITER)
+    parser.add_argument('--build-metrics', action='store_true',
+                        help="""record mypyc build time (split by phase), number of lines of
+                                generated C and binary size""")
+    parser.add_argument('--import-time', action='store_true',
+                        help="""measure time to import modules of the given benchmarks and
+                                synthetic modules (with many constants, functions, classes
+                                or native classes) in a fresh interpreter""")
+    parser.add_argument('--estimator', default=None,
+                        help="""how to calculate the typical runtime from measurements (see
+                                reporting.stats.ESTIMATORS; default: 'smoothen', which drops
+                                the slowest third of measurements, or 'mean' if the benchmark
+                                doesn't strip outlier runs)""")
+    parser.add_argument('--noise', choices=NOISE_MODES, default='tag',
+                        help="""monitor interference from other system activity (load, CPU
+                                frequency drops, thermal throttling, CPU use by other
+                                processes) during each iteration; 'tag' reports noisy
+                                iterations, 'reject' also discards and reruns them (default
+                                'tag')""")
     parsed = parser.parse_args()
-    if not parsed.list and not parsed.benchmark:
+    if not parsed.list and not parsed.benchmarks and not parsed.import_time:
         parser.print_help()
         sys.exit(2)
-    args = Args(parsed.benchmark,
+    if parsed.estimator is not None:
+        from reporting.stats import ESTIMATORS
+        if parsed.estimator not in ESTIMATORS:
+            parser.error('argument --estimator: invalid choice: %r (choose from %s)' % (
+                parsed.estimator, ', '.join(sorted(ESTIMATORS))))
+    args = Args(parsed.benchmarks,
                 parsed.mypy_repo,
                 parsed.list,
                 parsed.raw,
                 parsed.priority,
                 parsed.c,
                 parsed.i,
-                parsed.min_iter)
+                parsed.min_iter,
+                parsed.compare,
+                parsed.json,
+                parsed.counters,
+                parsed.tracemalloc,
+                parsed.profile,
+                parsed.profile_output,
+                parsed.instrument,
+                parsed.build_metrics,
+                parsed.import_time,
+                parsed.estimator,
+                parsed.noise)
     if args.compiled_only and args.interpreted_only:
         sys.exit("error: only give one of -c and -i")
+    if args.compare and (args.mypy_repo or args.interpreted_only):
+        sys.exit("error: --compare can't be used with --mypy-repo or -i")
     return args
 
 
-def check_benchmark_configuration(benchmarks: list[BenchmarkInfo]) -> None:
+def is_microbenchmark(benchmark: BenchmarkInfo | IndexEntry) -> bool:
+    return benchmark.module.startswith('microbenchmarks.')
+
+
+def select_benchmarks(patterns: list[str], benchmarks: list[IndexEntry]) -> list[IndexEntry]:
+    """Find benchmarks matching names, glob patterns or tags ('micro' or 'all').
+
+    Compiled variants are never selected directly (see find_compiled_variant).
+    """
+    candidates = sorted((b for b in benchmarks if not b.compiled_variant),
+                        key=lambda b: b.name)
+    result: list[IndexEntry] = []
+    for pattern in patterns:
+        if pattern == 'all':
+            matches = candidates
+        elif pattern == 'micro':
+            matches = [b for b in candidates if is_microbenchmark(b)]
+        else:
+            matches = [b for b in candidates if fnmatch.fnmatchcase(b.name, pattern)]
+        if not matches:
+            sys.exit('unknown benchmark %r' % pattern)
+        for b in matches:
+            if b not in result:
+                result.append(b)
+    return result
+
+
+def find_compiled_variant(benchmark: IndexEntry, benchmarks: list[IndexEntry]) -> IndexEntry:
+    for b in benchmarks:
+        if b.name == benchmark.name and b.compiled_variant:
+            return b
+    return benchmark
+
+
+def write_json_results(fnam: str, results: list[BenchmarkResult], mypy_repo: str | None) -> None:
+    data = {
+        'python_version': sys.version.split()[0],
+        'mypy_repo': mypy_repo,
+        'benchmarks': [result.to_json() for result in results],
+    }
+    with open(fnam, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+
+def check_benchmark_configuration(benchmarks: list[IndexEntry]) -> None:
     names = {b.name for b in benchmarks if not b.compiled_variant}
     for b in benchmarks:
         if b.compiled_variant and b.name not in names:
@@ -265,58 +1307,129 @@ def main() -> None:
     # Delete compiled modules before importing, as they may be stale.
     delete_binaries()
 
-    # Import before parsing args so that syntax errors get reported.
-    import_all()
+    # Index benchmarks before parsing args so that syntax errors get reported.
+    index = build_benchmark_index()
 
-    check_benchmark_configuration(benchmarks)
+    check_benchmark_configuration(index)
 
     args = parse_args()
     if args.is_list:
-        for benchmark in sorted(benchmarks):
+        for benchmark in sorted(index):
             if benchmark.compiled_variant:
                 # Don't show benchmarks with compiled_variants twice
                 continue
             suffix = ''
             if not args.raw:
-                if benchmark.module.startswith('microbenchmarks.'):
+                if is_microbenchmark(benchmark):
                     suffix += ' (micro)'
                 if benchmark.compiled_only:
                     suffix += ' (compiled only)'
             print(benchmark.name + suffix)
         sys.exit(0)
 
-    name = args.benchmark
-    for benchmark in benchmarks:
-        if benchmark.name == name and not benchmark.compiled_variant:
-            break
-    else:
-        sys.exit('unknown benchmark %r' % name)
+    selected = select_benchmarks(args.benchmarks, index)
+    if args.import_time:
+        run_import_times(args, selected, index)
+        return
 
-    compiled_benchmark = benchmark
-    for b in benchmarks:
-        if b.name == name and b.compiled_variant:
-            compiled_benchmark = b
-            break
+    # In batch mode, multiple benchmarks are measured in a single session
+    batch = len(selected) > 1
 
-    if not args.compiled_only and benchmark.compiled_only:
-        sys.exit(f'Benchmark "{benchmark.name}" cannot be run in interpreted mode')
+    if args.profile:
+        if batch:
+            sys.exit('error: --profile only supports a single benchmark')
+        run_profile(args, selected[0], index)
+        return
 
-    if args.interpreted_only:
-        binary = None
-    else:
-        binary = compile_benchmark(compiled_benchmark.module, args.raw, args.mypy_repo)
-
-    run_benchmark(
-        benchmark,
-        compiled_benchmark,
-        binary,
-        args.raw,
-        args.priority,
-        not args.compiled_only,
-        not args.interpreted_only,
-        args.min_iter,
-        args.mypy_repo,
-    )
+    if args.instrument:
+        if batch:
+            sys.exit('error: --instrument only supports a single benchmark')
+        run_instrument(args, selected[0], index)
+        return
+
+    if args.compare:
+        if batch:
+            sys.exit('error: --compare only supports a single benchmark')
+        benchmark = load_benchmark(selected[0])
+        compiled_benchmark = load_benchmark(find_compiled_variant(selected[0], index))
+        if benchmark.prepare:
+            sys.exit(f'Benchmark "{benchmark.name}" has a prepare step, which is not supported '
+                     + 'with --compare')
+        binary, variants = compile_variants(compiled_benchmark.module, args.raw, args.compare)
+        try:
+            run_comparison(compiled_benchmark, binary, variants,
+                           ['A (%s)' % args.compare[0], 'B (%s)' % args.compare[1]],
+                           args.raw, args.priority, args.min_iter, args.estimator,
+                           args.noise)
+        finally:
+            for variant in variants:
+                os.remove(variant)
+        return
+
+    if not batch and not args.compiled_only and selected[0].compiled_only:
+        sys.exit(f'Benchmark "{selected[0].name}" cannot be run in interpreted mode')
+
+    # Garbage collector activity is always recorded, since the overhead is small
+    collectors = ['gc']
+    if sys.platform != 'win32':
+        # Peak memory use is always recorded, since it's practically free
+        collectors.append('rss')
+    if args.counters:
+        collectors.append('counters')
+    if args.tracemalloc:
+        collectors.append('tracemalloc')
+
+    # Each module is only compiled once, even if it contains multiple benchmarks
+    binaries: dict[str, str] = {}
+    build_metrics: dict[str, dict[str, float]] = {}
+    results = []
+    for entry in selected:
+        benchmark = load_benchmark(entry)
+        compiled_benchmark = load_benchmark(find_compiled_variant(entry, index))
+        interpreted = not args.compiled_only and not benchmark.compiled_only
+        compiled = not args.interpreted_only
+        if not interpreted and not compiled:
+            if not args.raw:
+                print(f'skipping {benchmark.name} (cannot be run in interpreted mode)')
+            continue
+
+        if args.interpreted_only:
+            binary = None
+        else:
+            module = compiled_benchmark.module
+            if module not in binaries:
+                if args.build_metrics:
+                    binaries[module], build_metrics[module] = compile_benchmark_with_metrics(
+                        module, args.raw, args.mypy_repo)
+                    if not args.raw:
+                        print_build_metrics(build_metrics[module])
+                else:
+                    binaries[module] = compile_benchmark(module, args.raw, args.mypy_repo)
+            binary = binaries[module]
+
+        result = run_benchmark(
+            benchmark,
+            compiled_benchmark,
+            binary,
+            args.raw,
+            args.priority,
+            interpreted,
+            compiled,
+            args.min_iter,
+            args.mypy_repo,
+            raw_label=benchmark.name if batch else '',
+            collectors=collectors,
+            estimator=args.estimator,
+            noise=args.noise,
+        )
+        if compiled and args.build_metrics:
+            result = result._replace(build=build_metrics[compiled_benchmark.module])
+        results.append(result)
+        if batch and not args.raw:
+            print()
+
+    if args.json_path:
+        write_json_results(args.json_path, results, args.mypy_repo)
 
 
 if __name__ == "__main__":